@@ -0,0 +1,22 @@
+"""``Accept-Encoding`` parsing shared by ``compression`` and ``static_site``."""
+
+from typing import List
+
+
+def accepted_encodings(header: str) -> List[str]:
+    """Content codings the client accepts (``q > 0``), lower-cased, in header order."""
+    accepted = []
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            k, _, v = param.strip().partition("=")
+            if k == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        if token and q > 0:
+            accepted.append(token)
+    return accepted
@@ -18,12 +18,21 @@ def run_migrations_offline():
         context.run_migrations()
 
 
+def _run_migrations(connection):
+    context.configure(connection=connection, target_metadata=target_metadata)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
 def run_migrations_online():
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        # migrate.py: its connection holds the advisory lock
+        _run_migrations(connection)
+        return
     alembic_engine = get_alembic_engine()
     with alembic_engine.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
-        with context.begin_transaction():
-            context.run_migrations()
+        _run_migrations(connection)
 
 
 if context.is_offline_mode():
@@ -0,0 +1,50 @@
+"""lead webhook outbox
+
+Revision ID: 0004_lead_outbox
+Revises: 0003_tg_user_id_to_string
+Create Date: 2026-10-18
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_lead_outbox"
+down_revision = "0003_tg_user_id_to_string"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("leads", sa.Column("webhook_status", sa.String(), nullable=True))
+    op.add_column("leads", sa.Column("webhook_delivered_at", sa.DateTime(timezone=True), nullable=True))
+
+    op.create_table(
+        "lead_outbox",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("lead_id", sa.Integer, sa.ForeignKey("leads.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("payload", sa.JSON, nullable=False),
+        sa.Column("status", sa.String, nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("last_status_code", sa.Integer, nullable=True),
+        sa.Column("last_error", sa.String, nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("delivered_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_lead_outbox_lead_id", "lead_outbox", ["lead_id"])
+    # The worker only ever scans due pending rows
+    op.create_index(
+        "ix_lead_outbox_pending_due",
+        "lead_outbox",
+        ["next_attempt_at"],
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_lead_outbox_pending_due", table_name="lead_outbox")
+    op.drop_index("ix_lead_outbox_lead_id", table_name="lead_outbox")
+    op.drop_table("lead_outbox")
+    op.drop_column("leads", "webhook_delivered_at")
+    op.drop_column("leads", "webhook_status")
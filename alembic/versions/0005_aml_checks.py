@@ -0,0 +1,48 @@
+"""aml check jobs
+
+Revision ID: 0005_aml_checks
+Revises: 0004_lead_outbox
+Create Date: 2026-10-18
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_aml_checks"
+down_revision = "0004_lead_outbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "aml_checks",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("tg_user_id", sa.String, nullable=False),
+        sa.Column("username", sa.String, nullable=True),
+        sa.Column("wallet_address", sa.String, nullable=False),
+        sa.Column("meta", sa.JSON, nullable=True),
+        sa.Column("status", sa.String, nullable=False, server_default="pending"),
+        sa.Column("result", sa.JSON, nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index(
+        "ix_aml_checks_user_wallet_created",
+        "aml_checks",
+        ["tg_user_id", "wallet_address", "created_at"],
+    )
+    op.create_index(
+        "ix_aml_checks_pending",
+        "aml_checks",
+        ["created_at"],
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_aml_checks_pending", table_name="aml_checks")
+    op.drop_index("ix_aml_checks_user_wallet_created", table_name="aml_checks")
+    op.drop_table("aml_checks")
@@ -0,0 +1,37 @@
+"""composite index for /me/applications keyset pagination
+
+Revision ID: 0006_leads_user_created_index
+Revises: 0005_aml_checks
+Create Date: 2026-10-18
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_leads_user_created_index"
+down_revision = "0005_aml_checks"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY cannot run inside a transaction; it does not block writes to leads.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_leads_user_created_id",
+            "leads",
+            ["tg_user_id", sa.text("created_at DESC"), sa.text("id DESC")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_leads_user_created_id",
+            table_name="leads",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,176 @@
+"""Bounded worker pool for AML check jobs.
+
+``POST /aml/check`` stores an ``aml_checks`` row and submits its id here. A fixed number
+of workers drain a bounded queue, so slow AML webhook calls can never occupy more than
+``AML_WORKERS`` tasks, however many users tap "check". A job is claimed with a
+conditional ``UPDATE ... WHERE status = 'pending'``, so replicas that recover the same
+pending rows on startup never run a job twice.
+
+A ``running`` job holds a lease of ``AML_JOB_LEASE_SECONDS`` from ``started_at``. If its
+worker dies mid-job the row stays ``running`` (and keeps answering the dedupe lookup),
+so once the lease is over the job is claimable again: picked up by the startup recovery
+or by the periodic sweep every lease period.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.future import select
+
+from db import get_sessionmaker
+from models.aml_check import AMLCheck
+from settings import settings
+
+log = logging.getLogger("miniapp")
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Same contract as routers.aml._post_aml_webhook_json
+Send = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+_pool: Optional["AMLJobPool"] = None
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _stale_running(now: datetime):
+    """Running past the lease: its worker died (or was restarted) mid-job."""
+    expired = now - timedelta(seconds=settings.aml_job_lease_seconds)
+    return and_(AMLCheck.status == RUNNING, AMLCheck.started_at < expired)
+
+
+def _claimable(now: datetime):
+    return or_(AMLCheck.status == PENDING, _stale_running(now))
+
+
+def submit(job_id: int) -> bool:
+    """Queue a job on the running pool; False if there is no pool or the queue is full."""
+    if _pool is None:
+        return False
+    return _pool.submit(job_id)
+
+
+class AMLJobPool:
+    def __init__(self, send: Send, session_factory=None, *, workers: int | None = None, queue_size: int | None = None):
+        self._send = send
+        self._session_factory = session_factory
+        self._workers = workers or settings.aml_workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or settings.aml_queue_size)
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def session_factory(self):
+        return self._session_factory or get_sessionmaker()
+
+    async def start(self, *, recover: bool = True) -> None:
+        global _pool
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self._workers)]
+        _pool = self
+        if recover:
+            try:
+                await self._recover()
+            except Exception:
+                log.exception("AML job recovery failed")
+            self._tasks.append(asyncio.create_task(self._sweep_stale()))
+
+    async def stop(self) -> None:
+        global _pool
+        if _pool is self:
+            _pool = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job_id: int) -> bool:
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            log.warning("AML job queue full; job %s left pending", job_id)
+            return False
+        return True
+
+    async def join(self) -> None:
+        """Wait until every queued job has been processed (used by tests)."""
+        await self._queue.join()
+
+    async def _recover(self, *, stale_only: bool = False) -> None:
+        """Queue pending jobs and running ones past their lease (only the latter if stale_only)."""
+        now = _utcnow()
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(AMLCheck.id)
+                .where(_stale_running(now) if stale_only else _claimable(now))
+                .order_by(AMLCheck.created_at)
+                .limit(self._queue.maxsize)
+            )
+            ids = result.scalars().all()
+        for job_id in ids:
+            if not self.submit(job_id):
+                break
+        if ids:
+            log.info("AML jobs recovered: %s", len(ids))
+
+    async def _sweep_stale(self) -> None:
+        while True:
+            await asyncio.sleep(settings.aml_job_lease_seconds)
+            try:
+                await self._recover(stale_only=True)
+            except Exception:
+                log.exception("AML stale job sweep failed")
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self.run_job(job_id)
+            except Exception:
+                log.exception("AML job %s crashed", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def run_job(self, job_id: int) -> None:
+        now = _utcnow()
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(AMLCheck)
+                .where(AMLCheck.id == job_id, _claimable(now))
+                .values(status=RUNNING, started_at=now)
+                .returning(AMLCheck.tg_user_id, AMLCheck.username, AMLCheck.wallet_address, AMLCheck.meta)
+            )
+            row = result.first()
+            await db.commit()
+        if row is None:
+            return  # already claimed elsewhere
+
+        payload: Dict[str, Any] = {
+            "wallet_address": row.wallet_address,
+            "tg_user_id": row.tg_user_id,
+            "username": row.username,
+            "meta": row.meta or {},
+        }
+        try:
+            webhook_result = await self._send(payload)
+        except Exception as e:
+            log.exception("AML job %s webhook raised", job_id)
+            webhook_result = {"status": 0, "error": str(e)}
+
+        # None means forwarding is disabled, which is not an error
+        status_code = int((webhook_result or {}).get("status") or 0)
+        ok = webhook_result is None or 200 <= status_code < 300
+
+        async with self.session_factory() as db:
+            await db.execute(
+                update(AMLCheck)
+                .where(AMLCheck.id == job_id)
+                .values(status=DONE if ok else FAILED, result=webhook_result, finished_at=_utcnow())
+            )
+            await db.commit()
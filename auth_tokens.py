@@ -1,5 +1,5 @@
 import time
-from typing import Dict, Any, Literal
+from typing import Dict, Any, List, Literal, Optional
 
 import jwt
 from settings import settings
@@ -23,3 +23,32 @@ def create_token(*, token_type: TokenType, subject: str, ttl_seconds: int) -> st
 
 def decode_token(token: str) -> Dict[str, Any]:
     return jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+
+
+def token_subject(headers: List[Any], *, token_type: Optional[TokenType] = "access") -> Optional[str]:
+    """``sub`` of a valid token in raw ASGI headers: the bearer token, else the token cookies.
+
+    Only tokens of ``token_type`` count (``None``: either kind). Never raises.
+    """
+    cookies = ("access_token", "refresh_token") if token_type is None else (f"{token_type}_token",)
+    candidates: List[str] = []
+    for raw_name, raw_value in headers:
+        name = raw_name.lower()
+        value = raw_value.decode("latin-1")
+        if name == b"authorization" and value.lower().startswith("bearer "):
+            candidates.insert(0, value.split(" ", 1)[1].strip())
+        elif name == b"cookie":
+            for part in value.split(";"):
+                k, _, v = part.strip().partition("=")
+                if k in cookies and v:
+                    candidates.append(v)
+    for token in candidates:
+        try:
+            payload = decode_token(token)
+        except Exception:
+            continue
+        if token_type is not None and payload.get("type") != token_type:
+            continue
+        sub = payload.get("sub")
+        return str(sub) if sub else None
+    return None
@@ -0,0 +1 @@
+"""Load generation and benchmarking tools (not imported by the app)."""
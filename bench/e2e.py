@@ -0,0 +1,422 @@
+"""End-to-end benchmark of the HTTP API against local stand-ins.
+
+    python -m bench.e2e                                   # in-process ASGI app
+    python -m bench.e2e --uvicorn --workers 2             # through a local uvicorn
+    python -m bench.e2e --concurrency 1,16,64 --requests 500 --json bench.json
+    python -m bench.e2e --baseline bench.json --tolerance 0.15   # exit 1 on regression
+    python -m bench.e2e --webflow-latency-ms 80 --webhook-error-rate 0.05
+
+Scenarios: ``auth`` (freshly signed initData per request), ``leads``, ``leads_batch``
+(``BATCH_ITEMS`` leads per request), ``aml``, ``me`` and ``applications``. Postgres is replaced by SQLite (aiosqlite) unless ``--dsn``
+points at an already-migrated database. Webflow and the Leadteh/AML webhooks are local
+stubs (``bench/stubs.py``) with configurable latency and error rate.
+
+Each scenario runs at every concurrency level as a closed loop: N workers send
+requests back to back until ``--requests`` have completed. In-process mode shares one
+event loop between client and app, so its absolute numbers are pessimistic. Only
+compare runs that were made the same way.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import httpx
+
+from bench.stats import format_table, summarize
+from bench.stubs import BENCH_CITIES, StubServer, webflow_handler, webhook_handler
+
+SCENARIOS = ("auth", "leads", "leads_batch", "aml", "me", "applications")
+BATCH_ITEMS = 20
+RESULT_COLUMNS = ["scenario", "concurrency", "requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+
+RequestSpec = Dict[str, Any]
+
+
+class Workload:
+    """Request factories per scenario for a fixed set of seeded users."""
+
+    def __init__(self, users: List[Tuple[str, str]], bot_token: str):
+        self.users = users
+        self.bot_token = bot_token
+        self.nonce = os.urandom(4).hex()
+
+    def _user(self, i: int) -> Tuple[str, str]:
+        return self.users[i % len(self.users)]
+
+    def _bearer(self, i: int) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self._user(i)[1]}"}
+
+    def _wallet(self, i: int) -> str:
+        return "T" + hashlib.sha256(f"{self.nonce}-{i}".encode()).hexdigest()[:33]
+
+    def init_data(self, tg_user_id: str, i: int) -> str:
+        from bench.replay import resign_init_data
+
+        fields = {
+            "query_id": f"bench-{self.nonce}-{i}",
+            "user": json.dumps({"id": int(tg_user_id), "username": f"bench{tg_user_id}"}),
+        }
+        return resign_init_data(urlencode(fields), self.bot_token)
+
+    def auth(self, i: int) -> RequestSpec:
+        tg_user_id = self._user(i)[0]
+        return {"method": "POST", "url": "/auth/telegram-webapp", "json": {"initData": self.init_data(tg_user_id, i)}}
+
+    def leads(self, i: int) -> RequestSpec:
+        body = {
+            "city": BENCH_CITIES[i % len(BENCH_CITIES)],
+            "exchange_type": "USDT/RUB",
+            "receive_type": "В офисе / с менеджером",
+            "sum": str(1000 + i),
+            "wallet_address": self._wallet(i),
+            "meta": {"source": "bench"},
+        }
+        return {"method": "POST", "url": "/leads", "json": body, "headers": self._bearer(i)}
+
+    def leads_batch(self, i: int) -> RequestSpec:
+        items = [self.leads(i * BATCH_ITEMS + j)["json"] for j in range(BATCH_ITEMS)]
+        return {"method": "POST", "url": "/leads/batch", "json": {"items": items}, "headers": self._bearer(i)}
+
+    def aml(self, i: int) -> RequestSpec:
+        body = {"wallet_address": self._wallet(i)}
+        return {"method": "POST", "url": "/aml/check", "json": body, "headers": self._bearer(i)}
+
+    def me(self, i: int) -> RequestSpec:
+        return {"method": "GET", "url": "/me", "headers": self._bearer(i)}
+
+    def applications(self, i: int) -> RequestSpec:
+        return {"method": "GET", "url": "/me/applications", "params": {"limit": 20}, "headers": self._bearer(i)}
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    make_request: Callable[[int], RequestSpec],
+    *,
+    concurrency: int,
+    requests: int,
+    start: int = 0,
+) -> Dict[str, Any]:
+    """Closed loop: ``concurrency`` workers issue ``requests`` requests in total."""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    counter = itertools.count(start)
+    end = start + requests
+
+    async def _worker() -> None:
+        while True:
+            i = next(counter)
+            if i >= end:
+                return
+            spec = make_request(i)
+            t0 = time.perf_counter()
+            try:
+                status = (await client.request(**spec)).status_code
+            except Exception:
+                status = 0
+            latencies.append((time.perf_counter() - t0) * 1000)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    errors = sum(n for status, n in statuses.items() if not 200 <= status < 300)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        **summarize(latencies),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def _delta(current: float, baseline: float) -> Optional[float]:
+    return (current - baseline) / baseline if baseline else None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Rows for every (scenario, concurrency) present in both reports.
+
+    A row is a regression when throughput drops or p95 grows by more than
+    ``tolerance`` (a fraction), or the error rate rises by more than one point.
+    """
+    base = {(r["scenario"], r["concurrency"]): r for r in baseline.get("results", [])}
+    rows = []
+    for r in current.get("results", []):
+        b = base.get((r["scenario"], r["concurrency"]))
+        if b is None:
+            continue
+        rps = _delta(r["throughput_rps"], b["throughput_rps"])
+        p95 = _delta(r["p95_ms"], b["p95_ms"])
+        regression = (
+            (rps is not None and rps < -tolerance)
+            or (p95 is not None and p95 > tolerance)
+            or r.get("error_rate", 0.0) > b.get("error_rate", 0.0) + 0.01
+        )
+        rows.append(
+            {
+                "scenario": r["scenario"],
+                "concurrency": r["concurrency"],
+                "throughput_rps": r["throughput_rps"],
+                "base_rps": b["throughput_rps"],
+                "rps_delta": f"{rps:+.1%}" if rps is not None else "n/a",
+                "p95_ms": r["p95_ms"],
+                "base_p95_ms": b["p95_ms"],
+                "p95_delta": f"{p95:+.1%}" if p95 is not None else "n/a",
+                "verdict": "REGRESSION" if regression else "ok",
+            }
+        )
+    return rows
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+async def _create_schema() -> None:
+    import models.aml_check  # noqa: F401  (register tables on Base.metadata)
+    import models.idempotency_key  # noqa: F401
+    import models.lead  # noqa: F401
+    import models.lead_outbox  # noqa: F401
+    import models.user  # noqa: F401
+    from db import Base, get_engine
+
+    engine = get_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+@asynccontextmanager
+async def _in_process_client(limits: httpx.Limits) -> AsyncIterator[httpx.AsyncClient]:
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits, timeout=60) as client:
+            yield client
+
+
+@asynccontextmanager
+async def _uvicorn_client(limits: httpx.Limits, workers: int) -> AsyncIterator[httpx.AsyncClient]:
+    port = _free_port()
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)]
+    cmd += ["--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+    proc = subprocess.Popen(cmd, env=dict(os.environ))
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with {proc.returncode}")
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError("uvicorn did not become ready within 30s")
+                await asyncio.sleep(0.1)
+            yield client
+    finally:
+        # Wait off the loop: the stubs live on it and the workers drain their outbox on exit
+        proc.terminate()
+        try:
+            await asyncio.to_thread(proc.wait, 30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+async def _seed(client: httpx.AsyncClient, workload: Workload, user_ids: List[str], leads_per_user: int) -> List[Tuple[str, str]]:
+    users = []
+    for i, tg_user_id in enumerate(user_ids):
+        r = await client.post("/auth/telegram-webapp", json={"initData": workload.init_data(tg_user_id, -1 - i)})
+        r.raise_for_status()
+        users.append((tg_user_id, r.json()["access_token"]))
+    workload.users = users
+
+    sem = asyncio.Semaphore(16)
+
+    async def _lead(i: int) -> None:
+        async with sem:
+            await client.request(**workload.leads(i))
+
+    await asyncio.gather(*(_lead(i) for i in range(len(users) * leads_per_user)))
+    return users
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    webflow = await StubServer(
+        webflow_handler(args.webflow_items),
+        latency_ms=args.webflow_latency_ms,
+        jitter_ms=args.webflow_jitter_ms,
+        error_rate=args.webflow_error_rate,
+    ).start()
+    webhook = await StubServer(
+        webhook_handler,
+        latency_ms=args.webhook_latency_ms,
+        jitter_ms=args.webhook_jitter_ms,
+        error_rate=args.webhook_error_rate,
+    ).start()
+
+    async with AsyncExitStack() as stack:
+        stack.push_async_callback(webflow.stop)
+        stack.push_async_callback(webhook.stop)
+        tmp = stack.enter_context(tempfile.TemporaryDirectory(prefix="bench-"))
+
+        # Must be in place before the app's modules (settings, db) are imported
+        os.environ.setdefault("BOT_TOKEN", "bench-bot-token")
+        os.environ.update(
+            {
+                "POSTGRES_DSN": args.dsn or f"sqlite+aiosqlite:///{tmp}/bench.db",
+                "WEBFLOW_CMS_ITEMS_URL": f"{webflow.url}/v2/collections/bench/items",
+                "WEBFLOW_API_KEY": "bench",
+                "LEAD_WEBHOOK_URL": f"{webhook.url}/webhook",
+                "AML_WEBHOOK_URL": f"{webhook.url}/aml",
+                "LOG_LEVEL": args.log_level,
+                # a handful of bench users would be throttled within the first level
+                "RATE_LIMITS": "{}",
+            }
+        )
+        if not args.dsn:
+            await _create_schema()
+        if args.uvicorn:
+            from db import get_engine
+
+            await get_engine().dispose()  # the schema connection must not outlive the fork
+
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        if args.uvicorn:
+            client = await stack.enter_async_context(_uvicorn_client(limits, args.workers))
+        else:
+            client = await stack.enter_async_context(_in_process_client(limits))
+
+        workload = Workload([], os.environ["BOT_TOKEN"])
+        base_id = 7_000_000_000 + int(workload.nonce, 16) % 1_000_000 * 1000
+        await _seed(client, workload, [str(base_id + i) for i in range(args.users)], args.seed_leads)
+
+        results = []
+        offset = 10_000_000  # keep request indexes (and so wallets / query_ids) unique across levels
+        for scenario in args.scenarios:
+            make_request = getattr(workload, scenario)
+            for level in args.concurrency:
+                if args.warmup:
+                    await run_level(client, make_request, concurrency=level, requests=args.warmup, start=offset)
+                    offset += args.warmup
+                row = await run_level(client, make_request, concurrency=level, requests=args.requests, start=offset)
+                offset += args.requests
+                results.append({"scenario": scenario, **row})
+                print(
+                    f"{scenario} c={level}: {row['throughput_rps']} req/s p95={row['p95_ms']}ms errors={row['errors']}",
+                    file=sys.stderr,
+                )
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "mode": f"uvicorn x{args.workers}" if args.uvicorn else "in-process",
+            "database": "custom" if args.dsn else "sqlite",
+            "users": args.users,
+            "requests_per_level": args.requests,
+            "webflow_stub": webflow.config(),
+            "webhook_stub": webhook.config(),
+        },
+        "results": results,
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _scenario_list(value: str) -> List[str]:
+    names = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = sorted(set(names) - set(SCENARIOS))
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown scenarios: {', '.join(unknown)}")
+    return names
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=_scenario_list, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8, 32], help="comma-separated levels")
+    parser.add_argument("--requests", type=int, default=300, help="per scenario and level")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seed-leads", type=int, default=5, help="leads per user created before the run")
+    parser.add_argument("--uvicorn", action="store_true", help="run the app under a local uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (with --uvicorn)")
+    parser.add_argument("--dsn", help="use this database instead of a temporary SQLite file")
+    parser.add_argument("--webflow-items", type=int, default=250)
+    parser.add_argument("--webflow-latency-ms", type=float, default=50.0)
+    parser.add_argument("--webflow-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--webflow-error-rate", type=float, default=0.0)
+    parser.add_argument("--webhook-latency-ms", type=float, default=100.0)
+    parser.add_argument("--webhook-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--webhook-error-rate", type=float, default=0.0)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--json", dest="json_out", help="write the report to this file")
+    parser.add_argument("--baseline", help="report to compare against; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed fractional change (default 0.10)")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print(format_table(report["results"], RESULT_COLUMNS))
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.tolerance)
+        print()
+        if baseline.get("meta", {}).get("mode") != report["meta"]["mode"]:
+            print(f"warning: baseline mode {baseline.get('meta', {}).get('mode')!r} differs from this run", file=sys.stderr)
+        if not rows:
+            print("baseline has no matching (scenario, concurrency) results", file=sys.stderr)
+        print(
+            format_table(
+                rows,
+                ["scenario", "concurrency", "throughput_rps", "base_rps", "rps_delta", "p95_ms", "base_p95_ms", "p95_delta", "verdict"],
+            )
+        )
+        if any(r["verdict"] == "REGRESSION" for r in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""Micro-benchmarks of the CPU-bound functions on the login and lead paths.
+
+    python -m bench.micro                         # ns/op table for every case
+    python -m bench.micro -k token                # only cases whose name contains "token"
+    python -m bench.micro --json micro.json --baseline micro-old.json
+    python -m bench.micro --profile -k lead       # cProfile each case instead of timing
+    python -m bench.micro --profile --profile-dir prof/   # one .prof per case (snakeviz etc.)
+
+Each case is warmed up first. Then the number of calls per repeat is calibrated so a
+repeat takes about ``--min-time`` seconds, and the best and median of ``--repeat``
+repeats are reported. Library versions go into the JSON report, so a slowdown after a
+PyJWT/pydantic bump shows up against the baseline.
+
+The ``verify_init_data/legacy`` case re-implements the original function (key derived
+on every call, no memo) as a reference point for the cached variants.
+"""
+
+import argparse
+import cProfile
+import hashlib
+import hmac
+import io
+import json
+import os
+import platform
+import pstats
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from bench.stats import format_table
+
+# Must be in place before settings is imported
+os.environ.setdefault("BOT_TOKEN", "1234567890:AAExampleExampleExampleExampleExam")
+
+from urllib.parse import parse_qsl, urlencode  # noqa: E402
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+import utils  # noqa: E402
+from auth_tokens import create_token, decode_token  # noqa: E402
+from routers.leads import _normalize_receive_type  # noqa: E402
+from schemas.lead import LeadCreate  # noqa: E402
+from schemas.user import ApplicationsPage  # noqa: E402
+from settings import settings  # noqa: E402
+
+BOT_TOKEN = settings.bot_token
+
+# name -> factory returning the zero-argument callable to time (setup happens in the factory)
+CASES: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+
+def case(name: str):
+    def register(factory: Callable[[], Callable[[], Any]]):
+        CASES[name] = factory
+        return factory
+
+    return register
+
+
+def _sample_init_data(n: int = 0) -> str:
+    user = {"id": 100000000 + n, "first_name": "Ivan", "username": f"user{n}", "language_code": "ru"}
+    fields = {"auth_date": str(int(time.time())), "query_id": f"AAH{n:010d}", "user": json.dumps(user)}
+    dcs = utils._data_check_string(fields)
+    fields["hash"] = hmac.new(utils._webapp_secret_key(BOT_TOKEN), dcs.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+def _legacy_verify(init_data: str, bot_token: str) -> dict:
+    data = dict(parse_qsl(init_data, keep_blank_values=True))
+    received_hash = data.pop("hash", None)
+    int(data.get("auth_date", "0"))
+    secret_key = hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
+    dcs = utils._data_check_string(data)
+    calc_hash = hmac.new(secret_key, dcs.encode("utf-8"), hashlib.sha256).hexdigest()
+    assert hmac.compare_digest(calc_hash, received_hash)
+    return data
+
+
+@case("verify_init_data/legacy")
+def _verify_legacy():
+    sample = _sample_init_data()
+    return lambda: _legacy_verify(sample, BOT_TOKEN)
+
+
+@case("verify_init_data/first_sight")
+def _verify_first_sight():
+    sample = _sample_init_data()
+
+    def run():
+        utils._memo.clear()
+        utils.verify_init_data(sample, BOT_TOKEN)
+
+    return run
+
+
+@case("verify_init_data/memo_hit")
+def _verify_memo_hit():
+    sample = _sample_init_data()
+    utils.verify_init_data(sample, BOT_TOKEN)
+    return lambda: utils.verify_init_data(sample, BOT_TOKEN)
+
+
+@case("create_token/access")
+def _create_token():
+    return lambda: create_token(token_type="access", subject="100000000", ttl_seconds=900)
+
+
+@case("decode_token/access")
+def _decode_token():
+    token = create_token(token_type="access", subject="100000000", ttl_seconds=900)
+    return lambda: decode_token(token)
+
+
+@case("normalize_receive_type/ui_label")
+def _normalize_label():
+    return lambda: _normalize_receive_type("В офисе  /  с менеджером")
+
+
+@case("normalize_receive_type/plain")
+def _normalize_plain():
+    return lambda: _normalize_receive_type("Наличные")
+
+
+_LEAD_BODY = {
+    "city": "Москва",
+    "exchange_type": "USDT/RUB",
+    "receive_type": "В офисе / с менеджером",
+    "sum": "1000",
+    "wallet_address": "TQn9Y2khEsLJW1ChVWFMSMeRDow5KcbLSE",
+    "meta": {"source": "miniapp", "platform": "ios", "version": "8.0"},
+}
+
+
+@case("LeadCreate/model_validate")
+def _lead_validate():
+    return lambda: LeadCreate.model_validate(_LEAD_BODY)
+
+
+@case("LeadCreate/model_validate_json")
+def _lead_validate_json():
+    raw = json.dumps(_LEAD_BODY).encode()
+    return lambda: LeadCreate.model_validate_json(raw)
+
+
+def _application_rows(n: int = 50) -> List[Any]:
+    created = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    fields = {k: v for k, v in _LEAD_BODY.items() if k != "meta"}
+    return [SimpleNamespace(id=i, created_at=created, meta={"source": "miniapp", "i": i}, **fields) for i in range(n)]
+
+
+@case("applications_page/dict_jsonable_encoder")
+def _applications_dict():
+    # the previous /me/applications path: a dict per row, jsonable_encoder, stdlib json
+    rows = _application_rows()
+
+    def run():
+        items = [
+            {
+                "id": r.id,
+                "created_at": r.created_at.isoformat(),
+                "city": r.city,
+                "exchange_type": r.exchange_type,
+                "receive_type": r.receive_type,
+                "sum": r.sum,
+                "wallet_address": r.wallet_address,
+                "meta": r.meta,
+            }
+            for r in rows
+        ]
+        return json.dumps(jsonable_encoder({"ok": True, "items": items, "next_cursor": None})).encode()
+
+    return run
+
+
+@case("applications_page/response_model")
+def _applications_model():
+    # what FastAPI does with response_model=ApplicationsPage: validate rows, dump to bytes
+    rows = _application_rows()
+    adapter = TypeAdapter(ApplicationsPage)
+    return lambda: adapter.dump_json(adapter.validate_python({"ok": True, "items": rows, "next_cursor": None}))
+
+
+def _calibrate(fn: Callable[[], Any], min_time: float) -> int:
+    """Smallest power-of-ten-ish call count whose run takes at least min_time."""
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time:
+            return number
+        number = max(number * 2, int(number * min_time / elapsed * 1.2) if elapsed > 0 else number * 10)
+
+
+def measure(fn: Callable[[], Any], *, min_time: float = 0.2, repeat: int = 5, warmup: float = 0.1) -> Dict[str, Any]:
+    _calibrate(fn, warmup)  # warm caches, lazy imports and the allocator
+    number = _calibrate(fn, min_time)
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - t0) / number * 1e9)
+    best = min(runs)
+    return {
+        "ns_per_op": round(best, 1),
+        "median_ns": round(statistics.median(runs), 1),
+        "ops_per_s": round(1e9 / best) if best else 0,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def profile(name: str, fn: Callable[[], Any], *, iterations: int, top: int, out_dir: Optional[str]) -> str:
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for _ in range(iterations):
+        fn()
+    profiler.disable()
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, name.replace("/", "__") + ".prof")
+        profiler.dump_stats(path)
+        return f"{name}: wrote {path}"
+    buf = io.StringIO()
+    pstats.Stats(profiler, stream=buf).sort_stats("cumulative").print_stats(top)
+    return f"== {name} ({iterations} calls) ==\n{buf.getvalue()}"
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    base = {r["case"]: r for r in baseline.get("results", [])}
+    rows = []
+    for r in current["results"]:
+        b = base.get(r["case"])
+        if b is None or not b["ns_per_op"]:
+            continue
+        delta = (r["ns_per_op"] - b["ns_per_op"]) / b["ns_per_op"]
+        rows.append(
+            {
+                "case": r["case"],
+                "ns_per_op": r["ns_per_op"],
+                "base_ns": b["ns_per_op"],
+                "delta": f"{delta:+.1%}",
+                "verdict": "REGRESSION" if delta > tolerance else "ok",
+            }
+        )
+    return rows
+
+
+def _versions() -> Dict[str, Optional[str]]:
+    out: Dict[str, Optional[str]] = {"python": platform.python_version()}
+    for dist in ("PyJWT", "pydantic", "pydantic-core", "fastapi"):
+        try:
+            out[dist] = metadata.version(dist)
+        except metadata.PackageNotFoundError:
+            out[dist] = None
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="filter", help="only cases whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat (default 0.2)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=float, default=0.1, help="seconds of warmup per case")
+    parser.add_argument("--profile", action="store_true", help="run each case under cProfile instead of timing")
+    parser.add_argument("--profile-iterations", type=int, default=20000)
+    parser.add_argument("--profile-top", type=int, default=15)
+    parser.add_argument("--profile-dir", help="write <case>.prof files here instead of printing")
+    parser.add_argument("--json", dest="json_out")
+    parser.add_argument("--baseline", help="report to compare against; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    names = [n for n in CASES if not args.filter or args.filter in n]
+    if not names:
+        print(f"no cases match {args.filter!r}", file=sys.stderr)
+        return 1
+
+    if args.profile:
+        for name in names:
+            print(profile(name, CASES[name](), iterations=args.profile_iterations, top=args.profile_top, out_dir=args.profile_dir))
+        return 0
+
+    results = []
+    for name in names:
+        results.append({"case": name, **measure(CASES[name](), min_time=args.min_time, repeat=args.repeat, warmup=args.warmup)})
+    report = {"meta": _versions(), "results": results}
+    print(format_table(results, ["case", "ns_per_op", "median_ns", "ops_per_s", "number"]))
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            rows = compare(report, json.load(f), args.tolerance)
+        print()
+        print(format_table(rows, ["case", "ns_per_op", "base_ns", "delta", "verdict"]))
+        if any(r["verdict"] == "REGRESSION" for r in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""Replay a traffic recording (see ``recorder.py``) against a running instance.
+
+    python -m bench.replay traffic.jsonl --target http://127.0.0.1:8000 --speed 1
+    python -m bench.replay traffic.jsonl --speed 10 --concurrency 64
+    python -m bench.replay traffic.jsonl --speed max --json replay.json
+
+Recorded credentials are redacted, so they are re-created for the target:
+
+- requests that carried a token get a fresh one for the recorded ``sub``, minted with
+  ``auth_tokens.create_token`` (the target must share ``JWT_SECRET``);
+- ``initData`` is re-signed with ``--bot-token`` (default: ``BOT_TOKEN``) and a current
+  ``auth_date``.
+
+Reports p50/p95/p99 latency per route.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode
+
+import httpx
+
+from auth_tokens import create_token
+from bench.stats import format_table, summarize
+from recorder import REDACTED
+from settings import settings
+from utils import _data_check_string, _webapp_secret_key
+
+# Never forwarded from the recording
+_DROP_HEADERS = {"host", "content-length", "connection", "accept-encoding", "transfer-encoding"}
+
+
+def load_records(path: str) -> List[Dict[str, Any]]:
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    records.sort(key=lambda r: r.get("ts") or 0)
+    return records
+
+
+def resign_init_data(init_data: str, bot_token: str, *, auth_date: Optional[int] = None) -> str:
+    """Return init_data with a fresh auth_date and a valid hash for bot_token."""
+    fields = {k: v for k, v in parse_qsl(init_data, keep_blank_values=True) if k not in ("hash", "signature")}
+    fields["auth_date"] = str(auth_date or int(time.time()))
+    dcs = _data_check_string(fields)
+    fields["hash"] = hmac.new(_webapp_secret_key(bot_token), dcs.encode("utf-8"), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+class RequestBuilder:
+    def __init__(self, *, bot_token: str, token_ttl_seconds: int = 3600):
+        self.bot_token = bot_token
+        self.token_ttl_seconds = token_ttl_seconds
+        self._tokens: Dict[tuple, str] = {}
+
+    def _token(self, token_type: str, sub: str) -> str:
+        key = (token_type, sub)
+        token = self._tokens.get(key)
+        if token is None:
+            token = create_token(token_type=token_type, subject=sub, ttl_seconds=self.token_ttl_seconds)
+            self._tokens[key] = token
+        return token
+
+    def build(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        headers = {
+            k: v
+            for k, v in (record.get("headers") or {}).items()
+            if k not in _DROP_HEADERS and v != REDACTED
+        }
+        sub = record.get("sub")
+        if sub:
+            if record.get("path") == "/auth/refresh":
+                headers["cookie"] = f"refresh_token={self._token('refresh', sub)}"
+            else:
+                headers["authorization"] = f"Bearer {self._token('access', sub)}"
+
+        body = record.get("body")
+        if isinstance(body, dict) and isinstance(body.get("initData"), str):
+            body = dict(body, initData=resign_init_data(body["initData"], self.bot_token))
+
+        url = record["path"] + (f"?{record['query']}" if record.get("query") else "")
+        req: Dict[str, Any] = {"method": record["method"], "url": url, "headers": headers}
+        if body is not None:
+            req["json"] = body
+        return req
+
+
+async def replay(
+    records: Iterable[Dict[str, Any]],
+    *,
+    target: str,
+    speed: Optional[float],
+    concurrency: int,
+    builder: RequestBuilder,
+    timeout: float = 30.0,
+) -> Dict[str, Any]:
+    """Re-issue records; speed=None means as fast as concurrency allows."""
+    records = list(records)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    max_lag_ms = 0.0
+
+    sem = asyncio.Semaphore(concurrency)
+    tasks = set()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits) as client:
+
+        async def _one(record: Dict[str, Any]) -> None:
+            route = f"{record['method']} {record.get('route') or record['path']}"
+            t0 = time.perf_counter()
+            try:
+                r = await client.request(**builder.build(record))
+                status = r.status_code
+            except Exception:
+                status = 0
+            finally:
+                sem.release()
+            latencies[route].append((time.perf_counter() - t0) * 1000)
+            statuses[route][status] += 1
+            if status == 0 or status >= 500:
+                errors[route] += 1
+
+        started = time.perf_counter()
+        ts0 = records[0].get("ts", 0) if records else 0
+        for record in records:
+            if speed:
+                due = (record.get("ts", ts0) - ts0) / speed
+                delay = due - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    max_lag_ms = max(max_lag_ms, -delay * 1000)
+            await sem.acquire()
+            task = asyncio.create_task(_one(record))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    routes = []
+    for route in sorted(latencies):
+        row: Dict[str, Any] = {"route": route, **summarize(latencies[route]), "errors": errors[route]}
+        row["statuses"] = dict(statuses[route])
+        routes.append(row)
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "target": target,
+        "speed": speed or "max",
+        "concurrency": concurrency,
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "max_schedule_lag_ms": round(max_lag_ms, 1),
+        "routes": routes,
+    }
+
+
+def _parse_speed(value: str) -> Optional[float]:
+    if value.lower() in ("max", "0"):
+        return None
+    speed = float(value.rstrip("xX"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", help="JSONL file written by the traffic recorder")
+    parser.add_argument("--target", default="http://127.0.0.1:8000")
+    parser.add_argument("--speed", type=_parse_speed, default=1.0, help="1, N (e.g. 10 or 10x) or 'max'")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--bot-token", default=settings.bot_token, help="used to re-sign initData")
+    parser.add_argument("--json", dest="json_out", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    records = load_records(args.recording)
+    if not records:
+        print("recording is empty", file=sys.stderr)
+        return 1
+
+    report = asyncio.run(
+        replay(
+            records,
+            target=args.target,
+            speed=args.speed,
+            concurrency=args.concurrency,
+            builder=RequestBuilder(bot_token=args.bot_token),
+            timeout=args.timeout,
+        )
+    )
+
+    print(format_table(report["routes"], ["route", "count", "errors", "p50_ms", "p95_ms", "p99_ms", "max_ms"]))
+    print(
+        f"\n{report['requests']} requests in {report['elapsed_s']}s "
+        f"({report['throughput_rps']} req/s, speed={report['speed']}, concurrency={report['concurrency']})"
+    )
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
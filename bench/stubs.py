@@ -0,0 +1,133 @@
+"""Local stand-ins for Webflow CMS and the Leadteh / AML webhooks.
+
+Plain asyncio HTTP/1.1 servers (keep-alive aware) with configurable latency, jitter
+and error rate, so the benchmark exercises the real outbound code paths without
+touching the network.
+"""
+
+import asyncio
+import json
+import random
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+# (method, path, query, body) -> (status, JSON payload)
+Handler = Callable[[str, str, Dict[str, str], bytes], Tuple[int, Any]]
+
+BENCH_CITIES = ["Москва", "Дубай", "Бали", "Стамбул", "Тбилиси"]
+
+
+class StubServer:
+    def __init__(
+        self,
+        handler: Handler,
+        *,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+    ):
+        self.handler = handler
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self.url = ""
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+
+    async def start(self) -> "StubServer":
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+
+    def config(self) -> Dict[str, Any]:
+        return {"latency_ms": self.latency_ms, "jitter_ms": self.jitter_ms, "error_rate": self.error_rate}
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self._respond(method, target, body)
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} Stub\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _respond(self, method: str, target: str, body: bytes) -> Tuple[int, Any]:
+        self.requests += 1
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            return self.error_status, {"error": "injected"}
+        parts = urlsplit(target)
+        return self.handler(method, parts.path, dict(parse_qsl(parts.query)), body)
+
+
+def webflow_handler(total_items: int = 250) -> Handler:
+    """Webflow v2 ``/collections/<id>/items`` with ``limit``/``offset`` pagination."""
+    items: List[Dict[str, Any]] = []
+    for i in range(total_items):
+        name = BENCH_CITIES[i] if i < len(BENCH_CITIES) else f"City {i}"
+        items.append(
+            {
+                "id": f"item-{i}",
+                "fieldData": {
+                    "name": name,
+                    "usdt-to-rub-5": f"{90 + i % 10}.5",
+                    "rub-to-usdt-2": f"{95 + i % 10}.1",
+                    "usdt-to-usd-4": "0.99",
+                    "usd-to-usdt-2": "1.01",
+                },
+            }
+        )
+
+    def handle(method: str, path: str, query: Dict[str, str], body: bytes) -> Tuple[int, Any]:
+        offset = int(query.get("offset") or 0)
+        limit = int(query.get("limit") or 100)
+        page = items[offset : offset + limit]
+        return 200, {"items": page, "pagination": {"limit": limit, "offset": offset, "total": len(items)}}
+
+    return handle
+
+
+def webhook_handler(method: str, path: str, query: Dict[str, str], body: bytes) -> Tuple[int, Any]:
+    """Leadteh ``inner_webhook`` (also used for the AML webhook): accept and acknowledge."""
+    return 200, {"ok": True}
@@ -0,0 +1,182 @@
+"""Per-upstream circuit breakers for ``http_client.request``.
+
+Each destination (Webflow, lead webhook, AML webhook) has its own breaker:
+
+- **closed**: calls go through. Over a sliding window of ``CIRCUIT_WINDOW_SECONDS``
+  (one-second buckets, so memory is constant), a call counts as failed if it raised,
+  timed out, answered 5xx/429 or took longer than ``CIRCUIT_SLOW_CALL_SECONDS``. With
+  at least ``CIRCUIT_MIN_CALLS`` calls in the window and a failure rate of
+  ``CIRCUIT_ERROR_RATE`` or more, the breaker opens.
+- **open**: calls raise ``CircuitOpenError`` at once, without touching the network, so
+  callers take their existing fallback (rate ``None``, webhook ``{"status": 0, ...}``,
+  outbox retry with backoff). After ``CIRCUIT_OPEN_SECONDS`` it goes half-open.
+- **half-open**: up to ``CIRCUIT_HALF_OPEN_CALLS`` trial calls go through at a time;
+  that many successes close the breaker, any failure opens it again.
+"""
+
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List
+
+import metrics
+from settings import settings
+
+log = logging.getLogger("miniapp")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"circuit open for {name} (retry in {retry_in:.1f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        *,
+        window_seconds: float,
+        min_calls: int,
+        error_rate: float,
+        slow_call_seconds: float,
+        open_seconds: float,
+        half_open_calls: int,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._buckets: Deque[List[int]] = deque()  # [second, calls, failures], oldest first
+        self._calls = 0
+        self._failures = 0
+        self._trials = 0  # half-open calls in flight
+        self._trial_successes = 0
+        metrics.CIRCUIT_STATE.set(0, name)
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call must not be made."""
+        if self.state == OPEN:
+            retry_in = self.opened_at + self.open_seconds - time.monotonic()
+            if retry_in > 0:
+                self.rejected += 1
+                metrics.CIRCUIT_REJECTED.inc(self.name)
+                raise CircuitOpenError(self.name, retry_in)
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._trials >= self.half_open_calls:
+                self.rejected += 1
+                metrics.CIRCUIT_REJECTED.inc(self.name)
+                raise CircuitOpenError(self.name, 0.0)
+            self._trials += 1
+
+    def record(self, *, ok: bool, duration: float) -> None:
+        failed = not ok or duration >= self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            self._trials = max(self._trials - 1, 0)
+            if failed:
+                self._transition(OPEN)
+            else:
+                self._trial_successes += 1
+                if self._trial_successes >= self.half_open_calls:
+                    self._transition(CLOSED)
+            return
+        if self.state == OPEN:
+            return  # a call started before the breaker opened
+
+        now = int(time.monotonic())
+        self._expire(now)
+        if not self._buckets or self._buckets[-1][0] != now:
+            self._buckets.append([now, 0, 0])
+        self._buckets[-1][1] += 1
+        self._calls += 1
+        if failed:
+            self._buckets[-1][2] += 1
+            self._failures += 1
+        if self._calls >= self.min_calls and self._failures / self._calls >= self.error_rate:
+            self._transition(OPEN)
+
+    def release(self) -> None:
+        """A call that was admitted but ended without an outcome (cancelled)."""
+        if self.state == HALF_OPEN:
+            self._trials = max(self._trials - 1, 0)
+
+    def _expire(self, now: int) -> None:
+        while self._buckets and self._buckets[0][0] <= now - self.window_seconds:
+            _, calls, failures = self._buckets.popleft()
+            self._calls -= calls
+            self._failures -= failures
+
+    def _transition(self, state: str) -> None:
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+            log.warning(
+                "Circuit for %s opened: %s/%s calls failed in the last %ss",
+                self.name,
+                self._failures,
+                self._calls,
+                self.window_seconds,
+            )
+        elif state == CLOSED:
+            log.info("Circuit for %s closed", self.name)
+        self.state = state
+        self._buckets.clear()
+        self._calls = self._failures = 0
+        self._trials = self._trial_successes = 0
+        metrics.CIRCUIT_STATE.set(_STATE_VALUES[state], self.name)
+
+    def reset(self) -> None:
+        self._transition(CLOSED)
+        self.times_opened = 0
+        self.rejected = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "window_calls": self._calls,
+            "window_failures": self._failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(
+            name,
+            window_seconds=settings.circuit_window_seconds,
+            min_calls=settings.circuit_min_calls,
+            error_rate=settings.circuit_error_rate,
+            slow_call_seconds=settings.circuit_slow_call_seconds,
+            open_seconds=settings.circuit_open_seconds,
+            half_open_calls=settings.circuit_half_open_calls,
+        )
+    return breaker
+
+
+def clear() -> None:
+    _breakers.clear()
+
+
+def stats() -> Dict[str, Any]:
+    return {name: breaker.stats() for name, breaker in sorted(_breakers.items())}
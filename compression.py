@@ -0,0 +1,156 @@
+"""gzip / brotli compression of API responses above ``COMPRESSION_MINIMUM_SIZE``.
+
+brotli is used when the ``brotli`` package is installed and the client prefers it.
+Left alone: responses that already carry a ``Content-Encoding`` (the precompressed
+``static_site`` pages and gzipped exports), partial content, ``text/event-stream``
+(``/rates/stream`` must flush every event) and already-compressed media types.
+Streamed bodies are compressed chunk by chunk, each chunk flushed.
+"""
+
+import zlib
+from functools import partial
+from typing import Callable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from accept_encoding import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+EXCLUDED_MEDIA_TYPES = frozenset(
+    {
+        "application/gzip",
+        "application/x-gzip",
+        "application/zip",
+        "audio/*",
+        "font/woff",
+        "font/woff2",
+        "image/avif",
+        "image/gif",
+        "image/jpeg",
+        "image/png",
+        "image/webp",
+        "text/event-stream",
+        "video/*",
+    }
+)
+
+
+class GzipEncoder:
+    content_encoding = "gzip"
+
+    def __init__(self, level: int = 6):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def encode(self, body: bytes, *, more_body: bool) -> bytes:
+        out = self._compressor.compress(body)
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    content_encoding = "br"
+
+    def __init__(self, quality: int = 4):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def encode(self, body: bytes, *, more_body: bool) -> bytes:
+        out = self._compressor.process(body)
+        return out + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _excluded(media_type: str) -> bool:
+    media_type = media_type.partition(";")[0].strip().lower()
+    return media_type in EXCLUDED_MEDIA_TYPES or f"{media_type.partition('/')[0]}/*" in EXCLUDED_MEDIA_TYPES
+
+
+class _Responder:
+    """One response: holds back ``http.response.start`` until the first body chunk decides."""
+
+    def __init__(self, send, minimum_size: int, new_encoder: Optional[Callable[[], object]]):
+        self.send = send
+        self.minimum_size = minimum_size
+        self.new_encoder = new_encoder
+        self.encoder = None
+        self.start: Optional[dict] = None  # held back until the first body chunk
+        self.passthrough = False
+
+    async def __call__(self, message) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] == 206
+                or _excluded(headers.get("content-type", ""))
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start = message
+            return
+
+        if kind != "http.response.body" or self.passthrough:
+            await self._release()
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            if len(body) < self.minimum_size and not more_body:
+                await self._release()
+                await self.send(message)
+                return
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if self.new_encoder is not None:
+                self.encoder = self.new_encoder()
+                body = self.encoder.encode(body, more_body=more_body)
+                headers["Content-Encoding"] = self.encoder.content_encoding
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+            await self._release()
+        elif self.encoder is not None:
+            body = self.encoder.encode(body, more_body=more_body)
+        await self.send({**message, "body": body})
+
+    async def _release(self) -> None:
+        if self.start is not None:
+            start, self.start = self.start, None
+            await self.send(start)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, *, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding == "br":
+            new_encoder = partial(BrotliEncoder, self.brotli_quality)
+        elif encoding == "gzip":
+            new_encoder = partial(GzipEncoder, self.gzip_level)
+        else:
+            new_encoder = None
+        await self.app(scope, receive, _Responder(send, self.minimum_size, new_encoder))
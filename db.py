@@ -1,7 +1,12 @@
+import time
+from typing import Any, Dict
+
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+import metrics
 from settings import settings
 
 
@@ -15,15 +20,122 @@ _SessionLocal = None
 _alembic_engine = None
 
 
+class PoolStats:
+    """Checkout wait times and connection ages for the app engine's pool."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.connections_opened = 0
+        self._opened_at: Dict[int, float] = {}
+
+    def record_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_total += seconds
+        metrics.DB_POOL_WAIT.observe(seconds)
+        if seconds > self.wait_max:
+            self.wait_max = seconds
+
+    def on_connect(self, dbapi_connection, connection_record) -> None:
+        self.connections_opened += 1
+        self._opened_at[id(connection_record)] = time.monotonic()
+
+    def on_close(self, dbapi_connection, connection_record) -> None:
+        self._opened_at.pop(id(connection_record), None)
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        now = time.monotonic()
+        ages = [now - t for t in self._opened_at.values()]
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": getattr(pool, "_max_overflow", None),
+            "checkouts": self.checkouts,
+            "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "connections_opened": self.connections_opened,
+            "connection_age_max_s": round(max(ages), 1) if ages else None,
+            "connection_age_avg_s": round(sum(ages) / len(ages), 1) if ages else None,
+        }
+
+
+pool_stats = PoolStats()
+
+
+class _InstrumentedPool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        # Time spent waiting for a free connection (including opening a new one)
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.record_wait(time.perf_counter() - t0)
+
+
+def _engine_options(dsn: str) -> Dict[str, Any]:
+    options: Dict[str, Any] = {
+        "echo": settings.db_echo,
+        "future": True,
+        "poolclass": _InstrumentedPool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    if "+asyncpg" in dsn:
+        # 0 disables server-side prepared statements (needed behind pgbouncer transaction mode)
+        options["connect_args"] = {
+            "statement_cache_size": settings.db_statement_cache_size,
+            "prepared_statement_cache_size": settings.db_statement_cache_size,
+        }
+    return options
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    # SQLite stand-in (local benchmarks): let readers overlap the writer and make
+    # concurrent writers wait instead of failing with "database is locked".
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=10000")
+    cursor.close()
+
+
 def get_engine():
     global _engine
     if _engine is None:
         if not POSTGRES_DSN or "://" not in POSTGRES_DSN:
             raise RuntimeError("POSTGRES_DSN is not configured")
-        _engine = create_async_engine(POSTGRES_DSN, echo=True, future=True)
+        _engine = create_async_engine(POSTGRES_DSN, **_engine_options(POSTGRES_DSN))
+        event.listen(_engine.sync_engine.pool, "connect", pool_stats.on_connect)
+        event.listen(_engine.sync_engine.pool, "close", pool_stats.on_close)
+        metrics.instrument_engine(_engine.sync_engine)
+        if _engine.dialect.name == "sqlite":
+            event.listen(_engine.sync_engine, "connect", _sqlite_pragmas)
     return _engine
 
 
+def get_pool_stats() -> Dict[str, Any] | None:
+    """Live pool numbers, or None if the engine has not been created yet."""
+    if _engine is None:
+        return None
+    return pool_stats.snapshot(_engine.sync_engine.pool)
+
+
+def _collect_pool_metrics() -> None:
+    if _engine is None:
+        return
+    pool = _engine.sync_engine.pool
+    metrics.DB_POOL_CHECKED_OUT.set(pool.checkedout())
+    metrics.DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+metrics.REGISTRY.register_collector(_collect_pool_metrics)
+
+
 def get_sessionmaker():
     global _SessionLocal
     if _SessionLocal is None:
@@ -36,10 +148,22 @@ def get_alembic_engine():
     if _alembic_engine is None:
         if not POSTGRES_DSN_SYNC or "://" not in POSTGRES_DSN_SYNC:
             raise RuntimeError("POSTGRES_DSN is not configured")
-        _alembic_engine = create_engine(POSTGRES_DSN_SYNC, echo=True, future=True)
+        _alembic_engine = create_engine(POSTGRES_DSN_SYNC, echo=settings.db_echo, future=True)
     return _alembic_engine
 
 
+def dialect_insert(session, model):
+    """``INSERT`` construct with ``on_conflict_*`` support for the session's database.
+
+    Postgres in production; SQLite is accepted for tests and local benchmarks.
+    """
+    if session.bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model)
+
+
 # Backwards-compatible names (created lazily)
 class _LazySessionLocal:
     def __call__(self, *args, **kwargs):
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict
+
+import httpx
+
+import metrics
+from circuit_breaker import CircuitOpenError, get_breaker  # noqa: F401  (CircuitOpenError re-exported)
+from settings import settings
+
+log = logging.getLogger("miniapp")
+
+# Outbound destinations; each has its own timeout in settings.
+WEBFLOW = "webflow"
+LEAD_WEBHOOK = "lead_webhook"
+AML_WEBHOOK = "aml_webhook"
+
+_client: httpx.AsyncClient | None = None
+_host_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+def _http2_enabled() -> bool:
+    if not settings.http2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        log.warning("HTTP2 requested but the 'h2' package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+def _build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry_seconds,
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        http2=_http2_enabled(),
+        timeout=timeout_for(None),
+        follow_redirects=True,
+    )
+
+
+def timeout_for(destination: str | None) -> httpx.Timeout:
+    read = {
+        WEBFLOW: settings.webflow_timeout_seconds,
+        LEAD_WEBHOOK: settings.lead_webhook_timeout_seconds,
+        AML_WEBHOOK: settings.aml_webhook_timeout_seconds,
+    }.get(destination or "", 10.0)
+    return httpx.Timeout(
+        connect=settings.http_connect_timeout_seconds,
+        read=read,
+        write=read,
+        pool=settings.http_pool_timeout_seconds,
+    )
+
+
+def deadline_for(destination: str | None) -> float:
+    return {
+        WEBFLOW: settings.webflow_deadline_seconds,
+        LEAD_WEBHOOK: settings.lead_webhook_deadline_seconds,
+        AML_WEBHOOK: settings.aml_webhook_deadline_seconds,
+    }.get(destination or "", 10.0)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the app-wide client (created lazily outside of the FastAPI lifespan)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def start_http_client() -> None:
+    get_http_client()
+
+
+async def close_http_client() -> None:
+    global _client
+    client, _client = _client, None
+    _host_slots.clear()
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def _host_slot(url: str) -> asyncio.Semaphore:
+    host = httpx.URL(url).host
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = asyncio.Semaphore(settings.http_max_connections_per_host)
+        _host_slots[host] = slot
+    return slot
+
+
+async def request(destination: str, method: str, url: str, **kwargs: Any) -> httpx.Response:
+    """Send a request through the shared client with the destination's timeout.
+
+    Concurrency per host is capped by HTTP_MAX_CONNECTIONS_PER_HOST so one slow
+    upstream cannot take every pooled connection. The whole call, slot wait included,
+    is bounded by the destination's deadline, and while its circuit breaker is open
+    this raises CircuitOpenError without touching the network.
+    """
+    breaker = get_breaker(destination) if settings.circuit_breaker_enabled else None
+    if breaker is not None:
+        breaker.before_call()
+    kwargs.setdefault("timeout", timeout_for(destination))
+    t0 = time.perf_counter()
+    try:
+        async with asyncio.timeout(deadline_for(destination)):
+            async with _host_slot(url):
+                response = await get_http_client().request(method, url, **kwargs)
+    except asyncio.CancelledError:
+        # the caller went away; says nothing about the upstream
+        if breaker is not None:
+            breaker.release()
+        raise
+    except Exception as e:
+        elapsed = time.perf_counter() - t0
+        if breaker is not None:
+            breaker.record(ok=False, duration=elapsed)
+        metrics.UPSTREAM_DURATION.observe(elapsed, destination, "error")
+        metrics.UPSTREAM_ERRORS.inc(destination, type(e).__name__)
+        raise
+    elapsed = time.perf_counter() - t0
+    if breaker is not None:
+        breaker.record(ok=response.status_code < 500 and response.status_code != 429, duration=elapsed)
+    metrics.UPSTREAM_DURATION.observe(elapsed, destination, str(response.status_code))
+    if response.status_code >= 400:
+        metrics.UPSTREAM_ERRORS.inc(destination, f"{response.status_code // 100}xx")
+    return response
@@ -0,0 +1,195 @@
+"""Idempotent ``POST /leads`` (and ``/leads/batch``): a retry gets the first response back.
+
+Telegram webviews on flaky mobile networks resend the lead form. A request is keyed
+per user by its ``Idempotency-Key`` header (kept for ``IDEMPOTENCY_KEY_TTL_SECONDS``)
+or, without one, by a hash of the body (kept for ``IDEMPOTENCY_BODY_WINDOW_SECONDS``,
+so an identical lead submitted again later is a new lead).
+
+- In process: a per-key lock serializes duplicates, and a bounded TTL + LRU map of
+  recent responses answers repeats without touching the database.
+- Across workers and replicas: the ``idempotency_keys`` row is claimed with
+  ``INSERT ... ON CONFLICT DO NOTHING`` in the lead's own transaction. A concurrent
+  duplicate blocks on the unique key until that transaction commits, then reads the
+  stored response instead of inserting a second lead (and outbox row).
+
+The same header key with a different body is a client bug and gets ``422``.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db import dialect_insert
+from keyed_lock import KeyedLock
+from models.idempotency_key import IdempotencyKey
+from settings import settings
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+Entry = Tuple[str, str]  # (tg_user_id, key)
+
+
+@dataclass(frozen=True)
+class RequestKey:
+    key: str
+    request_hash: str
+    ttl_seconds: float
+
+
+def request_hash(body: Dict[str, Any]) -> str:
+    canonical = json.dumps(body, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def request_key(request: Request, body: Dict[str, Any]) -> RequestKey:
+    digest = request_hash(body)
+    header = request.headers.get(HEADER)
+    if header is None:
+        return RequestKey(f"b:{digest}", digest, settings.idempotency_body_window_seconds)
+    header = header.strip()
+    if not 0 < len(header) <= MAX_KEY_LENGTH:
+        raise HTTPException(400, f"{HEADER} must be 1-{MAX_KEY_LENGTH} characters")
+    return RequestKey(f"h:{header}", digest, settings.idempotency_key_ttl_seconds)
+
+
+def _mismatch() -> HTTPException:
+    return HTTPException(422, f"{HEADER} was already used with a different request body")
+
+
+class IdempotencyStore:
+    """TTL + LRU map of (user, key) to the first response, plus per-key locks."""
+
+    def __init__(self, *, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Entry, Tuple[str, Dict[str, Any], float]]" = OrderedDict()
+        self._locks = KeyedLock()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def lock(self, entry: Entry):
+        return self._locks.hold(entry)
+
+    def get(self, entry: Entry, digest: str) -> Optional[Dict[str, Any]]:
+        stored = self._entries.get(entry)
+        if stored is None:
+            return None
+        stored_hash, response, expires_at = stored
+        if expires_at <= time.time():
+            del self._entries[entry]
+            return None
+        if stored_hash != digest:
+            raise _mismatch()
+        self._entries.move_to_end(entry)
+        self.hits += 1
+        return response
+
+    def put(self, entry: Entry, digest: str, response: Dict[str, Any], expires_at: float) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[entry] = (digest, response, expires_at)
+        self._entries.move_to_end(entry)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "in_flight": len(self._locks),
+        }
+
+
+idempotency_store = IdempotencyStore(max_entries=settings.idempotency_cache_max_entries)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _timestamp(value: datetime) -> float:
+    # SQLite hands back naive datetimes; they were written as UTC
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+
+async def claim(db: AsyncSession, tg_user_id: str, rk: RequestKey) -> Optional[Dict[str, Any]]:
+    """Claim ``rk`` in the caller's transaction, or return the response already stored.
+
+    ``None`` means the caller owns the key and must ``record`` its response before
+    committing. An expired row is taken over as if it did not exist.
+    """
+    now = _utcnow()
+    values = {
+        "tg_user_id": tg_user_id,
+        "key": rk.key,
+        "request_hash": rk.request_hash,
+        "response": None,
+        "lead_id": None,
+        "created_at": now,
+        "expires_at": now + timedelta(seconds=rk.ttl_seconds),
+    }
+    insert_stmt = dialect_insert(db, IdempotencyKey).values(**values)
+    stmt = insert_stmt.on_conflict_do_update(
+        index_elements=[IdempotencyKey.tg_user_id, IdempotencyKey.key],
+        set_={k: v for k, v in values.items() if k not in ("tg_user_id", "key")},
+        where=IdempotencyKey.expires_at <= now,
+    ).returning(IdempotencyKey.key)
+    if (await db.execute(stmt)).first() is not None:
+        idempotency_store.misses += 1
+        return None
+
+    row = (
+        await db.execute(
+            select(IdempotencyKey).where(IdempotencyKey.tg_user_id == tg_user_id, IdempotencyKey.key == rk.key)
+        )
+    ).scalars().one()
+    if row.request_hash != rk.request_hash:
+        raise _mismatch()
+    if row.response is None:
+        # only visible if the first request's transaction never wrote it
+        raise HTTPException(409, "The original request is still being processed")
+    idempotency_store.db_hits += 1
+    idempotency_store.put((tg_user_id, rk.key), rk.request_hash, row.response, _timestamp(row.expires_at))
+    return row.response
+
+
+async def record(
+    db: AsyncSession, tg_user_id: str, rk: RequestKey, lead_id: Optional[int], response: Dict[str, Any]
+) -> None:
+    """Store the response on the claimed row (committed with the lead)."""
+    await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.tg_user_id == tg_user_id, IdempotencyKey.key == rk.key)
+        .values(lead_id=lead_id, response=response)
+    )
+
+
+def remember(tg_user_id: str, rk: RequestKey, response: Dict[str, Any]) -> None:
+    """After the commit: answer further repeats from memory."""
+    idempotency_store.put((tg_user_id, rk.key), rk.request_hash, response, time.time() + rk.ttl_seconds)
+
+
+async def purge_expired(db: AsyncSession) -> int:
+    result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= _utcnow()))
+    await db.commit()
+    return result.rowcount or 0
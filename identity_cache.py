@@ -0,0 +1,84 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from settings import settings
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Detached snapshot of a ``users`` row (safe to share between sessions)."""
+
+    id: int
+    tg_user_id: str
+    username: Optional[str]
+
+    @classmethod
+    def from_user(cls, user: Any) -> "CachedUser":
+        return cls(id=user.id, tg_user_id=user.tg_user_id, username=user.username)
+
+
+class IdentityCache:
+    """TTL + LRU map of ``tg_user_id`` (the access token ``sub``) to the user record.
+
+    An entry never outlives the token it was loaded for: its expiry is
+    ``min(now + ttl_seconds, token exp)``. The JWT itself is still verified on every
+    request; only the ``users`` lookup is skipped.
+    """
+
+    def __init__(self, *, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[CachedUser, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, tg_user_id: str) -> Optional[CachedUser]:
+        entry = self._entries.get(tg_user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[tg_user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(tg_user_id)
+        self.hits += 1
+        return user
+
+    def put(self, user: CachedUser, *, token_exp: Any = None) -> None:
+        if self.max_entries <= 0:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if isinstance(token_exp, (int, float)):
+            expires_at = min(expires_at, float(token_exp))
+        self._entries[user.tg_user_id] = (user, expires_at)
+        self._entries.move_to_end(user.tg_user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, tg_user_id: str) -> None:
+        self._entries.pop(tg_user_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+
+identity_cache = IdentityCache(
+    max_entries=settings.identity_cache_max_entries,
+    ttl_seconds=settings.identity_cache_ttl_seconds,
+)
@@ -0,0 +1,30 @@
+"""Per-key asyncio locks for one process (per-user idempotency keys, AML wallet checks)."""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Hashable, List
+
+
+class KeyedLock:
+    """An ``asyncio.Lock`` per key, created on first use and dropped once nobody holds or
+    waits on it, so the map only ever holds keys that are in use."""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, List[Any]] = {}  # key -> [lock, holders + waiters]
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._locks)
@@ -0,0 +1,164 @@
+"""Streaming export of ``leads`` as NDJSON or CSV.
+
+Rows are read through a server-side cursor (``yield_per``) and emitted one chunk per
+partition, so memory stays flat regardless of table size. Used by
+``GET /admin/leads/export`` and as a CLI::
+
+    python -m lead_export --format csv --from 2026-01-01 --to 2026-02-01 -o leads.csv
+    python -m lead_export --city Москва --gzip > leads.ndjson.gz
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.future import select
+
+from models.lead import Lead
+from settings import settings
+
+FORMATS = ("ndjson", "csv")
+
+EXPORT_COLUMNS = (
+    Lead.id,
+    Lead.created_at,
+    Lead.tg_user_id,
+    Lead.username,
+    Lead.city,
+    Lead.exchange_type,
+    Lead.receive_type,
+    Lead.sum,
+    Lead.wallet_address,
+    Lead.meta,
+    Lead.webhook_status,
+    Lead.webhook_delivered_at,
+)
+FIELD_NAMES = [c.key for c in EXPORT_COLUMNS]
+
+
+def export_query(
+    *,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    city: Optional[str] = None,
+    exchange_type: Optional[str] = None,
+):
+    """Leads in ``[created_from, created_to)`` matching the optional filters, oldest first."""
+    stmt = select(*EXPORT_COLUMNS)
+    if created_from is not None:
+        stmt = stmt.where(Lead.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(Lead.created_at < created_to)
+    if city:
+        stmt = stmt.where(Lead.city == city)
+    if exchange_type:
+        stmt = stmt.where(Lead.exchange_type == exchange_type)
+    return stmt.order_by(Lead.created_at, Lead.id)
+
+
+def _jsonable(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def _partitions(engine: AsyncEngine, stmt) -> AsyncIterator[Sequence[Any]]:
+    chunk_rows = settings.export_chunk_rows
+    async with engine.connect() as conn:
+        result = await conn.stream(stmt.execution_options(yield_per=chunk_rows))
+        async for partition in result.partitions(chunk_rows):
+            yield partition
+
+
+async def iter_ndjson(engine: AsyncEngine, stmt) -> AsyncIterator[bytes]:
+    async for rows in _partitions(engine, stmt):
+        lines = [
+            json.dumps({k: _jsonable(v) for k, v in zip(FIELD_NAMES, row)}, ensure_ascii=False)
+            for row in rows
+        ]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def iter_csv(engine: AsyncEngine, stmt) -> AsyncIterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(FIELD_NAMES)
+    yield buf.getvalue().encode("utf-8")
+
+    async for rows in _partitions(engine, stmt):
+        buf.seek(0)
+        buf.truncate()
+        for row in rows:
+            writer.writerow(
+                [json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else _jsonable(v) for v in row]
+            )
+        yield buf.getvalue().encode("utf-8")
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    async for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def iter_export(engine: AsyncEngine, fmt: str, *, gzip: bool = False, **filters: Any) -> AsyncIterator[bytes]:
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format: {fmt}")
+    stmt = export_query(**filters)
+    body = iter_ndjson(engine, stmt) if fmt == "ndjson" else iter_csv(engine, stmt)
+    return gzip_stream(body) if gzip else body
+
+
+async def _write(out, chunks: AsyncIterator[bytes]) -> None:
+    async for chunk in chunks:
+        out.write(chunk)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export leads as NDJSON or CSV")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--from", dest="created_from", type=datetime.fromisoformat, help="created_at >= (ISO 8601)")
+    parser.add_argument("--to", dest="created_to", type=datetime.fromisoformat, help="created_at < (ISO 8601)")
+    parser.add_argument("--city")
+    parser.add_argument("--exchange-type")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("-o", "--output", help="file path (default: stdout)")
+    args = parser.parse_args(argv)
+
+    from db import get_engine
+
+    async def _run() -> None:
+        engine = get_engine()
+        chunks = iter_export(
+            engine,
+            args.format,
+            gzip=args.gzip,
+            created_from=args.created_from,
+            created_to=args.created_to,
+            city=args.city,
+            exchange_type=args.exchange_type,
+        )
+        try:
+            if args.output:
+                with open(args.output, "wb") as f:
+                    await _write(f, chunks)
+            else:
+                await _write(sys.stdout.buffer, chunks)
+                sys.stdout.buffer.flush()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(_run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""Non-blocking logging: JSON lines, per-logger sampling and redaction.
+
+``configure_logging()`` routes the root logger through a bounded queue. The calling
+thread (usually the event loop) only runs the sampling filter and enqueues the record.
+Message formatting, ``json.dumps`` of dict/list arguments, redaction and the write
+happen on a ``QueueListener`` thread. When the queue is full, records are dropped and
+counted instead of blocking a request.
+
+Sampling applies to INFO and below. LOG_SAMPLE_RATES maps logger names to keep-rates,
+e.g. ``{"miniapp.leads": 0.1}``. Child loggers inherit the nearest configured ancestor.
+WARNING and above are always kept.
+
+Redaction covers the structured args and the final text. JWTs, bearer tokens,
+initData ``hash``/``signature`` and hex digests are replaced. Wallet addresses are
+shortened to ``abcd…wxyz``.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import sys
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from settings import settings
+
+REDACTED = "[redacted]"
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+
+_SENSITIVE_KEYS = {
+    "access_token",
+    "refresh_token",
+    "token",
+    "hash",
+    "signature",
+    "password",
+    "secret",
+    "api_key",
+    "authorization",
+    "cookie",
+}
+_WALLET_KEYS = {"wallet", "wallet_address", "aml_wallet_address"}
+_MAX_STRING = 500
+
+_TEXT_PATTERNS = [
+    (re.compile(r"\beyJ[\w-]+\.[\w-]+\.[\w-]+"), REDACTED),  # JWT
+    (re.compile(r"(?i)\b(bearer\s+)[\w.~+/-]+=*"), r"\1" + REDACTED),
+    (re.compile(r"\b((?:hash|signature)=)[^&\s\"']+"), r"\1" + REDACTED),  # initData fields
+    (re.compile(r"\b[0-9a-fA-F]{64}\b"), REDACTED),  # sha256 hex digests
+]
+_WALLET_RE = re.compile(
+    r"\b(?:0x[0-9a-fA-F]{40}"  # EVM
+    r"|T[1-9A-HJ-NP-Za-km-z]{33}"  # TRON
+    r"|bc1[02-9ac-hj-np-z]{25,87}"  # BTC bech32
+    r"|[13][1-9A-HJ-NP-Za-km-z]{25,34})\b"  # BTC legacy
+)
+
+
+def mask_wallet(value: str) -> str:
+    value = value.strip()
+    if len(value) <= 12:
+        return REDACTED
+    return f"{value[:4]}…{value[-4:]}"
+
+
+def redact_text(text: str) -> str:
+    for pattern, repl in _TEXT_PATTERNS:
+        text = pattern.sub(repl, text)
+    return _WALLET_RE.sub(lambda m: mask_wallet(m.group(0)), text)
+
+
+def redact_value(value: Any) -> Any:
+    """Redact sensitive keys in nested dicts/lists and truncate long strings."""
+    if isinstance(value, Mapping):
+        out: Dict[str, Any] = {}
+        for k, v in value.items():
+            if k in _SENSITIVE_KEYS and v is not None:
+                out[k] = REDACTED
+            elif k in _WALLET_KEYS and isinstance(v, str):
+                out[k] = mask_wallet(v)
+            else:
+                out[k] = redact_value(v)
+        return out
+    if isinstance(value, (list, tuple)):
+        return [redact_value(v) for v in value]
+    if isinstance(value, str) and len(value) > _MAX_STRING:
+        return value[:_MAX_STRING] + "…"
+    return value
+
+
+def _render_arg(arg: Any) -> Any:
+    if isinstance(arg, (Mapping, list, tuple)):
+        return json.dumps(redact_value(arg), ensure_ascii=False, default=str)
+    return arg
+
+
+def render_message(record: logging.LogRecord) -> str:
+    msg = str(record.msg)
+    args = record.args
+    if args:
+        try:
+            if isinstance(args, Mapping):
+                # log.info("%s", some_dict) arrives as a mapping, unlike "%(key)s" formats
+                msg = msg % (redact_value(args) if "%(" in msg else (_render_arg(args),))
+            else:
+                msg = msg % tuple(_render_arg(a) for a in args)
+        except (TypeError, ValueError):
+            msg = f"{msg} {args!r}"
+    return redact_text(msg)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": render_message(record),
+        }
+        if record.exc_info:
+            entry["exc"] = redact_text(self.formatException(record.exc_info))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        record.msg, record.args = render_message(record), None
+        return super().format(record)
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = dict(rates)
+        self.sampled_out = 0
+        self._cache: Dict[str, float] = {}
+
+    def rate_for(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate, probe = 1.0, name
+            while probe:
+                if probe in self.rates:
+                    rate = self.rates[probe]
+                    break
+                probe = probe.rpartition(".")[0]
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class _QueueHandler(QueueHandler):
+    def __init__(self, q: "queue.Queue[logging.LogRecord]"):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # No formatting here (the listener does it); only detach top-level containers
+        # so a dict mutated after the log call is logged as it was at the call.
+        if isinstance(record.args, dict):
+            record.args = dict(record.args)
+        elif record.args:
+            record.args = tuple(
+                dict(a) if isinstance(a, dict) else list(a) if isinstance(a, list) else a for a in record.args
+            )
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler: Optional[_QueueHandler] = None
+_sampler: Optional[SamplingFilter] = None
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(*, force: bool = False) -> None:
+    """Install the queue pipeline on the root logger.
+
+    Like ``logging.basicConfig``, does nothing if the root logger already has handlers
+    (e.g. under pytest) unless ``force`` is set.
+    """
+    global _handler, _sampler, _listener
+    root = logging.getLogger()
+    if root.handlers and not force:
+        return
+    stop_logging()
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if settings.log_format == "json" else TextFormatter(TEXT_FORMAT))
+
+    q: "queue.Queue[logging.LogRecord]" = queue.Queue(settings.log_queue_size)
+    _handler = _QueueHandler(q)
+    _sampler = SamplingFilter(settings.log_sample_rates)
+    _handler.addFilter(_sampler)
+
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(_handler)
+    root.setLevel(settings.log_level.upper())
+
+    _listener = QueueListener(q, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def stats() -> Dict[str, Any] | None:
+    if _handler is None or _sampler is None:
+        return None
+    return {
+        "queued": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+        "sampled_out": _sampler.sampled_out,
+    }
+
+
+atexit.register(stop_logging)
@@ -1,15 +1,113 @@
+import asyncio
 import logging
-from fastapi import FastAPI
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from routers.auth import auth_router
 from routers.users import users_router
-from routers.leads import leads_router
-from routers.aml import aml_router
+from routers.leads import leads_router, _post_webhook_json
+from routers.aml import aml_router, _post_aml_webhook_json
+from routers.admin import admin_router, _require_admin
+from routers.rates import rates_router, rates_feed
+from rates_cache import rates_cache
+from identity_cache import identity_cache
+import idempotency
+from http_client import start_http_client, close_http_client
+from outbox import OutboxWorker
+from aml_jobs import AMLJobPool
+from recorder import TrafficRecorderMiddleware
+import circuit_breaker
+import compression
+import metrics
+import ratelimit
+import log_pipeline
+from static_site import StaticSite
+from settings import settings
+from db import get_pool_stats, get_sessionmaker
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+log_pipeline.configure_logging()
 log = logging.getLogger("miniapp")
 
-app = FastAPI(title="MiniApp backend logger")
+# Filled in once the lifespan startup has finished (see _boot_stats)
+boot: dict = {}
+
+
+async def _log_pool_stats(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        stats = get_pool_stats()
+        if stats is not None:
+            log.info("DB_POOL %s", stats)
+
+
+def _boot_stats(started_at: float, ready_at: float) -> dict:
+    """Lifespan startup time, and seconds since start.sh began (BOOT_STARTED_AT) if set."""
+    stats = {"startup_seconds": round(ready_at - started_at, 3)}
+    try:
+        stats["boot_to_ready_seconds"] = round(ready_at - float(os.environ["BOOT_STARTED_AT"]), 3)
+    except (KeyError, ValueError):
+        pass
+    return stats
+
+
+async def _purge_idempotency_keys(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with get_sessionmaker()() as db:
+                purged = await idempotency.purge_expired(db)
+            if purged:
+                log.info("Purged %s expired idempotency keys", purged)
+        except Exception:
+            log.exception("Idempotency key purge failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started_at = time.time()
+    await start_http_client()
+    outbox_worker = None
+    if settings.lead_webhook_url and settings.outbox_worker_enabled:
+        outbox_worker = OutboxWorker(send=_post_webhook_json)
+        outbox_worker.start()
+    aml_pool = AMLJobPool(send=_post_aml_webhook_json)
+    await aml_pool.start()
+    pool_logger = None
+    if settings.db_pool_log_interval_seconds > 0:
+        pool_logger = asyncio.create_task(_log_pool_stats(settings.db_pool_log_interval_seconds))
+    idempotency_purger = None
+    if settings.idempotency_purge_interval_seconds > 0:
+        idempotency_purger = asyncio.create_task(_purge_idempotency_keys(settings.idempotency_purge_interval_seconds))
+    metrics_flusher = None
+    if settings.metrics_enabled and settings.metrics_multiproc_dir:
+        metrics_flusher = asyncio.create_task(metrics.run_flusher())
+    boot.update(_boot_stats(started_at, time.time()))
+    log.info("READY pid=%s %s", os.getpid(), boot)
+    try:
+        yield
+    finally:
+        await rates_feed.stop()
+        if metrics_flusher is not None:
+            metrics_flusher.cancel()
+            metrics.remove_snapshot()
+        if pool_logger is not None:
+            pool_logger.cancel()
+        if idempotency_purger is not None:
+            idempotency_purger.cancel()
+        await aml_pool.stop()
+        if outbox_worker is not None:
+            await outbox_worker.stop()
+        await close_http_client()
+        log_pipeline.stop_logging()
+
+
+app = FastAPI(title="MiniApp backend logger", lifespan=lifespan)
+if settings.rate_limits:
+    # Innermost, so 429s still carry CORS headers; runs before routing and any DB session
+    app.add_middleware(ratelimit.RateLimitMiddleware, limits=settings.rate_limits, store=ratelimit.rate_limit_store)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -20,12 +118,62 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if settings.traffic_record_path:
+    app.add_middleware(
+        TrafficRecorderMiddleware,
+        path=settings.traffic_record_path,
+        sample_rate=settings.traffic_record_sample_rate,
+        max_body_bytes=settings.traffic_record_max_body_bytes,
+    )
+if settings.compression_enabled:
+    app.add_middleware(
+        compression.CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+    )
+if settings.metrics_enabled:
+    # Added last so it is outermost and times the whole request
+    app.add_middleware(metrics.MetricsMiddleware)
 
 @app.get("/health")
 def health():
     return {"ok": True}
 
+
+@app.get("/health/stats")
+def health_stats(request: Request):
+    # internals of pools, caches and limiters: admins only (X-Admin-Token); /health stays public
+    _require_admin(request)
+    return {
+        "rates_cache": rates_cache.stats(),
+        "identity_cache": identity_cache.stats(),
+        "idempotency": idempotency.idempotency_store.stats(),
+        "db_pool": get_pool_stats(),
+        "logging": log_pipeline.stats(),
+        "rates_feed": rates_feed.stats(),
+        "rate_limit": ratelimit.rate_limit_store.stats(),
+        "circuit_breakers": circuit_breaker.stats(),
+        "boot": boot,
+    }
+
+
+if settings.metrics_enabled:
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint():
+        return Response(await metrics.render_latest(), media_type=metrics.CONTENT_TYPE)
+
 app.include_router(auth_router)
 app.include_router(users_router)
 app.include_router(leads_router)
-app.include_router(aml_router)
\ No newline at end of file
+app.include_router(aml_router)
+app.include_router(admin_router)
+app.include_router(rates_router)
+if settings.static_site_dir:
+    static_site = StaticSite(
+        settings.static_site_dir,
+        html_cache_control=settings.static_html_cache_control,
+        asset_cache_control=settings.static_asset_cache_control,
+    )
+    app.include_router(static_site.router(settings.static_site_prefix))
\ No newline at end of file
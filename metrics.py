@@ -0,0 +1,374 @@
+"""Prometheus-compatible metrics (text exposition format 0.0.4) at ``GET /metrics``.
+
+Everything is updated from the event loop thread, so the hot path is a dict lookup and
+a couple of increments: no locks. Snapshots are taken on the loop too; only the copies
+go to a thread (file I/O, merging, rendering). With several uvicorn workers set
+``METRICS_MULTIPROC_DIR``: each worker periodically writes a JSON snapshot of its
+values there and ``/metrics`` (answered by whichever worker) sums all snapshots. A
+worker removes its file on shutdown; files not rewritten for ``STALE_FLUSHES`` flush
+intervals (a worker that was killed) are left out.
+"""
+
+import asyncio
+import functools
+import glob
+import inspect
+import json
+import logging
+import math
+import os
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from settings import settings
+
+log = logging.getLogger("miniapp")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+Labels = Tuple[str, ...]
+
+STALE_FLUSHES = 3  # a snapshot older than this many flush intervals is a dead worker's
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, Any] = {}
+        REGISTRY.register(self)
+
+    def values(self) -> Dict[Labels, Any]:
+        return self._values
+
+    def clear(self) -> None:
+        self._values.clear()
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    @staticmethod
+    def merge(a: Any, b: Any) -> Any:
+        return a + b
+
+
+class Gauge(_Metric):
+    """``mode`` says how workers' values combine: ``"sum"`` (counts) or ``"max"`` (levels)."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), mode: str = "sum"):
+        if mode not in ("sum", "max"):
+            raise ValueError(f"unknown gauge mode {mode!r}")
+        super().__init__(name, help, labelnames)
+        self.mode = mode
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = float(value)
+
+    def merge(self, a: Any, b: Any) -> Any:
+        return max(a, b) if self.mode == "max" else a + b
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        state = self._values.get(labels)
+        if state is None:
+            # per-bucket counts (last one is +Inf), then the sum
+            state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    @staticmethod
+    def merge(a: Any, b: Any) -> Any:
+        return [x + y for x, y in zip(a, b)]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics[metric.name] = metric
+
+    def register_collector(self, fn: Callable[[], None]) -> None:
+        """fn refreshes gauges right before a scrape or snapshot."""
+        self._collectors.append(fn)
+
+    def clear(self) -> None:
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def collect(self) -> None:
+        for fn in self._collectors:
+            try:
+                fn()
+            except Exception:
+                log.exception("Metrics collector failed")
+
+    def snapshot(self) -> Dict[str, List[Any]]:
+        """A copy of every value (histogram states included); call on the event loop thread."""
+        self.collect()
+        return {
+            name: [[list(k), list(v) if isinstance(v, list) else v] for k, v in m.values().items()]
+            for name, m in self._metrics.items()
+        }
+
+    def merged(self, snapshots: Iterable[Dict[str, List[Any]]]) -> Dict[str, Dict[Labels, Any]]:
+        out: Dict[str, Dict[Labels, Any]] = {name: {} for name in self._metrics}
+        for snap in snapshots:
+            for name, series in snap.items():
+                metric = self._metrics.get(name)
+                if metric is None:
+                    continue
+                values = out[name]
+                for labels, value in series:
+                    key = tuple(labels)
+                    values[key] = metric.merge(values[key], value) if key in values else value
+        return out
+
+    def render(self, values: Dict[str, Dict[Labels, Any]]) -> str:
+        lines: List[str] = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for labels, value in sorted(values.get(name, {}).items()):
+                base = list(zip(metric.labelnames, labels))
+                if isinstance(metric, Histogram):
+                    acc = 0
+                    for le, count in zip(metric.buckets + (math.inf,), value):
+                        acc += count
+                        lines.append(f"{name}_bucket{_labels(base + [('le', _num(le))])} {acc}")
+                    lines.append(f"{name}_sum{_labels(base)} {_num(value[-1])}")
+                    lines.append(f"{name}_count{_labels(base)} {acc}")
+                else:
+                    lines.append(f"{name}{_labels(base)} {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: List[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + "}"
+
+
+def _num(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status.",
+    ("method", "route", "status"),
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "SQL statement execution time by statement type.",
+    ("operation",),
+    buckets=DB_BUCKETS,
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time waiting for a pooled DB connection (including opening one).",
+    buckets=DB_BUCKETS,
+)
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "DB connections currently checked out.")
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "DB connections open beyond pool_size.")
+UPSTREAM_DURATION = Histogram(
+    "upstream_request_duration_seconds",
+    "Outbound HTTP latency by upstream and status ('error' when no response).",
+    ("upstream", "status"),
+)
+UPSTREAM_ERRORS = Counter(
+    "upstream_errors_total",
+    "Outbound HTTP failures by upstream and reason (exception name or status class).",
+    ("upstream", "reason"),
+)
+CIRCUIT_STATE = Gauge(
+    "circuit_breaker_state",
+    "Upstream circuit breaker state: 0 closed, 1 half-open, 2 open (worst worker).",
+    ("upstream",),
+    mode="max",
+)
+CIRCUIT_REJECTED = Counter(
+    "circuit_breaker_rejected_total", "Outbound calls short-circuited by an open breaker.", ("upstream",)
+)
+AUTH_FAILURES = Counter("auth_failures_total", "Rejected authentications by reason.", ("reason",))
+RATE_LIMITED = Counter("rate_limited_total", "Requests rejected with 429 by the rate limiter.", ("route",))
+
+
+def count_auth_failures(fn):
+    """Count HTTPExceptions raised by an auth helper under auth_failures_total{reason=detail}."""
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await fn(*args, **kwargs)
+            except HTTPException as e:
+                AUTH_FAILURES.inc(str(e.detail))
+                raise
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except HTTPException as e:
+            AUTH_FAILURES.inc(str(e.detail))
+            raise
+
+    return wrapper
+
+
+_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+
+def instrument_engine(sync_engine) -> None:
+    """Time every statement executed by the engine (attach to ``AsyncEngine.sync_engine``)."""
+    from sqlalchemy import event
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("_query_start")
+        if not starts:
+            return
+        op = statement.lstrip()[:6].upper()
+        DB_QUERY_DURATION.observe(time.perf_counter() - starts.pop(), op if op in _OPERATIONS else "OTHER")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _failed(context):
+        # after_cursor_execute does not run for a failed statement: drop its start
+        if context.connection is None or context.execution_context is None:
+            return  # not a statement (e.g. connecting)
+        starts = context.connection.info.get("_query_start")
+        if starts:
+            starts.pop()
+
+
+class MetricsMiddleware:
+    """Observes request latency labelled by route template (never the raw path)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - t0, scope["method"], route, str(status))
+
+
+def _snapshot_path() -> str:
+    return os.path.join(settings.metrics_multiproc_dir or "", f"metrics-{os.getpid()}.json")
+
+
+def _write_snapshot(snapshot: Dict[str, List[Any]]) -> None:
+    path = _snapshot_path()
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _read_snapshots() -> List[Dict[str, List[Any]]]:
+    snapshots = []
+    oldest = time.time() - STALE_FLUSHES * settings.metrics_flush_interval_seconds
+    for path in glob.glob(os.path.join(settings.metrics_multiproc_dir, "metrics-*.json")):
+        try:
+            if os.path.getmtime(path) < oldest:
+                continue
+            with open(path, encoding="utf-8") as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # being replaced or from a dead worker mid-write
+    return snapshots
+
+
+def _render_all(snapshot: Dict[str, List[Any]]) -> str:
+    # in a thread: touches only this worker's copy and the files
+    _write_snapshot(snapshot)
+    return REGISTRY.render(REGISTRY.merged(_read_snapshots()))
+
+
+async def flush() -> None:
+    """Write this worker's snapshot for the other workers' /metrics (multiprocess mode)."""
+    if not settings.metrics_multiproc_dir:
+        return
+    await asyncio.to_thread(_write_snapshot, REGISTRY.snapshot())
+
+
+def remove_snapshot() -> None:
+    """Drop this worker's snapshot (lifespan shutdown), so it is no longer summed in."""
+    if not settings.metrics_multiproc_dir:
+        return
+    try:
+        os.remove(_snapshot_path())
+    except FileNotFoundError:
+        pass
+
+
+async def render_latest() -> str:
+    snapshot = REGISTRY.snapshot()
+    if not settings.metrics_multiproc_dir:
+        return REGISTRY.render(REGISTRY.merged([snapshot]))
+    return await asyncio.to_thread(_render_all, snapshot)
+
+
+async def run_flusher() -> None:
+    os.makedirs(settings.metrics_multiproc_dir or ".", exist_ok=True)
+    while True:
+        try:
+            await flush()
+        except Exception:
+            log.exception("Metrics flush failed")
+        await asyncio.sleep(settings.metrics_flush_interval_seconds)
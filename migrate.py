@@ -0,0 +1,114 @@
+"""Bring the schema to head once per deploy; run by ``start.sh`` before the workers start.
+
+    python -m migrate
+
+Fast path: the head revision is read straight from ``alembic/versions/*.py`` and
+compared with ``alembic_version``. When the database is already at head (every
+restart but the first after a deploy) this exits without importing Alembic, the app's
+``db`` module or the models.
+
+Otherwise the upgrade runs while holding a Postgres advisory lock, on the same
+connection Alembic uses, so replicas starting together migrate one at a time; the
+ones that waited re-check the revision and find nothing left to do.
+"""
+
+import glob
+import os
+import re
+import sys
+import time
+from typing import Optional, Set
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+
+from settings import settings
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Arbitrary, fixed: "miniapp" in ASCII; shared by every replica of this app
+LOCK_KEY = 0x6D696E69617070
+
+_REVISION = re.compile(r'^(revision|down_revision)\s*=\s*["\']?([^"\'\s]+)["\']?', re.M)
+
+
+def _log(message: str) -> None:
+    print(f"migrate: {message}", file=sys.stderr, flush=True)
+
+
+def head_revisions(versions_dir: str = os.path.join(ROOT, "alembic", "versions")) -> Set[str]:
+    """Revisions nothing else revises (the repo's heads), without importing the scripts."""
+    revisions, parents = set(), set()
+    for path in glob.glob(os.path.join(versions_dir, "*.py")):
+        with open(path, encoding="utf-8") as f:
+            fields = dict(_REVISION.findall(f.read()))
+        if "revision" in fields:
+            revisions.add(fields["revision"])
+            if fields.get("down_revision", "None") != "None":
+                parents.add(fields["down_revision"])
+    return revisions - parents
+
+
+def current_revisions(conn: Connection) -> Set[str]:
+    try:
+        return {row[0] for row in conn.execute(text("SELECT version_num FROM alembic_version"))}
+    except Exception:  # fresh database: no alembic_version table yet
+        conn.rollback()
+        return set()
+
+
+def sync_dsn(dsn: str) -> str:
+    # Alembic needs a sync driver, same rule as db.POSTGRES_DSN_SYNC
+    return dsn.replace("+asyncpg", "").replace("+aiosqlite", "")
+
+
+def upgrade(conn: Connection) -> None:
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    config.attributes["connection"] = conn  # see alembic/env.py
+    command.upgrade(config, "head")
+
+
+def migrate(dsn: Optional[str] = None) -> bool:
+    """Upgrade to head if needed; returns whether anything was run."""
+    heads = head_revisions()
+    engine = create_engine(sync_dsn(dsn or settings.postgres_dsn))
+    try:
+        with engine.connect() as conn:
+            if current_revisions(conn) == heads:
+                return False
+
+            postgres = conn.dialect.name == "postgresql"
+            if postgres:
+                conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": LOCK_KEY})
+                conn.commit()
+            try:
+                # another replica may have finished while this one waited for the lock
+                if current_revisions(conn) == heads:
+                    return False
+                # end the re-check's transaction: Alembic must begin its own, or
+                # autocommit_block() (CREATE INDEX CONCURRENTLY, 0006) cannot commit it
+                conn.commit()
+                upgrade(conn)
+                conn.commit()
+                return True
+            finally:
+                if postgres:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+                    conn.commit()
+    finally:
+        engine.dispose()
+
+
+def main() -> int:
+    t0 = time.perf_counter()
+    ran = migrate()
+    elapsed = time.perf_counter() - t0
+    _log(f"{'upgraded to' if ran else 'already at'} head in {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
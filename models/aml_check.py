@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index, func
+from db import Base
+
+
+class AMLCheck(Base):
+    """An AML check job; see aml_jobs.py."""
+
+    __tablename__ = "aml_checks"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    tg_user_id = Column(String, nullable=False)
+    username = Column(String, nullable=True)
+    wallet_address = Column(String, nullable=False)
+    meta = Column(JSON, nullable=True)
+
+    status = Column(String, nullable=False, default="pending")  # pending | running | done | failed
+    # Webhook response as returned by _post_aml_webhook_json
+    result = Column(JSON, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # dedupe lookup: latest job for (user, wallet)
+        Index("ix_aml_checks_user_wallet_created", "tg_user_id", "wallet_address", "created_at"),
+    )
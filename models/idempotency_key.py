@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, func
+from db import Base
+
+
+class IdempotencyKey(Base):
+    """First response to a ``POST /leads`` per (user, key); see idempotency.py."""
+
+    __tablename__ = "idempotency_keys"
+
+    tg_user_id = Column(String, primary_key=True)
+    # "h:<Idempotency-Key header>" or "b:<request hash>" when the header is absent
+    key = Column(String, primary_key=True)
+    request_hash = Column(String, nullable=False)
+
+    # NULL for /leads/batch (the lead ids are in the response)
+    lead_id = Column(Integer, ForeignKey("leads.id", ondelete="CASCADE"), nullable=True)
+    # NULL until the lead is written, in the same transaction as the claim
+    response = Column(JSON, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime(timezone=True), index=True, nullable=False)
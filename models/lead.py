@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, func
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index, func
 from db import Base
 
 
@@ -19,4 +19,13 @@ class Lead(Base):
 
     meta = Column(JSON, nullable=True)
 
+    # Lead webhook delivery (see outbox.py); NULL when forwarding is disabled
+    webhook_status = Column(String, nullable=True)
+    webhook_delivered_at = Column(DateTime(timezone=True), nullable=True)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        # /me/applications keyset pagination (see migration 0006)
+        Index("ix_leads_user_created_id", tg_user_id, created_at.desc(), id.desc()),
+    )
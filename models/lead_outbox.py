@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, func
+from db import Base
+
+
+class LeadOutbox(Base):
+    """Pending lead webhook deliveries, written in the same transaction as the lead."""
+
+    __tablename__ = "lead_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    lead_id = Column(Integer, ForeignKey("leads.id", ondelete="CASCADE"), index=True, nullable=False)
+
+    # Enriched lead payload as built by POST /leads
+    payload = Column(JSON, nullable=False)
+
+    status = Column(String, nullable=False, default="pending")  # pending | delivered | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_status_code = Column(Integer, nullable=True)
+    last_error = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
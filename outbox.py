@@ -0,0 +1,187 @@
+"""Transactional outbox for lead webhook delivery.
+
+``POST /leads`` writes a ``lead_outbox`` row in the same transaction as the lead and
+returns right after the commit. The ``OutboxWorker`` claims due rows in batches
+(``FOR UPDATE SKIP LOCKED``, so several workers/replicas never deliver the same row),
+posts them to the lead webhook outside of any transaction, and records the outcome on
+both the outbox row and the lead. Failures are retried with exponential backoff and
+jitter until ``OUTBOX_MAX_ATTEMPTS``.
+"""
+
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db import get_sessionmaker
+from models.lead import Lead
+from models.lead_outbox import LeadOutbox
+from settings import settings
+
+log = logging.getLogger("miniapp")
+
+PENDING = "pending"
+DELIVERED = "delivered"
+FAILED = "failed"
+
+# Same contract as routers.leads._post_webhook_json
+Send = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+_worker: Optional["OutboxWorker"] = None
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue(db: AsyncSession, lead_id: int, payload: Dict[str, Any]) -> None:
+    """Stage a webhook delivery in the caller's transaction (committed with the lead)."""
+    db.add(LeadOutbox(lead_id=lead_id, payload=payload, status=PENDING, attempts=0, next_attempt_at=_utcnow()))
+
+
+async def enqueue_many(db: AsyncSession, deliveries: List[Tuple[int, Dict[str, Any]]]) -> None:
+    """``enqueue`` for many leads at once, as one bulk insert."""
+    now = _utcnow()
+    await db.execute(
+        insert(LeadOutbox),
+        [
+            {"lead_id": lead_id, "payload": payload, "status": PENDING, "attempts": 0, "next_attempt_at": now}
+            for lead_id, payload in deliveries
+        ],
+    )
+
+
+def wake() -> None:
+    """Ask the running worker (if any) to poll now instead of at the next interval."""
+    if _worker is not None:
+        _worker.wake()
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with "equal jitter": half fixed, half random."""
+    base = settings.outbox_backoff_base_seconds * (2 ** max(attempts - 1, 0))
+    delay = min(settings.outbox_backoff_max_seconds, base)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class OutboxWorker:
+    def __init__(self, send: Send, session_factory=None):
+        self._send = send
+        self._session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    @property
+    def session_factory(self):
+        return self._session_factory or get_sessionmaker()
+
+    def start(self) -> None:
+        global _worker
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        _worker = self
+
+    async def stop(self) -> None:
+        global _worker
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        if _worker is self:
+            _worker = None
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        log.info("Outbox worker started")
+        while not self._stopping:
+            try:
+                delivered = await self.run_once()
+            except Exception:
+                log.exception("Outbox worker iteration failed")
+                delivered = 0
+
+            if delivered:
+                continue  # there may be more due rows
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.outbox_poll_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+        log.info("Outbox worker stopped")
+
+    async def run_once(self) -> int:
+        """Claim and deliver one batch of due rows; returns the number of rows claimed."""
+        rows = await self._claim()
+        if rows:
+            await asyncio.gather(*(self._deliver(row) for row in rows))
+        return len(rows)
+
+    async def _claim(self) -> List[Any]:
+        now = _utcnow()
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(LeadOutbox.id, LeadOutbox.lead_id, LeadOutbox.payload, LeadOutbox.attempts)
+                .where(LeadOutbox.status == PENDING, LeadOutbox.next_attempt_at <= now)
+                .order_by(LeadOutbox.next_attempt_at)
+                .limit(settings.outbox_batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = result.all()
+            if rows:
+                # Lease the rows: if this process dies mid-delivery they become due again.
+                await db.execute(
+                    update(LeadOutbox)
+                    .where(LeadOutbox.id.in_([r.id for r in rows]))
+                    .values(
+                        attempts=LeadOutbox.attempts + 1,
+                        next_attempt_at=now + timedelta(seconds=settings.outbox_lease_seconds),
+                    )
+                )
+            await db.commit()
+        return rows
+
+    async def _deliver(self, row: Any) -> None:
+        attempts = row.attempts + 1
+        try:
+            result = await self._send(row.payload)
+        except Exception as e:
+            log.exception("Outbox delivery raised for lead %s", row.lead_id)
+            result = {"status": 0, "error": str(e)}
+
+        status_code = int((result or {}).get("status") or 0)
+        now = _utcnow()
+        outbox_values: Dict[str, Any] = {"last_status_code": status_code or None}
+        lead_values: Dict[str, Any] = {}
+
+        if result is not None and 200 <= status_code < 300:
+            outbox_values.update(status=DELIVERED, delivered_at=now, last_error=None)
+            lead_values.update(webhook_status=DELIVERED, webhook_delivered_at=now)
+        else:
+            if result is None:
+                error = "webhook disabled (LEAD_WEBHOOK_URL not set)"
+            else:
+                error = result.get("error") or f"HTTP {status_code}"
+            outbox_values["last_error"] = str(error)[:1000]
+            if attempts >= settings.outbox_max_attempts:
+                outbox_values["status"] = FAILED
+                lead_values["webhook_status"] = FAILED
+                log.warning("Outbox giving up on lead %s after %s attempts: %s", row.lead_id, attempts, error)
+            else:
+                delay = backoff_seconds(attempts)
+                outbox_values["next_attempt_at"] = now + timedelta(seconds=delay)
+                log.info("Outbox retry for lead %s in %.1fs (attempt %s): %s", row.lead_id, delay, attempts, error)
+
+        async with self.session_factory() as db:
+            await db.execute(update(LeadOutbox).where(LeadOutbox.id == row.id).values(**outbox_values))
+            if lead_values:
+                await db.execute(update(Lead).where(Lead.id == row.lead_id).values(**lead_values))
+            await db.commit()
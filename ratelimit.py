@@ -0,0 +1,227 @@
+"""Per-user / per-IP rate limiting of the expensive POST routes.
+
+``RATE_LIMITS`` maps ``"METHOD /path"`` to a budget such as ``"20/minute"``: a token
+bucket holding that many requests, refilled evenly over the period. Requests are keyed
+by the access token's ``sub`` (``tg_user_id``) when a valid one is sent, else by client
+IP (``/auth/telegram-webapp`` is always by IP in practice). Over budget answers
+``429`` with ``Retry-After``.
+
+The client IP is the TCP peer, unless the peer is one of ``RATE_LIMIT_TRUSTED_PROXIES``
+(by default loopback and private ranges, i.e. the platform's load balancer): then it is
+the right-most ``X-Forwarded-For`` hop that is not itself a trusted proxy. Otherwise every
+user behind the proxy would share one bucket.
+
+``RateLimitMiddleware`` is plain ASGI, so a rejected request never reaches routing,
+dependencies or a DB session. Buckets live in a ``BucketStore``:
+
+- ``MemoryBucketStore`` (default): per worker; an O(1) dict + LRU bounded by
+  ``RATE_LIMIT_MAX_KEYS``, dropping buckets idle long enough to have refilled;
+- ``RATE_LIMIT_STORE="module:factory"`` plugs in a shared store (e.g. Redis) so all
+  workers and replicas spend from the same buckets.
+"""
+
+import importlib
+import ipaddress
+import json
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+from auth_tokens import token_subject
+from settings import settings
+
+_PERIODS = {"second": 1.0, "minute": 60.0, "hour": 3600.0, "day": 86400.0}
+
+
+@dataclass(frozen=True)
+class Budget:
+    capacity: float  # burst size
+    per_second: float  # refill rate
+
+    @classmethod
+    def parse(cls, spec: str) -> "Budget":
+        """``"20/minute"``, ``"5/second"``, ``"100/hour"``, ``"1000/day"``."""
+        count, _, period = spec.strip().partition("/")
+        seconds = _PERIODS.get(period.strip().lower().rstrip("s"))
+        if seconds is None or float(count) <= 0:
+            raise ValueError(f"invalid rate limit {spec!r}")
+        return cls(capacity=float(count), per_second=float(count) / seconds)
+
+
+class BucketStore(ABC):
+    """Where the buckets live; subclass for a store shared between workers."""
+
+    @abstractmethod
+    async def take(self, key: str, budget: Budget) -> float:
+        """Spend one token from ``key``'s bucket: 0 if allowed, else seconds until one is available."""
+
+    def clear(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryBucketStore(BucketStore):
+    def __init__(self, *, max_keys: int):
+        self.max_keys = max_keys
+        # key -> [tokens, last refill (monotonic), seconds until full again]; oldest use first
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+        self.evicted = 0
+
+    async def take(self, key: str, budget: Budget) -> float:
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = budget.capacity
+            bucket = self._buckets[key] = [tokens, now, 0.0]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evicted += 1
+        else:
+            tokens = min(budget.capacity, bucket[0] + (now - bucket[1]) * budget.per_second)
+            self._buckets.move_to_end(key)
+
+        if tokens >= 1:
+            tokens -= 1
+            retry_after = 0.0
+            self.allowed += 1
+        else:
+            retry_after = (1 - tokens) / budget.per_second
+            self.limited += 1
+        bucket[0], bucket[1] = tokens, now
+        bucket[2] = (budget.capacity - tokens) / budget.per_second
+        return retry_after
+
+    def _evict_idle(self, now: float) -> None:
+        # A bucket that has refilled is the same as no bucket. Only the LRU head is
+        # checked, a couple of entries per call, so eviction stays O(1) amortized.
+        for _ in range(2):
+            if not self._buckets:
+                return
+            key, (_, last, refill_seconds) = next(iter(self._buckets.items()))
+            if now - last < refill_seconds:
+                return
+            del self._buckets[key]
+            self.evicted += 1
+
+    def clear(self) -> None:
+        self._buckets.clear()
+        self.allowed = 0
+        self.limited = 0
+        self.evicted = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._buckets),
+            "max_keys": self.max_keys,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "evicted": self.evicted,
+        }
+
+
+def load_store(spec: Optional[str]) -> BucketStore:
+    if not spec:
+        return MemoryBucketStore(max_keys=settings.rate_limit_max_keys)
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+
+def parse_limits(limits: Dict[str, str]) -> Dict[Tuple[str, str], Budget]:
+    out = {}
+    for route, spec in limits.items():
+        method, _, path = route.strip().partition(" ")
+        out[(method.upper(), path.strip())] = Budget.parse(spec)
+    return out
+
+
+class TrustedProxies:
+    """Addresses / networks whose ``X-Forwarded-For`` is believed; ``"*"`` trusts any peer."""
+
+    def __init__(self, specs: Iterable[str]):
+        specs = [spec.strip() for spec in specs if spec.strip()]
+        self.any = "*" in specs
+        self.networks = [ipaddress.ip_network(spec, strict=False) for spec in specs if spec != "*"]
+
+    def __contains__(self, host: str) -> bool:
+        if self.any:
+            return True
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        return any(address in network for network in self.networks)
+
+
+def _client_ip(scope, trusted: TrustedProxies) -> str:
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+    if peer not in trusted:
+        return peer
+    forwarded = b",".join(v for k, v in scope["headers"] if k.lower() == b"x-forwarded-for")
+    hops = [hop.strip() for hop in forwarded.decode("latin-1").split(",") if hop.strip()]
+    # appended to by each proxy: walk back from the nearest until one we do not run
+    for hop in reversed(hops):
+        if hop not in trusted:
+            return hop
+    return hops[0] if hops else peer
+
+
+class RateLimitMiddleware:
+    def __init__(
+        self,
+        app,
+        *,
+        limits: Dict[str, str],
+        store: BucketStore,
+        trusted_proxies: Optional[Iterable[str]] = None,
+    ):
+        self.app = app
+        self.limits = parse_limits(limits)
+        self.store = store
+        self.trusted = TrustedProxies(
+            settings.rate_limit_trusted_proxies if trusted_proxies is None else trusted_proxies
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        budget = self.limits.get((scope["method"], scope["path"]))
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        sub = token_subject(scope["headers"])
+        who = f"user:{sub}" if sub else f"ip:{_client_ip(scope, self.trusted)}"
+        retry_after = await self.store.take(f"{scope['method']} {scope['path']}|{who}", budget)
+        if not retry_after:
+            await self.app(scope, receive, send)
+            return
+
+        metrics.RATE_LIMITED.inc(scope["path"])
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(math.ceil(retry_after)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+rate_limit_store = load_store(settings.rate_limit_store)
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from settings import settings
+
+log = logging.getLogger("miniapp")
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class _Entry:
+    value: Any
+    fetched_at: float
+
+
+class RatesCache:
+    """In-process cache for Webflow CMS collections.
+
+    Fresh entries (younger than ``ttl_seconds``) are served directly. Entries up to
+    ``stale_seconds`` past the TTL are still served, while a single background refresh
+    runs. Concurrent misses for the same key share one upstream fetch.
+
+    A loader returns ``None`` on failure; failures are never cached.
+    """
+
+    def __init__(self, *, ttl_seconds: float, stale_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._entries: Dict[str, _Entry] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    async def get(self, key: str, loader: Loader) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < self.ttl_seconds:
+                self.hits += 1
+                return entry.value
+            if age < self.ttl_seconds + self.stale_seconds:
+                self.stale_hits += 1
+                self._refresh(key, loader)
+                return entry.value
+
+        self.misses += 1
+        # shield: a cancelled caller must not cancel the fetch other callers wait on
+        return await asyncio.shield(self._refresh(key, loader))
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Return the cached value (fresh or stale) without triggering a fetch."""
+        entry = self._entries.get(key)
+        return entry.value if entry is not None else None
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._inflight.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "inflight": len(self._inflight),
+            "keys": len(self._entries),
+        }
+
+    def _refresh(self, key: str, loader: Loader) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, loader))
+            self._inflight[key] = task
+        return task
+
+    async def _load(self, key: str, loader: Loader) -> Any:
+        self.refreshes += 1
+        try:
+            value = await loader()
+        except Exception:
+            log.exception("Rates cache refresh failed for %s", key)
+            value = None
+        finally:
+            self._inflight.pop(key, None)
+
+        if value is None:
+            self.refresh_errors += 1
+            return None
+
+        self._entries[key] = _Entry(value=value, fetched_at=time.monotonic())
+        return value
+
+
+rates_cache = RatesCache(
+    ttl_seconds=settings.webflow_rates_ttl_seconds,
+    stale_seconds=settings.webflow_rates_stale_seconds,
+)
@@ -0,0 +1,141 @@
+"""Shared exchange-rate change feed for ``GET /rates/stream`` (Server-Sent Events).
+
+One background poller per process reads the rates index (through ``rates_cache``, so
+polling more often than the cache TTL costs no upstream calls) and turns each change
+into a numbered changeset. Every connection shares that poller:
+
+- a subscriber only remembers the last version it sent, so memory per connection is
+  constant however slow the client is;
+- all subscribers wait on one shared event, replaced on every publish;
+- the last ``history`` changesets are kept, so a subscriber that falls further behind
+  gets a full snapshot instead.
+
+The poller runs only while at least one subscriber is connected.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+log = logging.getLogger("miniapp")
+
+# city (normalized) -> {pair -> rate}, as built by routers.leads._build_rates_index
+RatesIndex = Dict[str, Dict[str, str]]
+Key = Tuple[str, str]
+Loader = Callable[[], Awaitable[Optional[RatesIndex]]]
+
+
+def flatten(index: RatesIndex) -> Dict[Key, str]:
+    return {(city, pair): rate for city, rates in index.items() for pair, rate in rates.items()}
+
+
+def entries(rates: Dict[Key, Optional[str]]) -> List[Dict[str, Any]]:
+    return [{"city": city, "pair": pair, "rate": rate} for (city, pair), rate in sorted(rates.items())]
+
+
+class RatesFeed:
+    def __init__(self, load: Loader, *, poll_interval: float, history: int = 32):
+        self.load = load
+        self.poll_interval = poll_interval
+        self.version = 0
+        self.subscribers = 0
+        self.polls = 0
+        self.poll_errors = 0
+        self._rates: Dict[Key, str] = {}
+        self._history: Deque[Tuple[int, Dict[Key, Optional[str]]]] = deque(maxlen=history)
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def snapshot(self) -> Dict[Key, str]:
+        return dict(self._rates)
+
+    def publish(self, index: RatesIndex) -> bool:
+        """Diff ``index`` against the current rates; record and announce any change."""
+        current = flatten(index)
+        changes: Dict[Key, Optional[str]] = {k: v for k, v in current.items() if self._rates.get(k) != v}
+        changes.update({k: None for k in self._rates.keys() - current.keys()})  # removed -> rate null
+        if not changes:
+            return False
+        self._rates = current
+        self.version += 1
+        self._history.append((self.version, changes))
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+        return True
+
+    def changes_since(self, since: int) -> Tuple[bool, Dict[Key, Optional[str]]]:
+        """(is_snapshot, entries) bringing a subscriber at ``since`` up to ``version``."""
+        if since >= self.version:
+            return False, {}
+        if since == 0 or not self._history or self._history[0][0] > since + 1:
+            return True, dict(self._rates)
+        merged: Dict[Key, Optional[str]] = {}
+        for version, changes in self._history:
+            if version > since:
+                merged.update(changes)
+        return False, merged
+
+    async def wait(self, since: int, timeout: float) -> int:
+        """Return the current version once it is past ``since`` or after ``timeout``."""
+        if self.version > since:
+            return self.version
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.version
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator["RatesFeed"]:
+        self.subscribers += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        try:
+            yield self
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and self._task is not None:
+                # runs while the disconnected stream is being cancelled: don't await here
+                self._task.cancel()
+                self._task = None
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def clear(self) -> None:
+        self.version = 0
+        self._rates.clear()
+        self._history.clear()
+        self._changed = asyncio.Event()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": self.subscribers,
+            "version": self.version,
+            "entries": len(self._rates),
+            "polls": self.polls,
+            "poll_errors": self.poll_errors,
+            "polling": self._task is not None and not self._task.done(),
+        }
+
+    async def _poll(self) -> None:
+        while True:
+            self.polls += 1
+            try:
+                index = await self.load()
+                if index is None:
+                    self.poll_errors += 1
+                else:
+                    self.publish(index)
+            except Exception:
+                self.poll_errors += 1
+                log.exception("Rates feed poll failed")
+            await asyncio.sleep(self.poll_interval)
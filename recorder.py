@@ -0,0 +1,164 @@
+"""Opt-in recorder of production traffic as JSONL (replayed by ``bench/replay.py``).
+
+Enabled with ``TRAFFIC_RECORD_PATH``. Each sampled request becomes one line::
+
+    {"ts": ..., "method": "POST", "path": "/leads", "route": "/leads", "query": "",
+     "headers": {...}, "sub": "42", "body": {...}, "status": 200, "duration_ms": 12.3}
+
+Secrets never reach the file: auth headers/cookies and token-like body fields are
+replaced by ``[redacted]``, as is the ``hash``/``signature`` of Telegram initData.
+The token subject (``sub``) is kept so the replay tool can mint fresh tokens for the
+same user. Lines are written by a background thread, never on the event loop.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from auth_tokens import token_subject
+
+log = logging.getLogger("miniapp")
+
+REDACTED = "[redacted]"
+
+_SENSITIVE_HEADERS = {"authorization", "cookie", "set-cookie", "x-admin-token", "proxy-authorization"}
+_SENSITIVE_FIELDS = {"access_token", "refresh_token", "token", "password", "secret", "api_key"}
+_INITDATA_SECRET_FIELDS = {"hash", "signature"}
+
+
+def redact_init_data(init_data: str) -> str:
+    fields = parse_qsl(init_data, keep_blank_values=True)
+    return urlencode([(k, REDACTED if k in _INITDATA_SECRET_FIELDS else v) for k, v in fields])
+
+
+def redact_body(body: Any) -> Any:
+    if isinstance(body, dict):
+        out: Dict[str, Any] = {}
+        for k, v in body.items():
+            if k in _SENSITIVE_FIELDS:
+                out[k] = REDACTED
+            elif k == "initData" and isinstance(v, str):
+                out[k] = redact_init_data(v)
+            else:
+                out[k] = redact_body(v)
+        return out
+    if isinstance(body, list):
+        return [redact_body(v) for v in body]
+    return body
+
+
+def redact_headers(headers: List[Any]) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for raw_name, raw_value in headers:
+        name = raw_name.decode("latin-1").lower()
+        out[name] = REDACTED if name in _SENSITIVE_HEADERS else raw_value.decode("latin-1")
+    return out
+
+
+class _JsonlWriter:
+    def __init__(self, path: str):
+        self._path = path
+        self._queue: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="traffic-recorder", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._queue.put(json.dumps(record, ensure_ascii=False, default=str))
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        with open(self._path, "a", encoding="utf-8") as f:
+            while True:
+                line = self._queue.get()
+                if line is None:
+                    break
+                f.write(line + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+
+class TrafficRecorderMiddleware:
+    def __init__(self, app, *, path: str, sample_rate: float = 1.0, max_body_bytes: int = 64 * 1024):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.max_body_bytes = max_body_bytes
+        self._writer = _JsonlWriter(path)
+        log.info("Traffic recorder enabled: path=%s sample_rate=%s", path, sample_rate)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        body = bytearray()
+        truncated = False
+        status = 0
+
+        async def _receive():
+            nonlocal truncated
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                if len(body) + len(chunk) <= self.max_body_bytes:
+                    body.extend(chunk)
+                else:
+                    truncated = True
+            return message
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        ts = time.time()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, _receive, _send)
+        finally:
+            duration_ms = (time.perf_counter() - t0) * 1000
+            try:
+                self._writer.write(self._record(scope, bytes(body), truncated, status, ts, duration_ms))
+            except Exception:
+                log.exception("Traffic recorder failed to record %s", scope.get("path"))
+
+    def _record(self, scope, body: bytes, truncated: bool, status: int, ts: float, duration_ms: float):
+        headers = scope.get("headers") or []
+        route = scope.get("route")
+        parsed_body: Any = None
+        if body and not truncated:
+            try:
+                parsed_body = redact_body(json.loads(body))
+            except ValueError:
+                pass  # non-JSON bodies are not recorded
+
+        query = scope.get("query_string", b"").decode("latin-1")
+        if query:
+            query = urlencode(
+                [(k, REDACTED if k in _SENSITIVE_FIELDS else v) for k, v in parse_qsl(query, keep_blank_values=True)]
+            )
+
+        return {
+            "ts": round(ts, 6),
+            "method": scope.get("method"),
+            "path": scope.get("path"),
+            "route": getattr(route, "path", None) or scope.get("path"),
+            "query": query,
+            "headers": redact_headers(headers),
+            "sub": token_subject(headers, token_type=None),
+            "body": parsed_body,
+            "body_truncated": truncated,
+            "status": status,
+            "duration_ms": round(duration_ms, 3),
+        }
@@ -0,0 +1,65 @@
+import hmac
+from datetime import datetime, timezone
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+import lead_export
+from accept_encoding import accepted_encodings
+from db import get_engine
+from settings import settings
+
+admin_router = APIRouter()
+
+
+def get_export_engine():
+    return get_engine()
+
+
+def _require_admin(request: Request) -> None:
+    expected = settings.admin_api_token
+    if not expected:
+        # admin endpoints are disabled unless ADMIN_API_TOKEN is set
+        raise HTTPException(404, "Not Found")
+    got = request.headers.get("x-admin-token") or ""
+    if not hmac.compare_digest(got.encode("utf-8"), expected.encode("utf-8")):
+        raise HTTPException(401, "Invalid admin token")
+
+
+@admin_router.get("/admin/leads/export")
+async def export_leads(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    city: Optional[str] = None,
+    exchange_type: Optional[str] = None,
+    gzip: Optional[bool] = None,
+    engine=Depends(get_export_engine),
+):
+    """Stream leads for reconciliation (``X-Admin-Token`` required).
+
+    gzip defaults to on when the client sends ``Accept-Encoding: gzip``.
+    """
+    _require_admin(request)
+
+    if gzip is None:
+        gzip = "gzip" in accepted_encodings(request.headers.get("accept-encoding") or "")
+
+    body = lead_export.iter_export(
+        engine,
+        format,
+        gzip=gzip,
+        created_from=created_from,
+        created_to=created_to,
+        city=city,
+        exchange_type=exchange_type,
+    )
+
+    filename = f"leads-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv; charset=utf-8"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
@@ -1,16 +1,21 @@
 import logging
+from datetime import datetime, timedelta, timezone
 from typing import Any, Dict
 
-import httpx
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 
+import aml_jobs
 from db import SessionLocal
-from schemas.aml import AMLCheckRequest
+import http_client
+from keyed_lock import KeyedLock
+from models.aml_check import AMLCheck
+from schemas.aml import AMLCheckRequest, AMLJobOut
 from settings import settings
 from routers.leads import _get_current_user  # reuse existing auth logic
 
-log = logging.getLogger("miniapp")
+log = logging.getLogger("miniapp.aml")
 
 aml_router = APIRouter()
 
@@ -44,13 +49,11 @@ async def _post_aml_webhook_json(payload: Dict[str, Any]) -> Dict[str, Any] | No
         "AML webhook request: contact_by=%s search=%s variables=%s",
         contact_by,
         search,
-        {k: (str(v)[:500] if v is not None else None) for k, v in variables.items()},
+        variables,
     )
 
     try:
-        timeout = httpx.Timeout(connect=5.0, read=15.0, write=15.0, pool=5.0)
-        async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
-            r = await client.post(webhook_url, json=webhook_payload)
+        r = await http_client.request(http_client.AML_WEBHOOK, "POST", webhook_url, json=webhook_payload)
 
         try:
             body = r.json()
@@ -64,12 +67,47 @@ async def _post_aml_webhook_json(payload: Dict[str, Any]) -> Dict[str, Any] | No
 
         return {"status": r.status_code, "body": body}
 
+    except http_client.CircuitOpenError as e:
+        log.warning("AML webhook call skipped: %s", e)
+        return {"status": 0, "error": str(e)}
     except Exception as e:
         log.exception("AML webhook call failed: %s", e)
         return {"status": 0, "error": str(e)}
 
 
-@aml_router.post("/aml/check")
+# Per-(user, wallet) locks so double taps in this process never create two jobs
+_wallet_locks = KeyedLock()
+
+
+def _job_out(job: AMLCheck, *, deduplicated: bool = False) -> AMLJobOut:
+    return AMLJobOut(
+        job_id=job.id,
+        status=job.status,
+        deduplicated=deduplicated,
+        wallet_address=job.wallet_address,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        webhook_result=job.result,
+    )
+
+
+async def _find_recent_job(db: AsyncSession, tg_user_id: str, wallet: str) -> AMLCheck | None:
+    since = datetime.now(timezone.utc) - timedelta(seconds=settings.aml_dedupe_window_seconds)
+    result = await db.execute(
+        select(AMLCheck)
+        .where(
+            AMLCheck.tg_user_id == tg_user_id,
+            AMLCheck.wallet_address == wallet,
+            AMLCheck.created_at >= since,
+            AMLCheck.status != aml_jobs.FAILED,
+        )
+        .order_by(AMLCheck.created_at.desc())
+        .limit(1)
+    )
+    return result.scalars().first()
+
+
+@aml_router.post("/aml/check", status_code=202, response_model=AMLJobOut)
 async def aml_check(body: AMLCheckRequest, request: Request, db: AsyncSession = Depends(get_db)):
     user = await _get_current_user(request, db)
 
@@ -77,17 +115,41 @@ async def aml_check(body: AMLCheckRequest, request: Request, db: AsyncSession =
     if not wallet:
         raise HTTPException(400, "wallet_address is required")
 
-    out: Dict[str, Any] = {
-        "wallet_address": wallet,
-        "tg_user_id": user.tg_user_id,
-        "username": user.username,
-        "meta": body.meta or {},
-    }
+    async with _wallet_locks.hold((user.tg_user_id, wallet)):
+        existing = await _find_recent_job(db, user.tg_user_id, wallet)
+        if existing is not None:
+            return _job_out(existing, deduplicated=True)
+
+        job = AMLCheck(
+            tg_user_id=user.tg_user_id,
+            username=user.username,
+            wallet_address=wallet,
+            meta=body.meta or {},
+            status=aml_jobs.PENDING,
+        )
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+
+    if not aml_jobs.submit(job.id):
+        job.status = aml_jobs.FAILED
+        job.result = {"status": 0, "error": "AML queue is full"}
+        await db.commit()
+        raise HTTPException(503, "AML checks are busy, try again later")
+
+    log.info("AML job %s queued for wallet=%s", job.id, wallet)
+    return _job_out(job)
+
+
+@aml_router.get("/aml/check/{job_id}", response_model=AMLJobOut)
+async def aml_check_status(job_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    user = await _get_current_user(request, db)
 
-    webhook_result = await _post_aml_webhook_json(out)
+    result = await db.execute(
+        select(AMLCheck).where(AMLCheck.id == job_id, AMLCheck.tg_user_id == user.tg_user_id)
+    )
+    job = result.scalars().first()
+    if not job:
+        raise HTTPException(404, "AML check not found")
 
-    return {
-        "ok": True,
-        "forwarded": bool(getattr(settings, "aml_webhook_url", None)),
-        "webhook_result": webhook_result,
-    }
+    return _job_out(job)
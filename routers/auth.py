@@ -1,19 +1,21 @@
 import json
 import logging
-from fastapi import APIRouter, Request, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Request, Response, HTTPException, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 
 from schemas.auth import AuthPayload
+from schemas.tokens import AuthResponse, TokenResponse
 from utils import verify_init_data
-from db import SessionLocal
+from db import SessionLocal, dialect_insert
 from models.user import User
 from settings import settings
 from auth_tokens import create_token
+from identity_cache import identity_cache
+from metrics import count_auth_failures
 
 BOT_TOKEN = settings.bot_token
-log = logging.getLogger("miniapp")
+BOT_TOKENS = [BOT_TOKEN, *settings.extra_bot_tokens]
+log = logging.getLogger("miniapp.auth")
 
 auth_router = APIRouter()
 
@@ -21,11 +23,34 @@ async def get_db():
     async with SessionLocal() as session:
         yield session
 
-@auth_router.post("/auth/telegram-webapp")
-async def auth_telegram_webapp(payload: AuthPayload, request: Request, db: AsyncSession = Depends(get_db)):
-    log.info("AUTH_META %s", json.dumps(payload.meta or {}, ensure_ascii=False))
-    verified = verify_init_data(payload.initData, BOT_TOKEN)
-    log.info("AUTH_VERIFIED_FIELDS %s", json.dumps(verified, ensure_ascii=False))
+def _set_token_cookies(response: Response, access_token: str, refresh_token: str) -> None:
+    response.set_cookie(
+        "access_token",
+        access_token,
+        httponly=True,
+        secure=settings.cookie_secure,
+        samesite=settings.cookie_samesite,
+        max_age=settings.access_token_ttl_seconds,
+        path="/",
+    )
+    response.set_cookie(
+        "refresh_token",
+        refresh_token,
+        httponly=True,
+        secure=settings.cookie_secure,
+        samesite=settings.cookie_samesite,
+        max_age=settings.refresh_token_ttl_seconds,
+        path="/",
+    )
+
+
+@auth_router.post("/auth/telegram-webapp", response_model=AuthResponse)
+async def auth_telegram_webapp(
+    payload: AuthPayload, request: Request, response: Response, db: AsyncSession = Depends(get_db)
+):
+    log.info("AUTH_META %s", payload.meta or {})
+    verified = verify_init_data(payload.initData, BOT_TOKENS)
+    log.info("AUTH_VERIFIED_FIELDS %s", verified)
 
     if "user" not in verified:
         raise HTTPException(400, "initData missing user")
@@ -35,7 +60,7 @@ async def auth_telegram_webapp(payload: AuthPayload, request: Request, db: Async
     except Exception:
         raise HTTPException(400, "user is not valid JSON")
 
-    log.info("TG_USER %s", json.dumps(tg_user, ensure_ascii=False))
+    log.info("TG_USER %s", tg_user)
 
     tg_user_id = tg_user.get("id")
     username = tg_user.get("username")
@@ -46,56 +71,39 @@ async def auth_telegram_webapp(payload: AuthPayload, request: Request, db: Async
     if not tg_user_id_str.isdigit():
         raise HTTPException(400, "Telegram user id invalid")
 
-    # Store or update user in DB (tg_user_id stored as string)
-    result = await db.execute(select(User).where(User.tg_user_id == tg_user_id_str))
-    user = result.scalars().first()
-    if user:
-        user.username = username
-    else:
-        user = User(tg_user_id=tg_user_id_str, username=username)
-        db.add(user)
+    # Store or update user in DB (tg_user_id stored as string) in a single round trip.
+    # ON CONFLICT covers two tabs logging in at once; the WHERE turns an unchanged
+    # username into a no-op (no row version, no WAL) and RETURNING then yields nothing.
+    insert_stmt = dialect_insert(db, User).values(tg_user_id=tg_user_id_str, username=username)
+    upsert = insert_stmt.on_conflict_do_update(
+        index_elements=[User.tg_user_id],
+        set_={"username": insert_stmt.excluded.username},
+        where=User.username.is_distinct_from(insert_stmt.excluded.username),
+    ).returning(User.id)
+    written = (await db.execute(upsert)).first() is not None
     await db.commit()
+    if written:
+        identity_cache.invalidate(tg_user_id_str)
 
     # Issue tokens
     subject = tg_user_id_str
     access_token = create_token(token_type="access", subject=subject, ttl_seconds=settings.access_token_ttl_seconds)
     refresh_token = create_token(token_type="refresh", subject=subject, ttl_seconds=settings.refresh_token_ttl_seconds)
 
-    resp = JSONResponse({
-        "ok": True,
-        "tg_user_id": tg_user_id,
-        "username": username,
-        # TEMP for testing in TG miniapp (remove later if using HttpOnly cookies only)
-        "access_token": access_token,
-        "refresh_token": refresh_token,
-        "token_type": "bearer",
-        "expires_in": settings.access_token_ttl_seconds,
-    })
-
     # Set HttpOnly cookies
-    resp.set_cookie(
-        "access_token",
-        access_token,
-        httponly=True,
-        secure=settings.cookie_secure,
-        samesite=settings.cookie_samesite,
-        max_age=settings.access_token_ttl_seconds,
-        path="/",
-    )
-    resp.set_cookie(
-        "refresh_token",
-        refresh_token,
-        httponly=True,
-        secure=settings.cookie_secure,
-        samesite=settings.cookie_samesite,
-        max_age=settings.refresh_token_ttl_seconds,
-        path="/",
+    _set_token_cookies(response, access_token, refresh_token)
+    return AuthResponse(
+        tg_user_id=tg_user_id,
+        username=username,
+        # TEMP for testing in TG miniapp (remove later if using HttpOnly cookies only)
+        access_token=access_token,
+        refresh_token=refresh_token,
+        expires_in=settings.access_token_ttl_seconds,
     )
 
-    return resp
-
-@auth_router.post("/auth/refresh")
-async def refresh_tokens(request: Request):
+@auth_router.post("/auth/refresh", response_model=TokenResponse)
+@count_auth_failures
+async def refresh_tokens(request: Request, response: Response):
     # Refresh using HttpOnly cookie
     refresh_token = request.cookies.get("refresh_token")
     if not refresh_token:
@@ -115,32 +123,10 @@ async def refresh_tokens(request: Request):
     access_token = create_token(token_type="access", subject=subject, ttl_seconds=settings.access_token_ttl_seconds)
     new_refresh_token = create_token(token_type="refresh", subject=subject, ttl_seconds=settings.refresh_token_ttl_seconds)
 
-    resp = JSONResponse({
-        "ok": True,
+    _set_token_cookies(response, access_token, new_refresh_token)
+    return TokenResponse(
         # TEMP for testing
-        "access_token": access_token,
-        "refresh_token": new_refresh_token,
-        "token_type": "bearer",
-        "expires_in": settings.access_token_ttl_seconds,
-    })
-
-    resp.set_cookie(
-        "access_token",
-        access_token,
-        httponly=True,
-        secure=settings.cookie_secure,
-        samesite=settings.cookie_samesite,
-        max_age=settings.access_token_ttl_seconds,
-        path="/",
+        access_token=access_token,
+        refresh_token=new_refresh_token,
+        expires_in=settings.access_token_ttl_seconds,
     )
-    resp.set_cookie(
-        "refresh_token",
-        new_refresh_token,
-        httponly=True,
-        secure=settings.cookie_secure,
-        samesite=settings.cookie_samesite,
-        max_age=settings.refresh_token_ttl_seconds,
-        path="/",
-    )
-
-    return resp
@@ -1,19 +1,27 @@
+import asyncio
 import logging
-from typing import Any, Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import ValidationError
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from auth_tokens import decode_token
 from db import SessionLocal
+import http_client
+import idempotency
+from metrics import count_auth_failures
+from identity_cache import CachedUser, identity_cache
 from models.lead import Lead
 from models.user import User
-from schemas.lead import LeadCreate
+import outbox
+from rates_cache import rates_cache
+from schemas.lead import LeadBatchCreate, LeadBatchOut, LeadCreate, LeadOut
 from settings import settings
-import httpx
 
-log = logging.getLogger("miniapp")
+log = logging.getLogger("miniapp.leads")
 
 leads_router = APIRouter()
 
@@ -30,7 +38,8 @@ def _get_access_token(request: Request) -> str | None:
     return request.cookies.get("access_token")
 
 
-async def _get_current_user(request: Request, db: AsyncSession) -> User:
+@count_auth_failures
+async def _get_current_user(request: Request, db: AsyncSession) -> CachedUser:
     token = _get_access_token(request)
     if not token:
         raise HTTPException(401, "Missing access token")
@@ -52,12 +61,18 @@ async def _get_current_user(request: Request, db: AsyncSession) -> User:
     if not tg_user_id.isdigit():
         raise HTTPException(401, "Invalid sub")
 
+    cached = identity_cache.get(tg_user_id)
+    if cached is not None:
+        return cached
+
     result = await db.execute(select(User).where(User.tg_user_id == tg_user_id))
     user = result.scalars().first()
     if not user:
         raise HTTPException(404, "User not found")
 
-    return user
+    cached = CachedUser.from_user(user)
+    identity_cache.put(cached, token_exp=payload.get("exp"))
+    return cached
 
 
 # Map exchange labels to Webflow CMS field keys
@@ -73,63 +88,131 @@ _WEBFLOW_RATE_FIELDS: Dict[str, str] = {
 }
 
 
-async def _get_webflow_exchange_rate(city: str, exchange_type: str) -> Optional[str]:
-    """Return the rate string from Webflow CMS for given city+exchange type, else None."""
-    items_url = getattr(settings, "webflow_cms_items_url", None)
-    api_key = getattr(settings, "webflow_api_key", None)
-    if not items_url or not api_key:
+_WEBFLOW_PAGE_LIMIT = 100  # Webflow v2 maximum
+_WEBFLOW_PAGE_CONCURRENCY = 4
+
+# city (casefolded) -> {exchange label -> rate string}
+RatesIndex = Dict[str, Dict[str, str]]
+
+
+def _normalize_city(city: str | None) -> str:
+    return (city or "").strip().casefold()
+
+
+def _build_rates_index(items: List[Any]) -> RatesIndex:
+    index: RatesIndex = {}
+    for it in items:
+        if not isinstance(it, dict):
+            continue
+        fd = it.get("fieldData")
+        if not isinstance(fd, dict):
+            continue
+        name = _normalize_city(fd.get("name"))
+        if not name or name in index:
+            # keep the first item for a city, like the old linear scan did
+            continue
+        rates: Dict[str, str] = {}
+        for pair, field_key in _WEBFLOW_RATE_FIELDS.items():
+            raw_rate = fd.get(field_key)
+            if raw_rate is None:
+                continue
+            s = str(raw_rate).strip()
+            if s != "":
+                rates[pair] = s
+        index[name] = rates
+    return index
+
+
+async def _fetch_webflow_page(items_url: str, headers: Dict[str, str], offset: int) -> Optional[Dict[str, Any]]:
+    r = await http_client.request(
+        http_client.WEBFLOW,
+        "GET",
+        items_url,
+        headers=headers,
+        params={"limit": _WEBFLOW_PAGE_LIMIT, "offset": offset},
+    )
+    if r.status_code < 200 or r.status_code >= 300:
+        log.warning("Webflow CMS rates fetch failed: offset=%s %s %s", offset, r.status_code, r.text)
         return None
 
-    field_key = _WEBFLOW_RATE_FIELDS.get((exchange_type or "").strip())
-    if not field_key:
+    data = r.json()
+    if not isinstance(data, dict) or not isinstance(data.get("items"), list):
         return None
+    return data
+
+
+async def _load_webflow_rates_index(items_url: str, api_key: str) -> Optional[RatesIndex]:
+    """Download every page of the Webflow CMS collection and index it by city.
 
+    The first page tells us the total; the remaining pages are fetched concurrently.
+    Returns None if any page fails, so a partial collection never replaces a cached one.
+    """
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Accept": "application/json",
     }
 
-    # Webflow v2 uses pagination via limit/offset; we keep it simple with limit=100.
-    params = {"limit": 100, "offset": 0}
-
     try:
-        timeout = httpx.Timeout(connect=5.0, read=10.0, write=10.0, pool=5.0)
-        async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
-            r = await client.get(items_url, headers=headers, params=params)
-
-        if r.status_code < 200 or r.status_code >= 300:
-            log.warning("Webflow CMS rates fetch failed: %s %s", r.status_code, r.text)
+        first = await _fetch_webflow_page(items_url, headers, 0)
+        if first is None:
             return None
 
-        data = r.json()
-        items = data.get("items") if isinstance(data, dict) else None
-        if not isinstance(items, list):
-            return None
+        items: List[Any] = list(first["items"])
+        pagination = first.get("pagination") if isinstance(first.get("pagination"), dict) else {}
+        try:
+            total = int(pagination.get("total") or 0)
+        except (TypeError, ValueError):
+            total = 0
 
-        city_norm = (city or "").strip().casefold()
-        for it in items:
-            if not isinstance(it, dict):
-                continue
-            fd = it.get("fieldData")
-            if not isinstance(fd, dict):
-                continue
-            name = (fd.get("name") or "").strip().casefold()
-            if name != city_norm:
-                continue
-            # found city item
-            raw_rate = fd.get(field_key)
-            if raw_rate is None:
-                return None
-            s = str(raw_rate).strip()
-            return s if s != "" else None
+        offsets = range(len(items), total, _WEBFLOW_PAGE_LIMIT) if items else range(0)
+        if offsets:
+            sem = asyncio.Semaphore(_WEBFLOW_PAGE_CONCURRENCY)
 
-        return None
+            async def _page(offset: int) -> Optional[Dict[str, Any]]:
+                async with sem:
+                    return await _fetch_webflow_page(items_url, headers, offset)
+
+            pages = await asyncio.gather(*(_page(o) for o in offsets))
+            for page in pages:
+                if page is None:
+                    return None
+                items.extend(page["items"])
+
+        return _build_rates_index(items)
 
+    except http_client.CircuitOpenError as e:
+        log.warning("Webflow CMS rates fetch skipped: %s", e)
+        return None
     except Exception:
         log.exception("Webflow CMS rates fetch error")
         return None
 
 
+async def _get_webflow_rates_index() -> Optional[RatesIndex]:
+    """The whole rates index (cached), or None if Webflow is not configured or unavailable."""
+    items_url = getattr(settings, "webflow_cms_items_url", None)
+    api_key = getattr(settings, "webflow_api_key", None)
+    if not items_url or not api_key:
+        return None
+
+    # The collection is shared by all leads; see rates_cache for TTL / stale semantics.
+    return await rates_cache.get(items_url, lambda: _load_webflow_rates_index(items_url, api_key))
+
+
+def _rate_from_index(index: Optional[RatesIndex], city: str, exchange_type: str) -> Optional[str]:
+    pair = (exchange_type or "").strip()
+    if not index or pair not in _WEBFLOW_RATE_FIELDS:
+        return None
+    return index.get(_normalize_city(city), {}).get(pair)
+
+
+async def _get_webflow_exchange_rate(city: str, exchange_type: str) -> Optional[str]:
+    """Return the rate string from Webflow CMS for given city+exchange type, else None."""
+    if (exchange_type or "").strip() not in _WEBFLOW_RATE_FIELDS:
+        return None
+    return _rate_from_index(await _get_webflow_rates_index(), city, exchange_type)
+
+
 async def _post_webhook_json(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     webhook_url = getattr(settings, "lead_webhook_url", None)
     if not webhook_url:
@@ -144,11 +227,15 @@ async def _post_webhook_json(payload: Dict[str, Any]) -> Optional[Dict[str, Any]
     contact_by = "telegram_id"
     search = str(payload.get("tg_user_id") or "").strip()
 
-    # include exchange rate from Webflow CMS (may be None)
-    exchange_rate = await _get_webflow_exchange_rate(
-        str(payload.get("city") or ""),
-        str(payload.get("exchange_type") or ""),
-    )
+    # Webflow CMS rate as of submission, stored with the outbox payload (may be None);
+    # deliveries staged before it was stored look it up now
+    if "exchange_rate" in payload:
+        exchange_rate = payload["exchange_rate"]
+    else:
+        exchange_rate = await _get_webflow_exchange_rate(
+            str(payload.get("city") or ""),
+            str(payload.get("exchange_type") or ""),
+        )
 
     variables: Dict[str, Any] = {
         # core fields
@@ -176,35 +263,19 @@ async def _post_webhook_json(payload: Dict[str, Any]) -> Optional[Dict[str, Any]
         "variables": variables,
     }
 
-    # Log outgoing request body for debugging
-    try:
-        log.info(
-            "Webhook request body: contact_by=%s search=%s variables_keys=%s",
-            contact_by,
-            search,
-            sorted(list(variables.keys())),
-        )
-
-        # Also log variable values (truncate long strings to keep logs readable)
-        def _safe(v: Any):
-            if v is None:
-                return None
-            s = str(v)
-            return (s[:500] + "…") if len(s) > 500 else s
-
-        log.info(
-            "Webhook variables: %s",
-            {k: _safe(v) for k, v in variables.items()},
-        )
-
-        log.debug("Webhook request JSON: %s", webhook_payload)
-    except Exception:
-        pass
+    # Log outgoing request body for debugging (serialized, truncated and redacted by
+    # the log pipeline off the event loop)
+    log.info(
+        "Webhook request body: contact_by=%s search=%s variables_keys=%s",
+        contact_by,
+        search,
+        sorted(variables),
+    )
+    log.info("Webhook variables: %s", variables)
+    log.debug("Webhook request JSON: %s", webhook_payload)
 
     try:
-        timeout = httpx.Timeout(connect=5.0, read=10.0, write=10.0, pool=5.0)
-        async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
-            r = await client.post(webhook_url, json=webhook_payload)
+        r = await http_client.request(http_client.LEAD_WEBHOOK, "POST", webhook_url, json=webhook_payload)
 
         try:
             body = r.json()
@@ -218,6 +289,9 @@ async def _post_webhook_json(payload: Dict[str, Any]) -> Optional[Dict[str, Any]
 
         return {"status": r.status_code, "body": body}
 
+    except http_client.CircuitOpenError as e:
+        log.warning("Webhook call skipped: %s", e)
+        return {"status": 0, "error": str(e)}
     except Exception as e:
         log.exception("Webhook call failed: %s", e)
         return {"status": 0, "error": str(e)}
@@ -240,22 +314,12 @@ def _normalize_receive_type(raw: str | None) -> str:
     return t_norm
 
 
-@leads_router.post("/leads")
-async def create_lead(body: LeadCreate, request: Request, db: AsyncSession = Depends(get_db)):
-    log.info(
-        "LEADS_ENDPOINT_HIT %s %s from=%s",
-        request.method,
-        request.url.path,
-        request.client.host if request.client else None,
-    )
-    user = await _get_current_user(request, db)
-
-    receive_type_norm = _normalize_receive_type(body.receive_type)
-
-    out: Dict[str, Any] = {
+def _lead_payload(body: LeadCreate, user: CachedUser) -> Dict[str, Any]:
+    """Lead column values; with ``lead_id`` added, also the outbox payload."""
+    return {
         "city": body.city,
         "exchange_type": body.exchange_type,
-        "receive_type": receive_type_norm,
+        "receive_type": _normalize_receive_type(body.receive_type),
         "sum": body.sum,
         "wallet_address": body.wallet_address,
         "tg_user_id": user.tg_user_id,
@@ -263,34 +327,143 @@ async def create_lead(body: LeadCreate, request: Request, db: AsyncSession = Dep
         "meta": body.meta or {},
     }
 
-    # Save to DB
-    lead = Lead(
-        tg_user_id=user.tg_user_id,
-        username=user.username,
-        city=body.city,
-        exchange_type=body.exchange_type,
-        receive_type=receive_type_norm,
-        sum=body.sum,
-        wallet_address=body.wallet_address,
-        meta=body.meta or {},
+
+async def _idempotent(
+    request: Request,
+    response: Response,
+    db: AsyncSession,
+    user: CachedUser,
+    body: Dict[str, Any],
+    create: Callable[[idempotency.RequestKey], Awaitable[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    # Retries (Idempotency-Key, or the same body within a short window) get the first
+    # response back; see idempotency.py
+    rk = idempotency.request_key(request, body)
+    async with idempotency.idempotency_store.lock((user.tg_user_id, rk.key)):
+        stored = idempotency.idempotency_store.get((user.tg_user_id, rk.key), rk.request_hash)
+        if stored is None:
+            stored = await idempotency.claim(db, user.tg_user_id, rk)
+        if stored is not None:
+            await db.rollback()
+            log.info("Lead request replayed: %s", request.url.path)
+            response.headers[idempotency.REPLAYED_HEADER] = "true"
+            return stored
+        return await create(rk)
+
+
+@leads_router.post("/leads", response_model=LeadOut)
+async def create_lead(body: LeadCreate, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    log.info(
+        "LEADS_ENDPOINT_HIT %s %s from=%s",
+        request.method,
+        request.url.path,
+        request.client.host if request.client else None,
     )
+    user = await _get_current_user(request, db)
+    return await _idempotent(
+        request, response, db, user, body.model_dump(mode="json"), lambda rk: _create_lead(body, user, rk, db)
+    )
+
+
+async def _create_lead(body: LeadCreate, user: CachedUser, rk: idempotency.RequestKey, db: AsyncSession) -> Dict[str, Any]:
+    out = _lead_payload(body, user)
+
+    webhook_url = getattr(settings, "lead_webhook_url", None)
+
+    # Save to DB; the webhook is staged in the same transaction and delivered by outbox.py
+    lead = Lead(**out, webhook_status=outbox.PENDING if webhook_url else None)
     db.add(lead)
-    await db.commit()
-    await db.refresh(lead)
+    await db.flush()
 
     out["lead_id"] = lead.id
 
-    # forward to webhook if configured
-    webhook_url = getattr(settings, "lead_webhook_url", None)
-    webhook_result = await _post_webhook_json(out)
+    if webhook_url:
+        # the rate the user saw, not the one at delivery / retry time
+        rate = await _get_webflow_exchange_rate(body.city, body.exchange_type)
+        outbox.enqueue(db, lead.id, {**out, "exchange_rate": rate})
+    result = {
+        "ok": True,
+        "lead_id": lead.id,
+        "forwarded": bool(webhook_url),
+        "webhook_status": lead.webhook_status,
+    }
+    await idempotency.record(db, user.tg_user_id, rk, lead.id, result)
+    await db.commit()
+    idempotency.remember(user.tg_user_id, rk, result)
 
     log.info("LEAD %s", out)
     if webhook_url:
-        log.info("Webhook forward enabled: %s", webhook_url)
+        outbox.wake()
+        log.info("Webhook forward queued: %s", webhook_url)
 
-    return {
-        "ok": True,
-        "lead_id": lead.id,
+    return result
+
+
+@leads_router.post("/leads/batch", response_model=LeadBatchOut)
+async def create_leads_batch(
+    body: LeadBatchCreate, request: Request, response: Response, db: AsyncSession = Depends(get_db)
+):
+    """Up to ``LEADS_BATCH_MAX_ITEMS`` leads in one request (offline queue, partner bots).
+
+    Items are validated one by one; the valid ones are written with a single multi-row
+    ``INSERT ... RETURNING`` plus one bulk outbox insert, in one transaction. The
+    response has a result per item, in request order.
+    """
+    if len(body.items) > settings.leads_batch_max_items:
+        raise HTTPException(413, f"At most {settings.leads_batch_max_items} leads per batch")
+    user = await _get_current_user(request, db)
+    return await _idempotent(
+        request, response, db, user, body.model_dump(mode="json"), lambda rk: _create_leads(body.items, user, rk, db)
+    )
+
+
+async def _create_leads(items: List[Any], user: CachedUser, rk: idempotency.RequestKey, db: AsyncSession) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    valid: List[Tuple[int, Dict[str, Any]]] = []
+    for index, item in enumerate(items):
+        try:
+            lead = LeadCreate.model_validate(item)
+        except ValidationError as e:
+            errors = e.errors(include_url=False, include_context=False, include_input=False)
+            results.append({"index": index, "ok": False, "errors": errors})
+        else:
+            valid.append((index, _lead_payload(lead, user)))
+
+    webhook_url = getattr(settings, "lead_webhook_url", None)
+    webhook_status = outbox.PENDING if webhook_url else None
+
+    if valid:
+        lead_ids = (
+            await db.execute(
+                insert(Lead).returning(Lead.id, sort_by_parameter_order=True),
+                [{**out, "webhook_status": webhook_status} for _, out in valid],
+            )
+        ).scalars().all()
+        for (index, out), lead_id in zip(valid, lead_ids):
+            out["lead_id"] = lead_id
+            results.append({"index": index, "ok": True, "lead_id": lead_id, "webhook_status": webhook_status})
+        if webhook_url:
+            index = await _get_webflow_rates_index()
+            deliveries = [
+                (out["lead_id"], {**out, "exchange_rate": _rate_from_index(index, out["city"], out["exchange_type"])})
+                for _, out in valid
+            ]
+            await outbox.enqueue_many(db, deliveries)
+
+    results.sort(key=lambda r: r["index"])
+    result = {
+        "ok": len(valid) == len(items),
+        "created": len(valid),
+        "failed": len(items) - len(valid),
         "forwarded": bool(webhook_url),
-        "webhook_result": webhook_result,
+        "results": results,
     }
+    await idempotency.record(db, user.tg_user_id, rk, None, result)
+    await db.commit()
+    idempotency.remember(user.tg_user_id, rk, result)
+
+    log.info("LEADS_BATCH created=%s failed=%s lead_ids=%s", result["created"], result["failed"], [out["lead_id"] for _, out in valid])
+    if webhook_url and valid:
+        outbox.wake()
+
+    return result
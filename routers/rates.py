@@ -0,0 +1,64 @@
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from rates_feed import RatesFeed, entries, flatten
+from routers.leads import _get_webflow_rates_index
+from schemas.rates import RatesOut
+from settings import settings
+
+rates_router = APIRouter()
+
+rates_feed = RatesFeed(
+    _get_webflow_rates_index,
+    poll_interval=settings.rates_stream_poll_seconds,
+    history=settings.rates_stream_history,
+)
+
+
+@rates_router.get("/rates", response_model=RatesOut)
+async def rates(city: Optional[str] = None):
+    """Current rates as ``{city, pair, rate}`` entries (``city`` is the normalized name)."""
+    index = await _get_webflow_rates_index()
+    if index is None:
+        raise HTTPException(503, "Rates are unavailable")
+    if city:
+        key = city.strip().casefold()
+        index = {key: index[key]} if key in index else {}
+    return {"ok": True, "rates": entries(flatten(index))}
+
+
+def _event(name: str, version: int, data: Dict[str, Any]) -> bytes:
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {name}\nid: {version}\ndata: {payload}\n\n".encode("utf-8")
+
+
+async def _stream() -> AsyncIterator[bytes]:
+    async with rates_feed.subscribe() as feed:
+        # reconnect delay for EventSource
+        yield f"retry: {int(settings.rates_stream_retry_seconds * 1000)}\n\n".encode()
+        sent = 0
+        while True:
+            version = await feed.wait(sent, settings.rates_stream_heartbeat_seconds)
+            if version == sent:
+                yield b": ping\n\n"
+                continue
+            is_snapshot, changes = feed.changes_since(sent)
+            sent = version
+            if changes or is_snapshot:
+                yield _event("snapshot" if is_snapshot else "rates", version, {"rates": entries(changes)})
+
+
+@rates_router.get("/rates/stream")
+async def rates_stream():
+    """SSE: a ``snapshot`` event with every rate, then ``rates`` events with changed entries
+    only (``rate: null`` when an entry disappears), and ``: ping`` comments as heartbeats."""
+    if rates_feed.subscribers >= settings.rates_stream_max_clients:
+        raise HTTPException(503, "Too many rate stream clients, try again later")
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,11 +1,20 @@
-from fastapi import APIRouter, HTTPException, Request, Depends
+import base64
+import hashlib
+import json
+from datetime import datetime
+from typing import Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response, Depends
+from sqlalchemy import func, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from db import SessionLocal
-from models.user import User
 from models.lead import Lead
 from auth_tokens import decode_token
+from metrics import count_auth_failures
+from routers.leads import _get_current_user  # cached user lookup
+from schemas.user import ApplicationsPage, MeOut
 
 users_router = APIRouter()
 
@@ -20,6 +29,7 @@ def _get_access_token(request: Request) -> str | None:
     return request.cookies.get("access_token")
 
 
+@count_auth_failures
 def _get_tg_user_id_from_request(request: Request) -> str:
     token = _get_access_token(request)
     if not token:
@@ -44,43 +54,106 @@ def _get_tg_user_id_from_request(request: Request) -> str:
     return tg_user_id
 
 
-@users_router.get("/me")
-async def me(request: Request, db: AsyncSession = Depends(get_db)):
-    tg_user_id = _get_tg_user_id_from_request(request)
+# Per-user responses: the browser may keep them but must revalidate (If-None-Match) each time
+_CACHE_CONTROL = "private, no-cache"
+
+
+def _etag(*parts: object) -> str:
+    digest = hashlib.sha256("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:32]
+    return f'"{digest}"'
+
 
-    result = await db.execute(select(User).where(User.tg_user_id == tg_user_id))
-    user = result.scalars().first()
-    if not user:
-        raise HTTPException(404, "User not found")
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+@users_router.get("/me", response_model=MeOut)
+async def me(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    user = await _get_current_user(request, db)
+
+    etag = _etag("me", user.id, user.tg_user_id, user.username)
+    headers = {"ETag": etag, "Cache-Control": _CACHE_CONTROL}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
 
     return {"id": user.id, "tg_user_id": user.tg_user_id, "username": user.username}
 
 
-@users_router.get("/me/applications")
-async def my_applications(request: Request, db: AsyncSession = Depends(get_db)):
-    """Return all leads (applications) for the current user."""
-    tg_user_id = _get_tg_user_id_from_request(request)
+APPLICATIONS_PAGE_SIZE = 50
+APPLICATIONS_PAGE_SIZE_MAX = 100
 
-    result = await db.execute(
-        select(Lead)
-        .where(Lead.tg_user_id == tg_user_id)
-        .order_by(Lead.created_at.desc())
-    )
-    leads = result.scalars().all()
-
-    return {
-        "ok": True,
-        "items": [
-            {
-                "id": lead.id,
-                "created_at": lead.created_at.isoformat() if lead.created_at else None,
-                "city": lead.city,
-                "exchange_type": lead.exchange_type,
-                "receive_type": lead.receive_type,
-                "sum": lead.sum,
-                "wallet_address": lead.wallet_address,
-                "meta": lead.meta,
-            }
-            for lead in leads
-        ],
-    }
+# Only the columns the response carries (no ORM objects)
+_APPLICATION_COLUMNS = (
+    Lead.id,
+    Lead.created_at,
+    Lead.city,
+    Lead.exchange_type,
+    Lead.receive_type,
+    Lead.sum,
+    Lead.wallet_address,
+    Lead.meta,
+)
+
+
+def _encode_cursor(created_at: datetime, lead_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), lead_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, lead_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(lead_id)
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+
+@users_router.get("/me/applications", response_model=ApplicationsPage)
+async def my_applications(
+    request: Request,
+    response: Response,
+    limit: int = Query(APPLICATIONS_PAGE_SIZE, ge=1, le=APPLICATIONS_PAGE_SIZE_MAX),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Return the current user's leads (applications), newest first, one page at a time.
+
+    Keyset pagination over ``(created_at, id)``; pass ``next_cursor`` back as ``cursor``.
+    Served by the ``ix_leads_user_created_id`` index.
+
+    The ETag is derived from the user's lead count and max(id) (both read from that
+    index) plus the page parameters. Leads are only ever added, so a matching
+    ``If-None-Match`` is answered 304 without loading any rows.
+    """
+    tg_user_id = _get_tg_user_id_from_request(request)
+    after = _decode_cursor(cursor) if cursor else None
+
+    count, max_id = (
+        await db.execute(select(func.count(), func.max(Lead.id)).where(Lead.tg_user_id == tg_user_id))
+    ).one()
+    etag = _etag("applications", tg_user_id, count, max_id, limit, cursor or "")
+    headers = {"ETag": etag, "Cache-Control": _CACHE_CONTROL}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    stmt = select(*_APPLICATION_COLUMNS).where(Lead.tg_user_id == tg_user_id)
+    if after is not None:
+        stmt = stmt.where(tuple_(Lead.created_at, Lead.id) < tuple_(*after))
+    stmt = stmt.order_by(Lead.created_at.desc(), Lead.id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(stmt)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    # Rows go to the response model as-is: validated and dumped to JSON bytes by pydantic
+    return {"ok": True, "items": rows, "next_cursor": next_cursor}
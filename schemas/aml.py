@@ -1,7 +1,19 @@
 from pydantic import BaseModel, Field
+from datetime import datetime
 from typing import Any, Dict, Optional
 
 
 class AMLCheckRequest(BaseModel):
     wallet_address: str = Field(..., min_length=1, max_length=256)
     meta: Optional[Dict[str, Any]] = None
+
+
+class AMLJobOut(BaseModel):
+    ok: bool = True
+    job_id: int
+    status: str
+    deduplicated: bool = False
+    wallet_address: str
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    webhook_result: Optional[Dict[str, Any]] = None  # as returned by _post_aml_webhook_json
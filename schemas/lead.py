@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 
 class LeadCreate(BaseModel):
@@ -9,3 +9,31 @@ class LeadCreate(BaseModel):
     sum: str = Field(..., min_length=1)
     wallet_address: str = Field(..., min_length=1)
     meta: Optional[Dict[str, Any]] = None
+
+
+class LeadBatchCreate(BaseModel):
+    # Items are validated one by one as LeadCreate so one bad item doesn't fail the batch
+    items: List[Any] = Field(..., min_length=1)
+
+
+class LeadOut(BaseModel):
+    ok: bool = True
+    lead_id: int
+    forwarded: bool
+    webhook_status: Optional[str] = None
+
+
+class LeadBatchItemOut(BaseModel):
+    index: int
+    ok: bool
+    lead_id: Optional[int] = None
+    webhook_status: Optional[str] = None
+    errors: Optional[List[Dict[str, Any]]] = None  # pydantic validation errors of a rejected item
+
+
+class LeadBatchOut(BaseModel):
+    ok: bool
+    created: int
+    failed: int
+    forwarded: bool
+    results: List[LeadBatchItemOut]
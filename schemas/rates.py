@@ -0,0 +1,14 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class RateEntry(BaseModel):
+    city: str  # normalized (casefolded) city name
+    pair: str
+    rate: Optional[str] = None
+
+
+class RatesOut(BaseModel):
+    ok: bool = True
+    rates: List[RateEntry]
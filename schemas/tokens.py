@@ -1,6 +1,18 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 class TokenPair(BaseModel):
     access_token: str
     refresh_token: str
     token_type: str = "bearer"
+
+
+class TokenResponse(TokenPair):
+    ok: bool = True
+    expires_in: int  # access token lifetime, seconds
+
+
+class AuthResponse(TokenResponse):
+    tg_user_id: int
+    username: Optional[str] = None
@@ -0,0 +1,30 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class MeOut(BaseModel):
+    id: int
+    tg_user_id: str
+    username: Optional[str] = None
+
+
+class ApplicationOut(BaseModel):
+    # validated straight from the selected Row objects
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    created_at: Optional[datetime] = None
+    city: str
+    exchange_type: str
+    receive_type: str
+    sum: str
+    wallet_address: str
+    meta: Optional[Dict[str, Any]] = None
+
+
+class ApplicationsPage(BaseModel):
+    ok: bool = True
+    items: List[ApplicationOut]
+    next_cursor: Optional[str] = None
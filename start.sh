@@ -1,10 +1,26 @@
 #!/usr/bin/env bash
 set -euo pipefail
 
+# Boot-to-ready is measured from here; each worker logs "READY ..." (see main.py)
+export BOOT_STARTED_AT="${BOOT_STARTED_AT:-$(date +%s.%N)}"
+
 PORT="${PORT:-8000}"
 LOG_LEVEL="${LOG_LEVEL:-info}"
+# Worker processes; uvicorn supervises them and restarts any that die
+WEB_CONCURRENCY="${WEB_CONCURRENCY:-1}"
+
+# Run DB migrations once, before any worker starts. Replicas booting together take
+# turns on a Postgres advisory lock; at head this returns without loading Alembic.
+python -m migrate
 
-# Run DB migrations (safe to run on every start)
-python -m alembic upgrade head
+if [ "${WEB_CONCURRENCY}" -gt 1 ]; then
+  # /metrics sums the workers' snapshots from a shared directory (see metrics.py)
+  export METRICS_MULTIPROC_DIR="${METRICS_MULTIPROC_DIR:-/tmp/miniapp-metrics}"
+fi
+if [ -n "${METRICS_MULTIPROC_DIR:-}" ]; then
+  # snapshots of the previous run's workers would be summed in forever
+  mkdir -p "${METRICS_MULTIPROC_DIR}"
+  rm -f "${METRICS_MULTIPROC_DIR}"/metrics-*.json
+fi
 
-exec uvicorn main:app --host 0.0.0.0 --port "${PORT}" --log-level "${LOG_LEVEL}"
\ No newline at end of file
+exec uvicorn main:app --host 0.0.0.0 --port "${PORT}" --log-level "${LOG_LEVEL}" --workers "${WEB_CONCURRENCY}"
@@ -0,0 +1,164 @@
+"""Optional same-origin serving of the mini-app pages in ``site/``.
+
+Enabled with ``STATIC_SITE_DIR``. Every file is read once at startup and kept in memory
+with its gzip (and brotli, if the ``brotli`` package is installed) encoding and a strong
+content-hash ETag, so a request never touches the disk:
+
+- ``Accept-Encoding`` picks the smallest acceptable variant (``Vary: Accept-Encoding``);
+- ``If-None-Match`` matching the current content answers ``304 Not Modified``;
+- HTML gets ``STATIC_HTML_CACHE_CONTROL`` (default ``no-cache``: always revalidate,
+  which is a 304 on every re-open), other files ``STATIC_ASSET_CACHE_CONTROL``.
+
+Pages are served under ``STATIC_SITE_PREFIX`` (``/app/exchange.html``, or without the
+extension, ``/app/exchange``; ``/app/`` is ``home.html``). Served from the backend's
+own host, the pages' ``fetch(BACKEND_BASE + ...)`` calls are same-origin and skip the
+CORS preflight.
+"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from accept_encoding import accepted_encodings
+
+log = logging.getLogger("miniapp")
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+INDEX = "home.html"
+_COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+_MIN_COMPRESS_BYTES = 512
+
+
+@dataclass
+class Asset:
+    content_type: str
+    etag: str  # quoted hex digest of the uncompressed bytes
+    cache_control: str
+    bodies: Dict[str, bytes] = field(default_factory=dict)  # encoding ("identity", "gzip", "br") -> bytes
+
+    def variant_etag(self, encoding: str) -> str:
+        # Strong validators must differ per representation
+        return self.etag if encoding == "identity" else f'{self.etag[:-1]}-{encoding}"'
+
+
+def _content_type(name: str) -> str:
+    guessed, _ = mimetypes.guess_type(name)
+    guessed = guessed or "application/octet-stream"
+    if guessed.startswith("text/") or guessed in ("application/javascript", "application/json"):
+        return f"{guessed}; charset=utf-8"
+    return guessed
+
+
+def build_asset(name: str, raw: bytes, *, html_cache_control: str, asset_cache_control: str) -> Asset:
+    content_type = _content_type(name)
+    asset = Asset(
+        content_type=content_type,
+        etag=f'"{hashlib.sha256(raw).hexdigest()[:32]}"',
+        cache_control=html_cache_control if content_type.startswith("text/html") else asset_cache_control,
+        bodies={"identity": raw},
+    )
+    if len(raw) >= _MIN_COMPRESS_BYTES and content_type.startswith(_COMPRESSIBLE):
+        gz = gzip.compress(raw, compresslevel=9, mtime=0)
+        if len(gz) < len(raw):
+            asset.bodies["gzip"] = gz
+        if brotli is not None:
+            br = brotli.compress(raw, quality=11)
+            if len(br) < len(raw):
+                asset.bodies["br"] = br
+    return asset
+
+
+def _etag_matches(header: str, asset: Asset) -> bool:
+    if header.strip() == "*":
+        return True
+    # weak comparison (RFC 9110 13.1.2): ignore W/ and accept any encoding's validator
+    candidates = {asset.variant_etag(enc) for enc in asset.bodies}
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag in candidates:
+            return True
+    return False
+
+
+class StaticSite:
+    def __init__(
+        self,
+        directory: str,
+        *,
+        html_cache_control: str = "no-cache",
+        asset_cache_control: str = "public, max-age=86400",
+    ):
+        self.directory = directory
+        self.assets: Dict[str, Asset] = {}
+        for root, _, files in os.walk(directory):
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, directory).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    raw = f.read()
+                self.assets[name] = build_asset(
+                    name, raw, html_cache_control=html_cache_control, asset_cache_control=asset_cache_control
+                )
+        log.info("Static site loaded from %s: %s", directory, self.stats())
+
+    def stats(self) -> Dict[str, int]:
+        out = {"files": len(self.assets)}
+        for asset in self.assets.values():
+            for encoding, body in asset.bodies.items():
+                out[f"{encoding}_bytes"] = out.get(f"{encoding}_bytes", 0) + len(body)
+        return out
+
+    def lookup(self, name: str) -> Optional[Asset]:
+        name = name.strip("/") or INDEX
+        return self.assets.get(name) or self.assets.get(f"{name}.html")
+
+    def response(self, name: str, request: Request) -> Response:
+        asset = self.lookup(name)
+        if asset is None:
+            raise HTTPException(404, "Not found")
+
+        accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = min(
+            (enc for enc in asset.bodies if enc == "identity" or enc in accepted),
+            key=lambda enc: len(asset.bodies[enc]),
+        )
+        headers = {
+            "ETag": asset.variant_etag(encoding),
+            "Cache-Control": asset.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, asset):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(asset.bodies[encoding], media_type=asset.content_type, headers=headers)
+
+    def router(self, prefix: str) -> APIRouter:
+        router = APIRouter()
+        prefix = "/" + prefix.strip("/")
+
+        # async: answered from memory, no threadpool hop
+        async def index(request: Request) -> Response:
+            return self.response(INDEX, request)
+
+        async def page(name: str, request: Request) -> Response:
+            return self.response(name, request)
+
+        for path, endpoint in ((f"{prefix}/", index), (f"{prefix}/{{name:path}}", page)):
+            router.add_api_route(path, endpoint, methods=["GET", "HEAD"], include_in_schema=False)
+        return router
@@ -0,0 +1,154 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import circuit_breaker
+import http_client
+import utils
+from identity_cache import identity_cache
+from idempotency import idempotency_store
+from ratelimit import rate_limit_store
+from rates_cache import rates_cache
+
+
+@pytest.fixture(autouse=True)
+def _reset_rates_cache():
+    rates_cache.clear()
+    yield
+    rates_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_identity_cache():
+    identity_cache.clear()
+    yield
+    identity_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_idempotency_store():
+    idempotency_store.clear()
+    yield
+    idempotency_store.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_rate_limit_store():
+    rate_limit_store.clear()
+    yield
+    rate_limit_store.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_circuit_breakers():
+    circuit_breaker.clear()
+    yield
+    circuit_breaker.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_init_data_memo():
+    utils._memo.clear()
+    yield
+    utils._memo.clear()
+
+
+@pytest.fixture(autouse=True)
+async def _reset_http_client():
+    # the shared client is bound to the event loop of the test that created it
+    yield
+    await http_client.close_http_client()
+
+
+@pytest.fixture
+async def db_sessionmaker(tmp_path):
+    """SQLite stand-in for Postgres (FOR UPDATE SKIP LOCKED is a no-op there)."""
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    import models.aml_check  # noqa: F401  (register tables on Base.metadata)
+    import models.idempotency_key  # noqa: F401
+    import models.lead  # noqa: F401
+    import models.lead_outbox  # noqa: F401
+    import models.user  # noqa: F401
+    from db import Base
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+class StubWebhookServer:
+    """Minimal local HTTP server that records JSON bodies and replies with queued statuses."""
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        self.url = ""
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/webhook"
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in head.decode("latin-1").split("\r\n"):
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        body = await reader.readexactly(length) if length else b""
+        self.requests.append(json.loads(body) if body else None)
+
+        status = self.statuses.pop(0) if self.statuses else 200
+        payload = json.dumps({"ok": status < 300}).encode()
+        writer.write(
+            f"HTTP/1.1 {status} Stub\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+        )
+        await writer.drain()
+        writer.close()
+
+
+@pytest.fixture
+async def webhook_stub():
+    server = StubWebhookServer()
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest.fixture
+async def api(db_sessionmaker):
+    """ASGI client for the app, authenticated as tg user 42, backed by db_sessionmaker."""
+    from auth_tokens import create_token
+    from main import app
+    from models.user import User
+    from routers import aml, auth, leads, users
+
+    async with db_sessionmaker() as db:
+        db.add(User(tg_user_id="42", username="alice"))
+        await db.commit()
+
+    async def _get_db():
+        async with db_sessionmaker() as session:
+            yield session
+
+    for router in (aml, auth, leads, users):
+        app.dependency_overrides[router.get_db] = _get_db
+    token = create_token(token_type="access", subject="42", ttl_seconds=60)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        client.headers["Authorization"] = f"Bearer {token}"
+        yield client
+    app.dependency_overrides.clear()
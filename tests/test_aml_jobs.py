@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import aml_jobs
+from auth_tokens import create_token
+from models.aml_check import AMLCheck
+from models.user import User
+from routers import aml as aml_router
+from settings import settings
+
+
+@pytest.fixture
+async def pool(db_sessionmaker, webhook_stub, monkeypatch):
+    monkeypatch.setattr(settings, "aml_webhook_url", webhook_stub.url)
+    p = aml_jobs.AMLJobPool(send=aml_router._post_aml_webhook_json, session_factory=db_sessionmaker, workers=2)
+    await p.start(recover=False)
+    yield p
+    await p.stop()
+
+
+@pytest.mark.asyncio
+async def test_aml_check_returns_job_and_result_can_be_polled(api, pool, webhook_stub):
+    r = await api.post("/aml/check", json={"wallet_address": "TWallet000000000000000000000000001"})
+
+    assert r.status_code == 202
+    job = r.json()
+    assert job["status"] == "pending"
+    assert job["deduplicated"] is False
+
+    await pool.join()
+
+    r = await api.get(f"/aml/check/{job['job_id']}")
+    assert r.status_code == 200
+    assert r.json()["status"] == "done"
+    assert r.json()["webhook_result"]["status"] == 200
+    assert webhook_stub.requests[0]["variables"]["aml_wallet_address"] == "TWallet000000000000000000000000001"
+
+
+@pytest.mark.asyncio
+async def test_repeat_check_of_same_wallet_reuses_job(api, pool, webhook_stub):
+    first = (await api.post("/aml/check", json={"wallet_address": "TWalletA"})).json()
+    second = (await api.post("/aml/check", json={"wallet_address": "TWalletA"})).json()
+    other = (await api.post("/aml/check", json={"wallet_address": "TWalletB"})).json()
+
+    assert second["job_id"] == first["job_id"]
+    assert second["deduplicated"] is True
+    assert other["job_id"] != first["job_id"]
+
+    await pool.join()
+    assert len(webhook_stub.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_not_reused(api, pool, webhook_stub):
+    webhook_stub.statuses = [502]
+    first = (await api.post("/aml/check", json={"wallet_address": "TWalletA"})).json()
+    await pool.join()
+    assert (await api.get(f"/aml/check/{first['job_id']}")).json()["status"] == "failed"
+
+    second = (await api.post("/aml/check", json={"wallet_address": "TWalletA"})).json()
+
+    assert second["job_id"] != first["job_id"]
+    assert second["deduplicated"] is False
+
+
+@pytest.mark.asyncio
+async def test_job_of_another_user_is_not_visible(api, pool, db_sessionmaker):
+    job_id = (await api.post("/aml/check", json={"wallet_address": "TWalletA"})).json()["job_id"]
+
+    async with db_sessionmaker() as db:
+        db.add(User(tg_user_id="7", username="mallory"))
+        await db.commit()
+    token = create_token(token_type="access", subject="7", ttl_seconds=60)
+
+    r = await api.get(f"/aml/check/{job_id}", headers={"Authorization": f"Bearer {token}"})
+
+    assert r.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_aml_check_is_rejected_when_no_worker_pool(api):
+    r = await api.post("/aml/check", json={"wallet_address": "TWalletA"})
+
+    assert r.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_running_job_past_its_lease_is_run_again(db_sessionmaker, webhook_stub, monkeypatch):
+    monkeypatch.setattr(settings, "aml_webhook_url", webhook_stub.url)
+    now = datetime.now(timezone.utc)
+    async with db_sessionmaker() as db:
+        stale = AMLCheck(tg_user_id="42", wallet_address="TStale", status="running", started_at=now - timedelta(hours=1))
+        live = AMLCheck(tg_user_id="42", wallet_address="TLive", status="running", started_at=now)
+        db.add_all([stale, live])
+        await db.commit()
+        ids = {"stale": stale.id, "live": live.id}
+
+    p = aml_jobs.AMLJobPool(send=aml_router._post_aml_webhook_json, session_factory=db_sessionmaker, workers=1)
+    await p.start()
+    await p.join()
+    await p.stop()
+
+    async with db_sessionmaker() as db:
+        assert (await db.get(AMLCheck, ids["stale"])).status == "done"
+        assert (await db.get(AMLCheck, ids["live"])).status == "running"
+    assert [r["variables"]["aml_wallet_address"] for r in webhook_stub.requests] == ["TStale"]
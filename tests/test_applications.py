@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models.lead import Lead
+
+
+async def _add_leads(db_sessionmaker, n, *, tg_user_id="42", same_time=False):
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    async with db_sessionmaker() as db:
+        for i in range(n):
+            db.add(
+                Lead(
+                    tg_user_id=tg_user_id,
+                    username="alice",
+                    city="Москва",
+                    exchange_type="USDT/RUB",
+                    receive_type="офис",
+                    sum=str(i),
+                    wallet_address="TXYZ",
+                    meta={"i": i},
+                    created_at=base if same_time else base + timedelta(minutes=i),
+                )
+            )
+        await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_applications_are_paginated_newest_first(api, db_sessionmaker):
+    await _add_leads(db_sessionmaker, 5)
+    await _add_leads(db_sessionmaker, 3, tg_user_id="7")
+
+    first = (await api.get("/me/applications", params={"limit": 2})).json()
+    assert [it["sum"] for it in first["items"]] == ["4", "3"]
+    assert first["next_cursor"]
+
+    second = (await api.get("/me/applications", params={"limit": 2, "cursor": first["next_cursor"]})).json()
+    third = (await api.get("/me/applications", params={"limit": 2, "cursor": second["next_cursor"]})).json()
+
+    assert [it["sum"] for it in second["items"]] == ["2", "1"]
+    assert [it["sum"] for it in third["items"]] == ["0"]
+    assert third["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_pagination_is_stable_when_timestamps_tie(api, db_sessionmaker):
+    await _add_leads(db_sessionmaker, 5, same_time=True)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = (await api.get("/me/applications", params=params)).json()
+        seen += [it["id"] for it in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == sorted(seen, reverse=True)
+    assert len(set(seen)) == 5
+
+
+@pytest.mark.asyncio
+async def test_page_size_is_capped_and_cursor_validated(api):
+    assert (await api.get("/me/applications", params={"limit": 1000})).status_code == 422
+    assert (await api.get("/me/applications", params={"cursor": "garbage"})).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_applications_etag_changes_only_when_leads_change(api, db_sessionmaker):
+    await _add_leads(db_sessionmaker, 3)
+
+    first = await api.get("/me/applications", params={"limit": 2})
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    again = await api.get("/me/applications", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+    other_page = await api.get("/me/applications", params={"limit": 3}, headers={"If-None-Match": etag})
+    assert other_page.status_code == 200
+
+    await _add_leads(db_sessionmaker, 1)
+    changed = await api.get("/me/applications", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_me_supports_if_none_match(api):
+    first = await api.get("/me")
+    assert first.status_code == 200
+
+    r = await api.get("/me", headers={"If-None-Match": f'W/{first.headers["etag"]}'})
+    assert r.status_code == 304
@@ -0,0 +1,70 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import urlencode
+
+import pytest
+from sqlalchemy.future import select
+
+from identity_cache import CachedUser, identity_cache
+from models.user import User
+from settings import settings
+from utils import _data_check_string, _webapp_secret_key
+
+
+def _init_data(user: dict) -> str:
+    fields = {"auth_date": str(int(time.time())), "query_id": "AAE", "user": json.dumps(user)}
+    dcs = _data_check_string(fields)
+    fields["hash"] = hmac.new(_webapp_secret_key(settings.bot_token), dcs.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+async def _users(db_sessionmaker):
+    async with db_sessionmaker() as db:
+        return (await db.execute(select(User).order_by(User.id))).scalars().all()
+
+
+@pytest.mark.asyncio
+async def test_login_creates_user_and_sets_cookies(api, db_sessionmaker):
+    r = await api.post("/auth/telegram-webapp", json={"initData": _init_data({"id": 1001, "username": "bob"})})
+
+    assert r.status_code == 200
+    assert r.json()["tg_user_id"] == 1001
+    assert "access_token" in r.cookies
+    assert [(u.tg_user_id, u.username) for u in await _users(db_sessionmaker)][-1] == ("1001", "bob")
+
+
+@pytest.mark.asyncio
+async def test_login_updates_username_and_invalidates_identity_cache(api, db_sessionmaker):
+    identity_cache.put(CachedUser(id=1, tg_user_id="42", username="alice"))
+
+    r = await api.post("/auth/telegram-webapp", json={"initData": _init_data({"id": 42, "username": "alice_new"})})
+
+    assert r.status_code == 200
+    assert [(u.tg_user_id, u.username) for u in await _users(db_sessionmaker)] == [("42", "alice_new")]
+    assert identity_cache.get("42") is None
+
+
+@pytest.mark.asyncio
+async def test_login_with_unchanged_username_is_a_noop(api, db_sessionmaker):
+    identity_cache.put(CachedUser(id=1, tg_user_id="42", username="alice"))
+
+    r = await api.post("/auth/telegram-webapp", json={"initData": _init_data({"id": 42, "username": "alice"})})
+
+    assert r.status_code == 200
+    assert identity_cache.get("42") is not None
+    assert len(await _users(db_sessionmaker)) == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_first_logins_create_one_user(api, db_sessionmaker):
+    init_data = _init_data({"id": 2002, "username": "carol"})
+
+    responses = await asyncio.gather(
+        *(api.post("/auth/telegram-webapp", json={"initData": init_data}) for _ in range(5))
+    )
+
+    assert [r.status_code for r in responses] == [200] * 5
+    assert [u.tg_user_id for u in await _users(db_sessionmaker)].count("2002") == 1
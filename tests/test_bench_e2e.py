@@ -0,0 +1,61 @@
+import httpx
+from fastapi import FastAPI, HTTPException
+
+from bench.e2e import compare, run_level
+from bench.stubs import StubServer, webflow_handler
+
+
+def _result(scenario, concurrency, rps, p95, error_rate=0.0):
+    return {"scenario": scenario, "concurrency": concurrency, "throughput_rps": rps, "p95_ms": p95, "error_rate": error_rate}
+
+
+def test_compare_flags_throughput_latency_and_error_regressions():
+    baseline = {"results": [_result("me", 8, 400, 20), _result("leads", 8, 100, 50), _result("aml", 8, 50, 80)]}
+    current = {
+        "results": [
+            _result("me", 8, 380, 21),  # within 10%
+            _result("leads", 8, 100, 70),  # p95 +40%
+            _result("aml", 8, 50, 80, error_rate=0.05),
+            _result("auth", 8, 10, 10),  # not in baseline
+        ]
+    }
+
+    rows = {r["scenario"]: r for r in compare(current, baseline, tolerance=0.10)}
+
+    assert set(rows) == {"me", "leads", "aml"}
+    assert rows["me"]["verdict"] == "ok"
+    assert rows["leads"]["verdict"] == "REGRESSION" and rows["leads"]["p95_delta"] == "+40.0%"
+    assert rows["aml"]["verdict"] == "REGRESSION"
+
+
+async def test_webflow_stub_paginates_and_injects_errors():
+    stub = await StubServer(webflow_handler(250)).start()
+    try:
+        async with httpx.AsyncClient(base_url=stub.url) as client:
+            r = await client.get("/v2/collections/x/items", params={"offset": 200, "limit": 100})
+            assert r.json()["pagination"]["total"] == 250
+            assert len(r.json()["items"]) == 50
+
+            stub.error_rate = 1.0
+            assert (await client.get("/v2/collections/x/items")).status_code == 503
+        assert (stub.requests, stub.errors) == (2, 1)
+    finally:
+        await stub.stop()
+
+
+async def test_run_level_counts_requests_and_non_2xx_as_errors():
+    app = FastAPI()
+
+    @app.get("/n/{i}")
+    async def n(i: int):
+        if i % 4 == 0:
+            raise HTTPException(500, "boom")
+        return {"i": i}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+        row = await run_level(client, lambda i: {"method": "GET", "url": f"/n/{i}"}, concurrency=4, requests=20)
+
+    assert row["requests"] == 20
+    assert row["errors"] == 5
+    assert row["statuses"] == {"200": 15, "500": 5}
+    assert row["p50_ms"] <= row["p95_ms"] <= row["max_ms"]
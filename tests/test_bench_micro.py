@@ -0,0 +1,17 @@
+from bench import micro
+
+
+def test_every_case_runs_and_is_measured():
+    for name, factory in micro.CASES.items():
+        result = micro.measure(factory(), min_time=0.001, repeat=2, warmup=0.0)
+        assert result["ns_per_op"] > 0, name
+        assert result["number"] >= 1
+
+
+def test_compare_flags_slowdowns_beyond_tolerance():
+    baseline = {"results": [{"case": "a", "ns_per_op": 1000.0}, {"case": "b", "ns_per_op": 1000.0}]}
+    current = {"results": [{"case": "a", "ns_per_op": 1100.0}, {"case": "b", "ns_per_op": 1300.0}, {"case": "c", "ns_per_op": 5.0}]}
+
+    rows = {r["case"]: r["verdict"] for r in micro.compare(current, baseline, tolerance=0.15)}
+
+    assert rows == {"a": "ok", "b": "REGRESSION"}
@@ -0,0 +1,129 @@
+import asyncio
+
+import httpx
+import pytest
+import respx
+
+import circuit_breaker
+import http_client
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from routers.leads import _post_webhook_json
+from settings import settings
+
+
+def _breaker(**overrides):
+    options = dict(
+        window_seconds=30, min_calls=4, error_rate=0.5, slow_call_seconds=1.0, open_seconds=10.0, half_open_calls=2
+    )
+    options.update(overrides)
+    return CircuitBreaker("test", **options)
+
+
+def test_opens_on_error_rate_and_fails_fast(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    breaker = _breaker()
+
+    for ok in (True, False, True):
+        breaker.before_call()
+        breaker.record(ok=ok, duration=0.1)
+    assert breaker.state == circuit_breaker.CLOSED  # below min_calls
+
+    breaker.before_call()
+    breaker.record(ok=False, duration=0.1)
+    assert breaker.state == circuit_breaker.OPEN
+
+    with pytest.raises(CircuitOpenError) as exc:
+        breaker.before_call()
+    assert exc.value.retry_in == pytest.approx(10.0)
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_old_failures_leave_the_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    breaker = _breaker()
+
+    for _ in range(3):
+        breaker.record(ok=False, duration=0.1)
+    now[0] += 31
+    breaker.record(ok=False, duration=0.1)
+
+    assert breaker.state == circuit_breaker.CLOSED
+    assert breaker.stats()["window_calls"] == 1
+
+
+def test_slow_calls_count_as_failures():
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(ok=True, duration=2.0)
+    assert breaker.state == circuit_breaker.OPEN
+
+
+def test_half_open_trials_close_or_reopen(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(ok=False, duration=0.1)
+
+    now[0] += 10
+    breaker.before_call()
+    breaker.before_call()
+    assert breaker.state == circuit_breaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # both trial slots taken
+    breaker.record(ok=False, duration=0.1)
+    assert breaker.state == circuit_breaker.OPEN
+
+    now[0] += 10
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record(ok=True, duration=0.1)
+    assert breaker.state == circuit_breaker.CLOSED
+    assert breaker.stats()["times_opened"] == 2
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_request_short_circuits_while_open(monkeypatch):
+    monkeypatch.setattr(settings, "circuit_min_calls", 2)
+    route = respx.post("https://hooks.example.com/lead").respond(503)
+
+    for _ in range(2):
+        r = await http_client.request(http_client.LEAD_WEBHOOK, "POST", "https://hooks.example.com/lead", json={})
+        assert r.status_code == 503
+    with pytest.raises(CircuitOpenError):
+        await http_client.request(http_client.LEAD_WEBHOOK, "POST", "https://hooks.example.com/lead", json={})
+
+    assert route.call_count == 2
+    assert circuit_breaker.stats()["lead_webhook"]["state"] == circuit_breaker.OPEN
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_deadline_bounds_the_whole_call(monkeypatch):
+    monkeypatch.setattr(settings, "lead_webhook_deadline_seconds", 0.05)
+
+    async def slow(request):
+        await asyncio.sleep(1)
+        return httpx.Response(200)
+
+    respx.post("https://hooks.example.com/lead").mock(side_effect=slow)
+    with pytest.raises(TimeoutError):
+        await http_client.request(http_client.LEAD_WEBHOOK, "POST", "https://hooks.example.com/lead", json={})
+    assert circuit_breaker.stats()["lead_webhook"]["window_failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_webhook_falls_back_while_open(monkeypatch, webhook_stub):
+    monkeypatch.setattr(settings, "lead_webhook_url", webhook_stub.url)
+    monkeypatch.setattr(settings, "circuit_min_calls", 1)
+    webhook_stub.statuses = [500]
+
+    assert (await _post_webhook_json({"tg_user_id": 1}))["status"] == 500
+    result = await _post_webhook_json({"tg_user_id": 1})
+
+    assert result["status"] == 0
+    assert "circuit open" in result["error"]
+    assert len(webhook_stub.requests) == 1
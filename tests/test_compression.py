@@ -0,0 +1,92 @@
+import gzip
+
+import httpx
+import pytest
+from starlette.responses import Response, StreamingResponse
+
+import compression
+from compression import CompressionMiddleware
+from models.lead import Lead
+
+
+async def _add_leads(db_sessionmaker, n):
+    async with db_sessionmaker() as db:
+        for i in range(n):
+            db.add(
+                Lead(
+                    tg_user_id="42",
+                    city="Москва",
+                    exchange_type="USDT/RUB",
+                    receive_type="офис",
+                    sum=str(i),
+                    wallet_address="TXYZ",
+                    meta={"i": i},
+                )
+            )
+        await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_large_api_responses_are_gzipped(api, db_sessionmaker):
+    await _add_leads(db_sessionmaker, 20)
+
+    r = await api.get("/me/applications", headers={"Accept-Encoding": "gzip"})
+
+    assert r.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in r.headers["vary"]
+    assert int(r.headers["content-length"]) < len(r.content)
+    assert len(r.json()["items"]) == 20
+
+
+@pytest.mark.asyncio
+async def test_small_responses_are_sent_as_is(api):
+    r = await api.get("/me", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in r.headers
+    assert r.json()["tg_user_id"] == "42"
+
+
+def _app(body: bytes, media_type: str, **headers):
+    return CompressionMiddleware(Response(body, media_type=media_type, headers=headers), minimum_size=10)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "media_type,headers",
+    [("text/event-stream", {}), ("application/json", {"Content-Encoding": "gzip"})],
+)
+async def test_event_streams_and_encoded_bodies_are_left_alone(media_type, headers):
+    body = gzip.compress(b"x" * 1000) if headers else b"data: x\n\n" * 100
+    transport = httpx.ASGITransport(app=_app(body, media_type, **headers))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert r.headers.get("content-encoding") == headers.get("Content-Encoding")
+    assert int(r.headers["content-length"]) == len(body)
+
+
+@pytest.mark.asyncio
+async def test_streamed_bodies_are_compressed_chunk_by_chunk():
+    chunks = [b'{"row": %d}\n' % i * 50 for i in range(5)]
+
+    async def rows():
+        for chunk in chunks:
+            yield chunk
+
+    app = CompressionMiddleware(StreamingResponse(rows(), media_type="application/x-ndjson"), minimum_size=10)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert r.headers["content-encoding"] == "gzip"
+    assert "content-length" not in r.headers
+    assert r.content == b"".join(chunks)
+
+
+def test_choose_encoding(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert compression.choose_encoding("gzip, deflate, br") == "gzip"
+    assert compression.choose_encoding("gzip;q=0, identity") is None
+
+    monkeypatch.setattr(compression, "brotli", object())
+    assert compression.choose_encoding("gzip, br") == "br"
@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import text
+
+import db
+from settings import settings
+
+
+@pytest.fixture
+async def sqlite_engine(tmp_path, monkeypatch):
+    pytest.importorskip("aiosqlite")
+    monkeypatch.setattr(db, "POSTGRES_DSN", f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}")
+    monkeypatch.setattr(db, "_engine", None)
+    monkeypatch.setattr(db, "pool_stats", db.PoolStats())
+    engine = db.get_engine()
+    yield engine
+    await engine.dispose()
+
+
+def test_engine_options_come_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "db_pool_size", 7)
+    monkeypatch.setattr(settings, "db_statement_cache_size", 0)
+
+    options = db._engine_options("postgresql+asyncpg://u:p@h/db")
+
+    assert options["echo"] is False
+    assert options["pool_size"] == 7
+    assert options["connect_args"]["statement_cache_size"] == 0
+    assert "connect_args" not in db._engine_options("sqlite+aiosqlite:///x.db")
+
+
+def test_pool_stats_are_none_before_engine_exists(monkeypatch):
+    monkeypatch.setattr(db, "_engine", None)
+
+    assert db.get_pool_stats() is None
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_report_checkouts_and_connection_age(sqlite_engine):
+    async with sqlite_engine.connect() as conn:
+        await conn.execute(text("select 1"))
+        during = db.get_pool_stats()
+
+    after = db.get_pool_stats()
+
+    assert during["checked_out"] == 1
+    assert after["checked_out"] == 0
+    assert after["checkouts"] == 1
+    assert after["connections_opened"] == 1
+    assert after["connection_age_max_s"] is not None
+
+
+async def test_health_stats_requires_the_admin_token(api, monkeypatch):
+    monkeypatch.setattr(settings, "admin_api_token", "admin-secret")
+
+    assert (await api.get("/health")).status_code == 200
+    assert (await api.get("/health/stats")).status_code == 401
+    r = await api.get("/health/stats", headers={"X-Admin-Token": "admin-secret"})
+    assert r.status_code == 200
+    assert "db_pool" in r.json()
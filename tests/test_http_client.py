@@ -0,0 +1,36 @@
+import pytest
+import respx
+
+import http_client
+from settings import settings
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_requests_reuse_the_shared_client():
+    respx.post("https://hooks.example.com/lead").respond(200, json={"ok": True})
+
+    client = http_client.get_http_client()
+    r1 = await http_client.request(http_client.LEAD_WEBHOOK, "POST", "https://hooks.example.com/lead", json={})
+    r2 = await http_client.request(http_client.LEAD_WEBHOOK, "POST", "https://hooks.example.com/lead", json={})
+
+    assert r1.status_code == r2.status_code == 200
+    assert http_client.get_http_client() is client
+
+
+@pytest.mark.asyncio
+async def test_close_http_client_allows_recreation():
+    first = http_client.get_http_client()
+    await http_client.close_http_client()
+
+    assert first.is_closed
+    assert http_client.get_http_client() is not first
+
+
+def test_timeout_is_per_destination(monkeypatch):
+    monkeypatch.setattr(settings, "aml_webhook_timeout_seconds", 15.0)
+    monkeypatch.setattr(settings, "webflow_timeout_seconds", 3.0)
+
+    assert http_client.timeout_for(http_client.AML_WEBHOOK).read == 15.0
+    assert http_client.timeout_for(http_client.WEBFLOW).read == 3.0
+    assert http_client.timeout_for(http_client.WEBFLOW).connect == settings.http_connect_timeout_seconds
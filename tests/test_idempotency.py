@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+from sqlalchemy.future import select
+
+from idempotency import idempotency_store
+from models.idempotency_key import IdempotencyKey
+from models.lead import Lead
+from models.lead_outbox import LeadOutbox
+from settings import settings
+
+LEAD_BODY = {
+    "city": "Москва",
+    "exchange_type": "USDT/RUB",
+    "receive_type": "В офисе / с менеджером",
+    "sum": "1000",
+    "wallet_address": "TXYZ",
+}
+
+
+@pytest.fixture(autouse=True)
+def _lead_webhook(webhook_stub, monkeypatch):
+    monkeypatch.setattr(settings, "lead_webhook_url", webhook_stub.url)
+
+
+async def _count(db_sessionmaker, model):
+    async with db_sessionmaker() as db:
+        return len((await db.execute(select(model))).scalars().all())
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_replays_first_response(api, db_sessionmaker):
+    first = await api.post("/leads", json=LEAD_BODY, headers={"Idempotency-Key": "k1"})
+    again = await api.post("/leads", json=LEAD_BODY, headers={"Idempotency-Key": "k1"})
+
+    assert first.status_code == again.status_code == 200
+    assert again.json() == first.json()
+    assert "idempotent-replayed" not in first.headers
+    assert again.headers["idempotent-replayed"] == "true"
+    assert await _count(db_sessionmaker, Lead) == 1
+    assert await _count(db_sessionmaker, LeadOutbox) == 1
+
+
+@pytest.mark.asyncio
+async def test_without_header_same_body_is_a_retry(api, db_sessionmaker):
+    first = await api.post("/leads", json=LEAD_BODY)
+    again = await api.post("/leads", json=LEAD_BODY)
+    other = await api.post("/leads", json={**LEAD_BODY, "sum": "2000"})
+
+    assert again.json()["lead_id"] == first.json()["lead_id"]
+    assert other.json()["lead_id"] != first.json()["lead_id"]
+    assert await _count(db_sessionmaker, Lead) == 2
+
+
+@pytest.mark.asyncio
+async def test_key_reused_with_different_body_is_rejected(api, db_sessionmaker):
+    await api.post("/leads", json=LEAD_BODY, headers={"Idempotency-Key": "k1"})
+    r = await api.post("/leads", json={**LEAD_BODY, "sum": "2000"}, headers={"Idempotency-Key": "k1"})
+
+    assert r.status_code == 422
+    assert await _count(db_sessionmaker, Lead) == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_wait_for_the_first(api, db_sessionmaker):
+    responses = await asyncio.gather(
+        *(api.post("/leads", json=LEAD_BODY, headers={"Idempotency-Key": "k1"}) for _ in range(5))
+    )
+
+    assert {r.status_code for r in responses} == {200}
+    assert len({r.json()["lead_id"] for r in responses}) == 1
+    assert sum(r.headers.get("idempotent-replayed") == "true" for r in responses) == 4
+    assert await _count(db_sessionmaker, Lead) == 1
+
+
+@pytest.mark.asyncio
+async def test_replay_from_database_when_not_in_memory(api, db_sessionmaker):
+    first = await api.post("/leads", json=LEAD_BODY, headers={"Idempotency-Key": "k1"})
+    idempotency_store.clear()  # another worker, or this one after a restart
+
+    again = await api.post("/leads", json=LEAD_BODY, headers={"Idempotency-Key": "k1"})
+
+    assert again.json() == first.json()
+    assert idempotency_store.stats()["db_hits"] == 1
+    assert await _count(db_sessionmaker, Lead) == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_key_is_taken_over(api, db_sessionmaker, monkeypatch):
+    monkeypatch.setattr(settings, "idempotency_body_window_seconds", 0)
+
+    first = await api.post("/leads", json=LEAD_BODY)
+    again = await api.post("/leads", json=LEAD_BODY)
+
+    assert again.json()["lead_id"] != first.json()["lead_id"]
+    assert await _count(db_sessionmaker, Lead) == 2
+    assert await _count(db_sessionmaker, IdempotencyKey) == 1
+
+
+@pytest.mark.asyncio
+async def test_keyed_lock_serializes_a_key_and_forgets_it():
+    from keyed_lock import KeyedLock
+
+    locks = KeyedLock()
+    order = []
+
+    async def hold(name):
+        async with locks.hold("k"):
+            order.append(f"{name}+")
+            await asyncio.sleep(0)
+            order.append(f"{name}-")
+
+    await asyncio.gather(hold("a"), hold("b"))
+
+    assert order == ["a+", "a-", "b+", "b-"]
+    assert len(locks) == 0
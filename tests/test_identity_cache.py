@@ -0,0 +1,49 @@
+import time
+
+import pytest
+from sqlalchemy import update
+
+from identity_cache import CachedUser, IdentityCache, identity_cache
+from models.user import User
+
+
+def _user(n: int) -> CachedUser:
+    return CachedUser(id=n, tg_user_id=str(n), username=f"user{n}")
+
+
+def test_entries_are_evicted_least_recently_used_first():
+    cache = IdentityCache(max_entries=2, ttl_seconds=60)
+    cache.put(_user(1))
+    cache.put(_user(2))
+    assert cache.get("1") is not None  # 2 is now the oldest
+    cache.put(_user(3))
+
+    assert cache.get("2") is None
+    assert cache.get("1") is not None
+    assert cache.get("3") is not None
+    assert cache.stats()["size"] == 2
+
+
+def test_entry_expiry_is_capped_at_token_exp():
+    cache = IdentityCache(max_entries=10, ttl_seconds=60)
+    cache.put(_user(1), token_exp=time.time() - 1)
+    cache.put(_user(2), token_exp=time.time() + 30)
+
+    assert cache.get("1") is None
+    assert cache.get("2") is not None
+    assert cache.stats()["hit_ratio"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_me_is_served_from_cache_until_invalidated(api, db_sessionmaker):
+    assert (await api.get("/me")).json()["username"] == "alice"
+
+    async with db_sessionmaker() as db:
+        await db.execute(update(User).where(User.tg_user_id == "42").values(username="alice2"))
+        await db.commit()
+
+    assert (await api.get("/me")).json()["username"] == "alice"
+    assert identity_cache.stats()["hits"] == 1
+
+    identity_cache.invalidate("42")
+    assert (await api.get("/me")).json()["username"] == "alice2"
@@ -0,0 +1,94 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from main import app
+from models.lead import Lead
+from routers import admin
+from settings import settings
+
+HEADERS = {"X-Admin-Token": "admin-secret"}
+
+
+@pytest.fixture
+async def export_api(api, db_sessionmaker, monkeypatch):
+    monkeypatch.setattr(settings, "admin_api_token", "admin-secret")
+    monkeypatch.setattr(settings, "export_chunk_rows", 2)
+    app.dependency_overrides[admin.get_export_engine] = lambda: db_sessionmaker.kw["bind"]
+
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    async with db_sessionmaker() as db:
+        for i, city in enumerate(["Москва", "Дубай", "Москва", "Москва", "Дубай"]):
+            db.add(
+                Lead(
+                    tg_user_id="42",
+                    username="alice",
+                    city=city,
+                    exchange_type="USDT/RUB",
+                    receive_type="офис",
+                    sum=str(i),
+                    wallet_address="TXYZ",
+                    meta={"note": "a,b"},
+                    created_at=base + timedelta(days=i),
+                )
+            )
+        await db.commit()
+    yield api
+
+
+@pytest.mark.asyncio
+async def test_export_requires_admin_token(export_api, monkeypatch):
+    assert (await export_api.get("/admin/leads/export")).status_code == 401
+
+    monkeypatch.setattr(settings, "admin_api_token", None)
+    assert (await export_api.get("/admin/leads/export", headers=HEADERS)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_export_ndjson_with_filters(export_api):
+    r = await export_api.get(
+        "/admin/leads/export",
+        params={"city": "Москва", "created_from": "2026-01-02T00:00:00+00:00"},
+        headers={**HEADERS, "Accept-Encoding": "identity"},
+    )
+
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [row["sum"] for row in rows] == ["2", "3"]
+    assert rows[0]["meta"] == {"note": "a,b"}
+
+
+@pytest.mark.asyncio
+async def test_export_csv(export_api):
+    r = await export_api.get(
+        "/admin/leads/export",
+        params={"format": "csv", "created_to": "2026-01-03T00:00:00+00:00"},
+        headers={**HEADERS, "Accept-Encoding": "identity"},
+    )
+
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert [row["city"] for row in rows] == ["Москва", "Дубай"]
+    assert json.loads(rows[0]["meta"]) == {"note": "a,b"}
+
+
+@pytest.mark.asyncio
+async def test_export_gzip_stream(export_api):
+    async with export_api.stream("GET", "/admin/leads/export", params={"gzip": "true"}, headers=HEADERS) as r:
+        assert r.headers["content-encoding"] == "gzip"
+        raw = b"".join([chunk async for chunk in r.aiter_raw()])
+
+    lines = gzip.decompress(raw).decode("utf-8").splitlines()
+    assert len(lines) == 5
+
+
+@pytest.mark.asyncio
+async def test_export_respects_gzip_refused_with_q0(export_api):
+    r = await export_api.get("/admin/leads/export", headers={**HEADERS, "Accept-Encoding": "gzip;q=0, identity"})
+
+    assert "content-encoding" not in r.headers
+    assert len(r.text.splitlines()) == 5
@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy.future import select
+
+from models.lead import Lead
+from models.lead_outbox import LeadOutbox
+from settings import settings
+
+LEAD_BODY = {
+    "city": "Москва",
+    "exchange_type": "USDT/RUB",
+    "receive_type": "В офисе / с менеджером",
+    "sum": "1000",
+    "wallet_address": "TXYZ",
+}
+
+
+@pytest.fixture(autouse=True)
+def _lead_webhook(webhook_stub, monkeypatch):
+    monkeypatch.setattr(settings, "lead_webhook_url", webhook_stub.url)
+
+
+async def _all(db_sessionmaker, model):
+    async with db_sessionmaker() as db:
+        return (await db.execute(select(model).order_by(model.id))).scalars().all()
+
+
+@pytest.mark.asyncio
+async def test_batch_creates_valid_items_and_reports_failures(api, db_sessionmaker, webhook_stub):
+    items = [LEAD_BODY, {**LEAD_BODY, "sum": ""}, {**LEAD_BODY, "sum": "2000"}, "not a lead"]
+
+    r = await api.post("/leads/batch", json={"items": items})
+
+    assert r.status_code == 200
+    body = r.json()
+    assert (body["ok"], body["created"], body["failed"]) == (False, 2, 2)
+    assert [(x["index"], x["ok"]) for x in body["results"]] == [(0, True), (1, False), (2, True), (3, False)]
+    assert body["results"][1]["errors"][0]["loc"] == ["sum"]
+
+    leads = await _all(db_sessionmaker, Lead)
+    assert [lead.id for lead in leads] == [body["results"][0]["lead_id"], body["results"][2]["lead_id"]]
+    assert [lead.sum for lead in leads] == ["1000", "2000"]
+    assert leads[0].receive_type == "офис"
+    assert leads[0].webhook_status == "pending"
+
+    rows = await _all(db_sessionmaker, LeadOutbox)
+    assert [(row.lead_id, row.payload["lead_id"], row.payload["sum"]) for row in rows] == [
+        (leads[0].id, leads[0].id, "1000"),
+        (leads[1].id, leads[1].id, "2000"),
+    ]
+    assert webhook_stub.requests == []
+
+
+@pytest.mark.asyncio
+async def test_batch_retry_is_replayed(api, db_sessionmaker):
+    first = await api.post("/leads/batch", json={"items": [LEAD_BODY]}, headers={"Idempotency-Key": "b1"})
+    again = await api.post("/leads/batch", json={"items": [LEAD_BODY]}, headers={"Idempotency-Key": "b1"})
+
+    assert again.json() == first.json()
+    assert again.headers["idempotent-replayed"] == "true"
+    assert len(await _all(db_sessionmaker, Lead)) == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_size_is_limited(api, monkeypatch):
+    monkeypatch.setattr(settings, "leads_batch_max_items", 2)
+
+    r = await api.post("/leads/batch", json={"items": [LEAD_BODY] * 3})
+
+    assert r.status_code == 413
@@ -0,0 +1,136 @@
+import json
+import os
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import metrics
+from settings import settings
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    metrics.REGISTRY.clear()
+    yield
+    metrics.REGISTRY.clear()
+
+
+def _sample(text_: str, line_prefix: str) -> float:
+    for line in text_.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{line_prefix} not in output")
+
+
+async def test_histogram_renders_cumulative_buckets_sum_and_count():
+    metrics.UPSTREAM_DURATION.observe(0.003, "webflow", "200")
+    metrics.UPSTREAM_DURATION.observe(0.2, "webflow", "200")
+    metrics.UPSTREAM_DURATION.observe(60, "webflow", "200")
+
+    out = await metrics.render_latest()
+    labels = 'upstream="webflow",status="200"'
+
+    assert "# TYPE upstream_request_duration_seconds histogram" in out
+    assert _sample(out, f'upstream_request_duration_seconds_bucket{{{labels},le="0.005"}}') == 1
+    assert _sample(out, f'upstream_request_duration_seconds_bucket{{{labels},le="0.25"}}') == 2
+    assert _sample(out, f'upstream_request_duration_seconds_bucket{{{labels},le="+Inf"}}') == 3
+    assert _sample(out, f"upstream_request_duration_seconds_count{{{labels}}}") == 3
+    assert _sample(out, f"upstream_request_duration_seconds_sum{{{labels}}}") == pytest.approx(60.203)
+
+
+async def test_label_values_are_escaped():
+    metrics.AUTH_FAILURES.inc('bad "quote"\\')
+
+    assert 'auth_failures_total{reason="bad \\"quote\\"\\\\"} 1' in await metrics.render_latest()
+
+
+def test_db_statements_are_timed_by_operation():
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+
+    values = metrics.DB_QUERY_DURATION.values()
+    assert sum(values[("SELECT",)][:-1]) == 1
+    assert sum(values[("OTHER",)][:-1]) == 1
+
+
+def test_failed_statements_do_not_leak_start_times():
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine)
+    with engine.connect() as conn:
+        with pytest.raises(Exception):
+            conn.execute(text("SELECT * FROM missing"))
+        conn.execute(text("SELECT 1"))
+
+        assert conn.info["_query_start"] == []
+    assert sum(metrics.DB_QUERY_DURATION.values()[("SELECT",)][:-1]) == 1
+
+
+async def test_multiprocess_snapshots_are_summed(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_multiproc_dir", str(tmp_path))
+    other_worker = {"auth_failures_total": [[["bad signature"], 2.0]]}
+    (tmp_path / "metrics-999999.json").write_text(json.dumps(other_worker))
+    metrics.AUTH_FAILURES.inc("bad signature")
+
+    out = await metrics.render_latest()
+
+    assert _sample(out, 'auth_failures_total{reason="bad signature"}') == 3
+    assert (tmp_path / "metrics-999999.json").exists()
+    assert len(list(tmp_path.glob("metrics-*.json"))) == 2
+
+
+async def test_stale_snapshots_are_left_out_and_own_is_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_multiproc_dir", str(tmp_path))
+    dead = tmp_path / "metrics-999999.json"
+    dead.write_text(json.dumps({"db_pool_checked_out": [[[], 7.0]]}))
+    old = time.time() - (metrics.STALE_FLUSHES + 1) * settings.metrics_flush_interval_seconds
+    os.utime(dead, (old, old))
+    metrics.DB_POOL_CHECKED_OUT.set(2)
+
+    assert _sample(await metrics.render_latest(), "db_pool_checked_out") == 2
+
+    metrics.remove_snapshot()
+    assert [p.name for p in tmp_path.glob("metrics-*.json")] == ["metrics-999999.json"]
+
+
+async def test_multiprocess_gauges_sum_or_take_the_max(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_multiproc_dir", str(tmp_path))
+    other_worker = {
+        "db_pool_checked_out": [[[], 3.0]],
+        "circuit_breaker_state": [[["webflow"], 1.0]],
+    }
+    (tmp_path / "metrics-999999.json").write_text(json.dumps(other_worker))
+    metrics.DB_POOL_CHECKED_OUT.set(2)
+    metrics.CIRCUIT_STATE.set(1, "webflow")
+
+    out = await metrics.render_latest()
+
+    assert _sample(out, "db_pool_checked_out") == 5
+    assert _sample(out, 'circuit_breaker_state{upstream="webflow"}') == 1  # both half-open
+
+
+def test_snapshot_does_not_share_state_with_the_live_metrics():
+    metrics.UPSTREAM_DURATION.observe(0.2, "webflow", "200")
+    snapshot = metrics.REGISTRY.snapshot()
+    metrics.UPSTREAM_DURATION.observe(0.2, "webflow", "200")
+
+    [[_, state]] = snapshot["upstream_request_duration_seconds"]
+    assert sum(state[:-1]) == 1
+
+
+async def test_requests_and_auth_failures_are_exposed(api):
+    await api.get("/me")
+    await api.get("/me", headers={"authorization": "Bearer nope"})
+    await api.post("/auth/telegram-webapp", json={"initData": "auth_date=1&user=%7B%7D"})
+
+    r = await api.get("/metrics")
+
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert _sample(r.text, 'http_request_duration_seconds_count{method="GET",route="/me",status="200"}') == 1
+    assert _sample(r.text, 'http_request_duration_seconds_count{method="GET",route="/me",status="401"}') == 1
+    assert _sample(r.text, 'auth_failures_total{reason="Invalid access token"}') == 1
+    assert _sample(r.text, 'auth_failures_total{reason="initData missing hash"}') == 1
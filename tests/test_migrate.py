@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+import migrate
+
+
+@pytest.fixture
+def sqlite_dsn(tmp_path):
+    return f"sqlite+aiosqlite:///{tmp_path / 'migrate.db'}"
+
+
+def _stamp(dsn, revision):
+    engine = create_engine(migrate.sync_dsn(dsn))
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+        conn.execute(text("INSERT INTO alembic_version VALUES (:r)"), {"r": revision})
+    engine.dispose()
+
+
+def test_head_is_read_from_the_version_files():
+    assert migrate.head_revisions() == {"0007_idempotency_keys"}
+
+
+def test_at_head_skips_alembic(sqlite_dsn, monkeypatch):
+    _stamp(sqlite_dsn, "0007_idempotency_keys")
+    monkeypatch.setattr(migrate, "upgrade", lambda conn: pytest.fail("upgrade must not run"))
+
+    assert migrate.migrate(sqlite_dsn) is False
+
+
+def test_pending_revisions_upgrade(sqlite_dsn, monkeypatch):
+    _stamp(sqlite_dsn, "0006_leads_user_created_index")
+    calls = []
+    monkeypatch.setattr(migrate, "upgrade", calls.append)
+
+    assert migrate.migrate(sqlite_dsn) is True
+    assert len(calls) == 1
+
+
+def test_upgrade_runs_through_autocommit_revisions(sqlite_dsn):
+    # 0006 creates its index in an autocommit_block(); Alembic must own the transaction
+    _stamp(sqlite_dsn, "0005_aml_checks")
+    engine = create_engine(migrate.sync_dsn(sqlite_dsn))
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE leads (id INTEGER PRIMARY KEY, tg_user_id VARCHAR, created_at DATETIME)"))
+
+    assert migrate.migrate(sqlite_dsn) is True
+
+    with engine.connect() as conn:
+        assert migrate.current_revisions(conn) == migrate.head_revisions()
+        indexes = {row[1] for row in conn.execute(text("PRAGMA index_list('leads')"))}
+        tables = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+    engine.dispose()
+    assert "ix_leads_user_created_id" in indexes
+    assert "idempotency_keys" in tables
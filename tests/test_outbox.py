@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.future import select
+
+import outbox
+from models.lead import Lead
+from models.lead_outbox import LeadOutbox
+from routers import leads as leads_router
+from settings import settings
+
+LEAD_BODY = {
+    "city": "Москва",
+    "exchange_type": "USDT/RUB",
+    "receive_type": "В офисе / с менеджером",
+    "sum": "1000",
+    "wallet_address": "TXYZ",
+}
+
+
+@pytest.fixture(autouse=True)
+def _lead_webhook(webhook_stub, monkeypatch):
+    monkeypatch.setattr(settings, "lead_webhook_url", webhook_stub.url)
+
+
+async def _outbox_rows(db_sessionmaker):
+    async with db_sessionmaker() as db:
+        return (await db.execute(select(LeadOutbox))).scalars().all()
+
+
+async def _lead(db_sessionmaker, lead_id):
+    async with db_sessionmaker() as db:
+        return (await db.execute(select(Lead).where(Lead.id == lead_id))).scalars().one()
+
+
+@pytest.mark.asyncio
+async def test_create_lead_stages_webhook_without_calling_it(api, db_sessionmaker, webhook_stub):
+    r = await api.post("/leads", json=LEAD_BODY)
+
+    assert r.status_code == 200
+    body = r.json()
+    assert body["webhook_status"] == "pending"
+    assert webhook_stub.requests == []
+
+    rows = await _outbox_rows(db_sessionmaker)
+    assert len(rows) == 1
+    assert rows[0].lead_id == body["lead_id"]
+    assert rows[0].payload["receive_type"] == "офис"
+
+
+@pytest.mark.asyncio
+async def test_delivery_sends_the_rate_at_submission(api, db_sessionmaker, webhook_stub, monkeypatch):
+    rates = {"USDT/RUB": "76.41"}
+
+    async def _index():
+        return {leads_router._normalize_city("Москва"): dict(rates)}
+
+    monkeypatch.setattr(leads_router, "_get_webflow_rates_index", _index)
+    await api.post("/leads", json=LEAD_BODY)
+    await api.post("/leads/batch", json={"items": [{**LEAD_BODY, "sum": "2000"}]})
+    rates["USDT/RUB"] = "80.00"  # moved before the delivery
+
+    worker = outbox.OutboxWorker(send=leads_router._post_webhook_json, session_factory=db_sessionmaker)
+    assert await worker.run_once() == 2
+
+    assert [r["variables"]["exchange_rate"] for r in webhook_stub.requests] == ["76.41", "76.41"]
+
+
+@pytest.mark.asyncio
+async def test_worker_delivers_to_webhook_and_marks_lead(api, db_sessionmaker, webhook_stub):
+    lead_id = (await api.post("/leads", json=LEAD_BODY)).json()["lead_id"]
+
+    worker = outbox.OutboxWorker(send=leads_router._post_webhook_json, session_factory=db_sessionmaker)
+    assert await worker.run_once() == 1
+
+    assert len(webhook_stub.requests) == 1
+    sent = webhook_stub.requests[0]
+    assert sent["contact_by"] == "telegram_id"
+    assert sent["search"] == "42"
+    assert sent["variables"]["lead_id"] == lead_id
+
+    [row] = await _outbox_rows(db_sessionmaker)
+    assert row.status == outbox.DELIVERED
+    assert row.attempts == 1
+    assert (await _lead(db_sessionmaker, lead_id)).webhook_status == outbox.DELIVERED
+
+    # nothing left to do
+    assert await worker.run_once() == 0
+    assert len(webhook_stub.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_retries_with_backoff_then_delivers(api, db_sessionmaker, webhook_stub):
+    lead_id = (await api.post("/leads", json=LEAD_BODY)).json()["lead_id"]
+    webhook_stub.statuses = [503]
+
+    worker = outbox.OutboxWorker(send=leads_router._post_webhook_json, session_factory=db_sessionmaker)
+    await worker.run_once()
+
+    [row] = await _outbox_rows(db_sessionmaker)
+    assert row.status == outbox.PENDING
+    assert row.attempts == 1
+    assert row.last_status_code == 503
+    # not due yet
+    assert await worker.run_once() == 0
+
+    async with db_sessionmaker() as db:
+        past = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await db.execute(update(LeadOutbox).values(next_attempt_at=past))
+        await db.commit()
+
+    assert await worker.run_once() == 1
+    [row] = await _outbox_rows(db_sessionmaker)
+    assert row.status == outbox.DELIVERED
+    assert row.attempts == 2
+    assert len(webhook_stub.requests) == 2
+    assert (await _lead(db_sessionmaker, lead_id)).webhook_status == outbox.DELIVERED
+
+
+@pytest.mark.asyncio
+async def test_worker_gives_up_after_max_attempts(api, db_sessionmaker, webhook_stub, monkeypatch):
+    monkeypatch.setattr(settings, "outbox_max_attempts", 1)
+    lead_id = (await api.post("/leads", json=LEAD_BODY)).json()["lead_id"]
+    webhook_stub.statuses = [500]
+
+    worker = outbox.OutboxWorker(send=leads_router._post_webhook_json, session_factory=db_sessionmaker)
+    await worker.run_once()
+
+    [row] = await _outbox_rows(db_sessionmaker)
+    assert row.status == outbox.FAILED
+    assert (await _lead(db_sessionmaker, lead_id)).webhook_status == outbox.FAILED
+
+
+def test_backoff_grows_exponentially_with_bounded_jitter(monkeypatch):
+    monkeypatch.setattr(settings, "outbox_backoff_base_seconds", 2.0)
+    monkeypatch.setattr(settings, "outbox_backoff_max_seconds", 60.0)
+
+    for attempts, full in [(1, 2.0), (2, 4.0), (3, 8.0), (10, 60.0)]:
+        delay = outbox.backoff_seconds(attempts)
+        assert full / 2 <= delay <= full
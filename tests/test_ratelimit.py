@@ -0,0 +1,116 @@
+import httpx
+import pytest
+
+import ratelimit
+from auth_tokens import create_token
+from ratelimit import Budget, MemoryBucketStore
+
+
+def test_budget_parse():
+    assert Budget.parse("20/minute") == Budget(capacity=20.0, per_second=20 / 60)
+    assert Budget.parse("5/seconds").per_second == 5.0
+    with pytest.raises(ValueError):
+        Budget.parse("5/fortnight")
+
+
+@pytest.mark.asyncio
+async def test_bucket_refills_and_reports_retry_after(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    store = MemoryBucketStore(max_keys=10)
+    budget = Budget.parse("2/minute")
+
+    assert await store.take("k", budget) == 0
+    assert await store.take("k", budget) == 0
+    assert await store.take("k", budget) == pytest.approx(30.0)
+
+    now[0] += 30
+    assert await store.take("k", budget) == 0
+    assert store.stats()["limited"] == 1
+
+
+@pytest.mark.asyncio
+async def test_store_is_bounded_and_drops_refilled_buckets(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    store = MemoryBucketStore(max_keys=3)
+    budget = Budget.parse("1/second")
+
+    for i in range(5):
+        await store.take(f"k{i}", budget)
+    assert store.stats()["keys"] == 3
+
+    now[0] += 2  # every bucket is full again
+    await store.take("new", budget)
+    assert store.stats()["keys"] <= 2
+
+
+@pytest.mark.asyncio
+async def test_middleware_limits_per_user_before_the_route(api):
+    from main import app
+
+    limited = ratelimit.RateLimitMiddleware(
+        app, limits={"POST /aml/check": "1/minute"}, store=MemoryBucketStore(max_keys=10)
+    )
+    transport = httpx.ASGITransport(app=limited)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=api.headers) as client:
+        first = await client.post("/aml/check", json={"wallet_address": " "})
+        second = await client.post("/aml/check", json={"wallet_address": " "})
+        anonymous = await client.post("/aml/check", json={"wallet_address": " "}, headers={"Authorization": ""})
+        other_route = await client.post("/leads", json={"wallet_address": " "})
+
+    assert first.status_code == 400  # reached the route
+    assert second.status_code == 429
+    assert second.headers["retry-after"] == "60"
+    assert anonymous.status_code == 401  # keyed by client IP: a separate bucket
+    assert other_route.status_code == 422
+
+
+def _limited(app, trusted_proxies):
+    return ratelimit.RateLimitMiddleware(
+        app,
+        limits={"POST /auth/telegram-webapp": "1/minute"},
+        store=MemoryBucketStore(max_keys=10),
+        trusted_proxies=trusted_proxies,
+    )
+
+
+async def _login_statuses(app, peer, forwarded_for):
+    transport = httpx.ASGITransport(app=app, client=(peer, 1234))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return [
+            (await client.post("/auth/telegram-webapp", json={}, headers={"X-Forwarded-For": ip})).status_code
+            for ip in forwarded_for
+        ]
+
+
+@pytest.mark.asyncio
+async def test_forwarded_clients_behind_a_trusted_proxy_get_their_own_buckets(api):
+    from main import app
+
+    limited = _limited(app, ["10.0.0.0/8"])
+    # the last hop is another trusted proxy; the client is the one before it
+    statuses = await _login_statuses(
+        limited, "10.1.2.3", ["198.51.100.1, 10.9.9.9", "198.51.100.2, 10.9.9.9", "198.51.100.1"]
+    )
+
+    assert statuses[0] != 429 and statuses[1] != 429
+    assert statuses[2] == 429
+
+
+@pytest.mark.asyncio
+async def test_forwarded_for_from_an_untrusted_peer_is_ignored(api):
+    from main import app
+
+    statuses = await _login_statuses(_limited(app, ["10.0.0.0/8"]), "203.0.113.7", ["198.51.100.1", "198.51.100.2"])
+
+    assert statuses[1] == 429  # both keyed by the peer
+
+
+def test_refresh_tokens_do_not_key_by_user():
+    access = create_token(token_type="access", subject="42", ttl_seconds=60)
+    refresh = create_token(token_type="refresh", subject="42", ttl_seconds=60)
+
+    assert ratelimit.token_subject([(b"authorization", f"Bearer {access}".encode())]) == "42"
+    assert ratelimit.token_subject([(b"authorization", f"Bearer {refresh}".encode())]) is None
+    assert ratelimit.token_subject([(b"cookie", f"refresh_token={refresh}".encode())]) is None
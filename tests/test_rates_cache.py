@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+import respx
+
+from rates_cache import RatesCache
+from routers import leads as leads_router
+from settings import settings
+
+ITEMS_URL = "https://api.webflow.com/v2/collections/695ce1515f8c865b2da91da6/items"
+
+PAYLOAD = {
+    "items": [
+        {"fieldData": {"name": "Москва", "usdt-to-rub-5": "76.41", "rub-to-usdt-2": "77.23"}},
+    ]
+}
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_rates_are_fetched_once_within_ttl(monkeypatch):
+    monkeypatch.setattr(settings, "webflow_cms_items_url", ITEMS_URL)
+    monkeypatch.setattr(settings, "webflow_api_key", "test-key")
+    route = respx.get(ITEMS_URL).respond(200, json=PAYLOAD)
+
+    assert await leads_router._get_webflow_exchange_rate("Москва", "USDT/RUB") == "76.41"
+    assert await leads_router._get_webflow_exchange_rate("Москва", "RUB/USDT") == "77.23"
+
+    assert route.call_count == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_concurrent_misses_share_one_fetch(monkeypatch):
+    monkeypatch.setattr(settings, "webflow_cms_items_url", ITEMS_URL)
+    monkeypatch.setattr(settings, "webflow_api_key", "test-key")
+    route = respx.get(ITEMS_URL).respond(200, json=PAYLOAD)
+
+    rates = await asyncio.gather(
+        *(leads_router._get_webflow_exchange_rate("Москва", "USDT/RUB") for _ in range(10))
+    )
+
+    assert rates == ["76.41"] * 10
+    assert route.call_count == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_failed_fetch_is_not_cached(monkeypatch):
+    monkeypatch.setattr(settings, "webflow_cms_items_url", ITEMS_URL)
+    monkeypatch.setattr(settings, "webflow_api_key", "test-key")
+    route = respx.get(ITEMS_URL)
+    route.side_effect = [
+        respx.MockResponse(503),
+        respx.MockResponse(200, json=PAYLOAD),
+    ]
+
+    assert await leads_router._get_webflow_exchange_rate("Москва", "USDT/RUB") is None
+    assert await leads_router._get_webflow_exchange_rate("Москва", "USDT/RUB") == "76.41"
+    assert route.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_stale_value_is_served_while_refreshing():
+    cache = RatesCache(ttl_seconds=0, stale_seconds=60)
+    calls = []
+    release = asyncio.Event()
+
+    async def loader():
+        calls.append(1)
+        if len(calls) > 1:
+            await release.wait()
+        return len(calls)
+
+    assert await cache.get("k", loader) == 1
+    # expired but within the stale window: old value returned immediately
+    assert await cache.get("k", loader) == 1
+    assert await cache.get("k", loader) == 1
+    await asyncio.sleep(0)
+    assert len(calls) == 2  # a single background refresh
+
+    release.set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert cache.peek("k") == 2
+    assert cache.stats()["stale_hits"] == 2
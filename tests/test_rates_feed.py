@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import pytest
+
+from rates_feed import RatesFeed
+from routers import rates as rates_router_module
+from settings import settings
+
+
+def _index(rub="95.1", usd="1.01"):
+    return {"москва": {"USDT/RUB": rub, "USDT/USD": usd}, "дубай": {"USDT/AED": "3.67"}}
+
+
+def _parse(chunk: bytes):
+    fields = dict(line.split(": ", 1) for line in chunk.decode().strip().split("\n"))
+    return fields["event"], int(fields["id"]), json.loads(fields["data"])["rates"]
+
+
+def test_publish_records_only_changed_and_removed_entries():
+    feed = RatesFeed(lambda: None, poll_interval=1)
+    assert feed.publish(_index()) is True
+    assert feed.publish(_index()) is False
+
+    feed.publish({"москва": {"USDT/RUB": "96.0", "USDT/USD": "1.01"}})
+
+    is_snapshot, changes = feed.changes_since(1)
+    assert not is_snapshot
+    assert changes == {("москва", "USDT/RUB"): "96.0", ("дубай", "USDT/AED"): None}
+    assert feed.changes_since(0)[0] is True  # new subscribers start from a snapshot
+
+
+def test_subscriber_behind_the_history_gets_a_snapshot():
+    feed = RatesFeed(lambda: None, poll_interval=1, history=2)
+    for i in range(4):
+        feed.publish(_index(rub=str(90 + i)))
+
+    is_snapshot, changes = feed.changes_since(1)
+
+    assert is_snapshot
+    assert changes[("москва", "USDT/RUB")] == "93"
+
+
+async def test_stream_sends_snapshot_then_changes_then_heartbeats(monkeypatch):
+    current = {"index": _index()}
+
+    async def load():
+        return current["index"]
+
+    feed = RatesFeed(load, poll_interval=0.01)
+    monkeypatch.setattr(rates_router_module, "rates_feed", feed)
+    monkeypatch.setattr(settings, "rates_stream_heartbeat_seconds", 0.05)
+
+    stream = rates_router_module._stream()
+    assert (await anext(stream)).startswith(b"retry: ")
+
+    event, version, entries = _parse(await anext(stream))
+    assert event == "snapshot"
+    assert {(e["city"], e["pair"], e["rate"]) for e in entries} >= {("москва", "USDT/RUB", "95.1")}
+    assert feed.subscribers == 1 and feed.stats()["polling"]
+
+    current["index"] = _index(rub="97.0")
+    event, version2, entries = _parse(await anext(stream))
+    assert (event, version2) == ("rates", version + 1)
+    assert entries == [{"city": "москва", "pair": "USDT/RUB", "rate": "97.0"}]
+
+    assert await anext(stream) == b": ping\n\n"
+
+    await stream.aclose()  # client went away
+    assert feed.subscribers == 0
+    await asyncio.sleep(0)
+    assert not feed.stats()["polling"]
+
+
+async def test_rates_snapshot_endpoint(api, monkeypatch):
+    async def load():
+        return _index()
+
+    monkeypatch.setattr(rates_router_module, "_get_webflow_rates_index", load)
+
+    r = await api.get("/rates", params={"city": "Москва"})
+
+    assert r.status_code == 200
+    assert r.json()["rates"] == [
+        {"city": "москва", "pair": "USDT/RUB", "rate": "95.1"},
+        {"city": "москва", "pair": "USDT/USD", "rate": "1.01"},
+    ]
+
+
+async def test_rates_endpoint_503_without_webflow(api):
+    assert (await api.get("/rates")).status_code == 503
@@ -0,0 +1,92 @@
+import json
+from urllib.parse import parse_qsl
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from auth_tokens import create_token
+from bench.replay import RequestBuilder, resign_init_data
+from recorder import REDACTED, TrafficRecorderMiddleware, redact_init_data
+from utils import verify_init_data
+
+INIT_DATA = "auth_date=1700000000&user=%7B%22id%22%3A42%7D&hash=abcdef0123&signature=xyz"
+
+
+def _app(tmp_path):
+    app = FastAPI()
+
+    @app.post("/things/{thing_id}")
+    async def things(thing_id: int, body: dict):
+        return {"ok": True}
+
+    app.add_middleware(TrafficRecorderMiddleware, path=str(tmp_path / "traffic.jsonl"))
+    return app
+
+
+def _read_records(app, tmp_path):
+    layer = app.middleware_stack
+    while not isinstance(layer, TrafficRecorderMiddleware):
+        layer = layer.app
+    layer._writer.close()  # flush the writer thread
+    with open(tmp_path / "traffic.jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_redact_init_data_hides_hash_and_signature_only():
+    fields = dict(parse_qsl(redact_init_data(INIT_DATA)))
+
+    assert fields["hash"] == REDACTED
+    assert fields["signature"] == REDACTED
+    assert fields["user"] == '{"id":42}'
+
+
+@pytest.mark.asyncio
+async def test_recorder_writes_redacted_record(tmp_path):
+    app = _app(tmp_path)
+    token = create_token(token_type="access", subject="42", ttl_seconds=60)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        r = await client.post(
+            "/things/7?token=secret",
+            json={"initData": INIT_DATA, "refresh_token": "r", "city": "Москва"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+    assert r.status_code == 200
+
+    [record] = _read_records(app, tmp_path)
+
+    assert record["route"] == "/things/{thing_id}"
+    assert record["status"] == 200
+    assert record["sub"] == "42"
+    assert record["headers"]["authorization"] == REDACTED
+    assert record["query"] == f"token={REDACTED.replace('[', '%5B').replace(']', '%5D')}"
+    assert record["body"]["refresh_token"] == REDACTED
+    assert record["body"]["city"] == "Москва"
+    assert dict(parse_qsl(record["body"]["initData"]))["hash"] == REDACTED
+    assert token not in json.dumps(record)
+
+
+def test_replay_remints_tokens_and_resigns_init_data():
+    builder = RequestBuilder(bot_token="123:test")
+    record = {
+        "method": "POST",
+        "path": "/auth/telegram-webapp",
+        "query": "",
+        "headers": {"authorization": REDACTED, "content-type": "application/json", "host": "prod"},
+        "sub": "42",
+        "body": {"initData": redact_init_data(INIT_DATA)},
+    }
+
+    req = builder.build(record)
+
+    assert req["headers"]["authorization"].startswith("Bearer ")
+    assert "host" not in req["headers"]
+    verified = verify_init_data(req["json"]["initData"], "123:test")
+    assert verified["user"] == '{"id":42}'
+
+
+def test_resigned_init_data_has_fresh_auth_date():
+    signed = resign_init_data(INIT_DATA, "123:test", auth_date=1800000000)
+
+    assert dict(parse_qsl(signed))["auth_date"] == "1800000000"
@@ -0,0 +1,59 @@
+import gzip
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from static_site import StaticSite
+
+PAGE = ("<html><body>" + "Обмен валют " * 200 + "</body></html>").encode()
+
+
+@pytest.fixture
+async def client(tmp_path):
+    (tmp_path / "home.html").write_bytes(b"<html>home</html>")
+    (tmp_path / "exchange.html").write_bytes(PAGE)
+    site = StaticSite(str(tmp_path), asset_cache_control="public, max-age=60")
+    app = FastAPI()
+    app.include_router(site.router("/app"))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as c:
+        yield c
+
+
+async def test_serves_precompressed_gzip_with_validators(client):
+    r = await client.get("/app/exchange.html", headers={"Accept-Encoding": "gzip"})
+
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["content-type"] == "text/html; charset=utf-8"
+    assert r.headers["cache-control"] == "no-cache"
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert r.headers["etag"].endswith('-gzip"')
+    assert r.content == PAGE  # httpx decoded the gzip body
+    assert len(gzip.compress(PAGE)) < len(PAGE)
+
+
+async def test_identity_when_encoding_not_accepted_and_extensionless_paths(client):
+    r = await client.get("/app/exchange", headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in r.headers
+    assert r.content == PAGE
+
+    index = await client.get("/app/", headers={"Accept-Encoding": "identity"})
+    assert index.content == b"<html>home</html>"
+
+    assert (await client.get("/app/missing.html")).status_code == 404
+    assert (await client.get("/app/../settings.py")).status_code == 404
+
+
+async def test_if_none_match_returns_304_for_any_encoding_variant(client):
+    first = await client.get("/app/exchange.html", headers={"Accept-Encoding": "identity"})
+    etag = first.headers["etag"]
+
+    r = await client.get("/app/exchange.html", headers={"Accept-Encoding": "gzip", "If-None-Match": f'W/{etag}'})
+
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"].endswith('-gzip"')
+
+    stale = await client.get("/app/exchange.html", headers={"If-None-Match": '"0000"'})
+    assert stale.status_code == 200
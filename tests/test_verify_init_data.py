@@ -0,0 +1,91 @@
+import hashlib
+import hmac
+import time
+from urllib.parse import urlencode
+
+import pytest
+from fastapi import HTTPException
+
+import utils
+from settings import settings
+
+
+def _sign(bot_token: str, **fields) -> str:
+    fields.setdefault("auth_date", str(int(time.time())))
+    fields.setdefault("user", '{"id":42}')
+    dcs = utils._data_check_string(fields)
+    fields["hash"] = hmac.new(utils._webapp_secret_key(bot_token), dcs.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+def test_valid_init_data_is_verified():
+    data = utils.verify_init_data(_sign("123:abc"), "123:abc")
+
+    assert data["user"] == '{"id":42}'
+    assert "hash" not in data
+
+
+def test_bad_signature_is_rejected():
+    with pytest.raises(HTTPException) as e:
+        utils.verify_init_data(_sign("123:abc"), "999:other")
+
+    assert e.value.status_code == 401
+    assert e.value.detail == "bad signature"
+
+
+def test_any_of_several_bot_tokens_is_accepted():
+    data = utils.verify_init_data(_sign("old:token"), ["new:token", "old:token"])
+
+    assert data["user"] == '{"id":42}'
+
+
+def test_repeat_is_answered_from_memo_without_hmac(monkeypatch):
+    init_data = _sign("123:abc")
+    utils.verify_init_data(init_data, "123:abc")
+
+    def _boom(*args, **kwargs):
+        raise AssertionError("HMAC recomputed")
+
+    monkeypatch.setattr(utils.hmac, "new", _boom)
+    assert utils.verify_init_data(init_data, "123:abc")["user"] == '{"id":42}'
+
+
+def test_tampered_payload_with_known_hash_is_not_a_memo_hit():
+    init_data = _sign("123:abc")
+    utils.verify_init_data(init_data, "123:abc")
+
+    tampered = init_data.replace("%3A42", "%3A43")
+    with pytest.raises(HTTPException) as e:
+        utils.verify_init_data(tampered, "123:abc")
+
+    assert e.value.detail == "bad signature"
+
+
+def test_memo_hit_requires_the_signing_token():
+    init_data = _sign("123:abc")
+    utils.verify_init_data(init_data, "123:abc")
+
+    with pytest.raises(HTTPException) as e:
+        utils.verify_init_data(init_data, ["999:other"])
+
+    assert e.value.status_code == 401
+    assert e.value.detail == "bad signature"
+
+
+def test_replay_policy_reject(monkeypatch):
+    monkeypatch.setattr(settings, "initdata_replay_policy", "reject")
+    init_data = _sign("123:abc")
+    utils.verify_init_data(init_data, "123:abc")
+
+    with pytest.raises(HTTPException) as e:
+        utils.verify_init_data(init_data, "123:abc")
+
+    assert e.value.status_code == 401
+
+
+def test_memo_entry_expires_with_max_age():
+    old = str(int(time.time()) - utils.INITDATA_MAX_AGE_SECONDS - 10)
+    utils._memo.put("stale", int(old) + utils.INITDATA_MAX_AGE_SECONDS, "123:abc", {"auth_date": old})
+
+    assert utils._memo.get("stale", int(time.time()), ("123:abc",)) is None
+    assert len(utils._memo) == 0
@@ -107,3 +107,59 @@ async def test_real_webflow_rate_not_none():
     rate = await leads_router._get_webflow_exchange_rate("Москва", "USDT/RUB")
 
     assert rate is not None and str(rate).strip() != ""
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_get_webflow_exchange_rate_finds_city_past_first_page(monkeypatch):
+    url = "https://api.webflow.com/v2/collections/695ce1515f8c865b2da91da6/items"
+    monkeypatch.setattr(settings, "webflow_cms_items_url", url)
+    monkeypatch.setattr(settings, "webflow_api_key", "test-key")
+
+    def _page(request):
+        offset = int(request.url.params["offset"])
+        items = [
+            {"fieldData": {"name": f"Город {i}", "usdt-to-rub-5": f"{i}.00"}}
+            for i in range(offset, min(offset + 100, 250))
+        ]
+        return Response(200, json={"items": items, "pagination": {"limit": 100, "offset": offset, "total": 250}})
+
+    route = respx.get(url).mock(side_effect=_page)
+
+    rate = await leads_router._get_webflow_exchange_rate("город 249", "USDT/RUB")
+
+    assert rate == "249.00"
+    assert sorted(int(c.request.url.params["offset"]) for c in route.calls) == [0, 100, 200]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_get_webflow_exchange_rate_returns_none_when_a_page_fails(monkeypatch):
+    url = "https://api.webflow.com/v2/collections/695ce1515f8c865b2da91da6/items"
+    monkeypatch.setattr(settings, "webflow_cms_items_url", url)
+    monkeypatch.setattr(settings, "webflow_api_key", "test-key")
+
+    def _page(request):
+        offset = int(request.url.params["offset"])
+        if offset:
+            return Response(500)
+        items = [{"fieldData": {"name": "Москва", "usdt-to-rub-5": "76.41"}}] * 100
+        return Response(200, json={"items": items, "pagination": {"limit": 100, "offset": 0, "total": 150}})
+
+    respx.get(url).mock(side_effect=_page)
+
+    rate = await leads_router._get_webflow_exchange_rate("Москва", "USDT/RUB")
+
+    assert rate is None
+
+
+def test_build_rates_index_normalizes_city_and_skips_empty_rates():
+    index = leads_router._build_rates_index(
+        [
+            {"fieldData": {"name": "  Дубай ", "usdt-to-aed-3": " 3.67 ", "aed-to-usdt-2": ""}},
+            {"fieldData": {"name": "дубай", "usdt-to-aed-3": "9.99"}},
+            "garbage",
+        ]
+    )
+
+    assert index == {"дубай": {"USDT/AED": "3.67"}}
@@ -1,20 +1,82 @@
 import hmac
 import hashlib
 import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Sequence, Tuple
 from urllib.parse import parse_qsl
 from fastapi import HTTPException
 
+from metrics import count_auth_failures
 from settings import settings
 
 INITDATA_MAX_AGE_SECONDS = settings.initdata_max_age_seconds
 
+@lru_cache(maxsize=16)
 def _webapp_secret_key(bot_token: str) -> bytes:
+    # Derived once per bot token; the HMAC key never changes for a given token.
     return hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
 
 def _data_check_string(fields: dict) -> str:
     return "\n".join(f"{k}={v}" for k, v in sorted(fields.items(), key=lambda x: x[0]))
 
-def verify_init_data(init_data: str, bot_token: str) -> dict:
+
+class _InitDataMemo:
+    """Bounded set of initData strings that already passed verification.
+
+    The Telegram client sends the same initData on every page load of a session, so a
+    repeat can be answered without re-parsing and re-running the HMAC. An entry lives
+    until ``auth_date + INITDATA_MAX_AGE_SECONDS``, i.e. exactly as long as a full
+    verification would still succeed. Keyed by the whole string (not the hash), so a
+    tampered payload carrying a known hash is never a hit; an entry also remembers the
+    bot token that signed it and only answers calls that still accept that token.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[int, str, Dict[str, str]]]" = OrderedDict()
+
+    def get(self, init_data: str, now: int, tokens: Sequence[str]) -> Dict[str, str] | None:
+        entry = self._entries.get(init_data)
+        if entry is None:
+            return None
+        expires_at, token, data = entry
+        if expires_at < now:
+            del self._entries[init_data]
+            return None
+        if token not in tokens:
+            return None
+        return data
+
+    def put(self, init_data: str, expires_at: int, token: str, data: Dict[str, str]) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[init_data] = (expires_at, token, data)
+        while len(self._entries) > self.max_entries:
+            # insertion order ~ auth_date order, so the oldest entry goes first
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_memo = _InitDataMemo(settings.initdata_memo_max_entries)
+
+
+@count_auth_failures
+def verify_init_data(init_data: str, bot_token: str | Sequence[str]) -> dict:
+    """Verify Telegram WebApp initData signed by ``bot_token`` (or any of several, for rotation)."""
+    now = int(time.time())
+    tokens = (bot_token,) if isinstance(bot_token, str) else tuple(bot_token)
+    seen = _memo.get(init_data, now, tokens)
+    if seen is not None:
+        if settings.initdata_replay_policy == "reject":
+            raise HTTPException(401, "initData already used")
+        return dict(seen)
+
     data = dict(parse_qsl(init_data, keep_blank_values=True))
     received_hash = data.pop("hash", None)
 
@@ -26,19 +88,21 @@ def verify_init_data(init_data: str, bot_token: str) -> dict:
         raise HTTPException(400, "initData invalid auth_date")
     if auth_date <= 0:
         raise HTTPException(400, "initData missing auth_date")
-    
-    age = int(time.time()) - auth_date
-    
+
+    age = now - auth_date
+
     if age < 0:
         raise HTTPException(400, "auth_date in future")
     if age > INITDATA_MAX_AGE_SECONDS:
         raise HTTPException(401, "initData too old")
-    
-    dcs = _data_check_string(data)
-    secret_key = _webapp_secret_key(bot_token)
-    calc_hash = hmac.new(secret_key, dcs.encode("utf-8"), hashlib.sha256).hexdigest()
 
-    if not hmac.compare_digest(calc_hash, received_hash):
+    dcs = _data_check_string(data).encode("utf-8")
+    for token in tokens:
+        calc_hash = hmac.new(_webapp_secret_key(token), dcs, hashlib.sha256).hexdigest()
+        if hmac.compare_digest(calc_hash, received_hash):
+            break
+    else:
         raise HTTPException(401, "bad signature")
-    
-    return data
+
+    _memo.put(init_data, auth_date + INITDATA_MAX_AGE_SECONDS, token, data)
+    return dict(data)